@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+回测绩效分析
+
+输入为组合市值曲线和成交数组，全部指标由 NumPy 向量运算一次算出，没有逐点的 Python 循环：
+夏普比率、索提诺比率、最大回撤及持续时间、回撤曲线、滚动窗口回撤、年度收益率、换手率、
+盈亏交易统计和按资产类别的收益归因。
+
+数据来源：
+1. 运行中的回测：testyf.collect_analytics(strat, initial_cash)
+2. 已保存的回测批次：load_run(run_id)，市值曲线取自 test_result，成交取自 order
+
+与 backtrader 分析器（collect_metrics）的区别：这里的夏普比率和索提诺比率按日收益率计算后年化，
+收益率和回撤都是比例而不是百分数。
+"""
+import numpy as np
+
+# 年化无风险利率，与 backtrader SharpeRatio 的默认值一致
+RISK_FREE_RATE = 0.01
+
+# 每年交易日数
+TRADING_DAYS = 252
+
+
+class TradeArrays:
+    """成交数组模型，每个元素为一笔成交"""
+
+    def __init__(self, dates, symbols, size, price, pnl=None):
+        # 成交日期 datetime64[D]
+        self.dates = np.asarray(dates, dtype="datetime64[D]")
+
+        # 资产代码
+        self.symbols = np.asarray(symbols, dtype=object)
+
+        # 成交数量，买入为正、卖出为负
+        self.size = np.asarray(size, dtype=np.float64)
+
+        # 成交价格
+        self.price = np.asarray(price, dtype=np.float64)
+
+        # 单笔盈亏，未知时为 NaN
+        self.pnl = np.full(len(self.size), np.nan) if pnl is None else np.asarray(pnl, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.size)
+
+    @property
+    def value(self) -> np.ndarray:
+        """成交金额（绝对值）"""
+        return np.abs(self.size) * self.price
+
+    @staticmethod
+    def from_records(records: list) -> "TradeArrays":
+        """
+        由策略记录的交易列表（strategy.trades / all_trades）转换
+
+        Args:
+            records: [{datetime, action 买入/卖出, price, size, symbol?, pnl?}]
+        """
+        count = len(records)
+        sign = np.fromiter((1.0 if r.get("action") == "买入" else -1.0 for r in records), np.float64, count)
+        return TradeArrays(
+            dates=[np.datetime64(r["datetime"], "D") for r in records],
+            symbols=[r.get("symbol") for r in records],
+            size=sign * np.fromiter((abs(r.get("size", 0)) for r in records), np.float64, count),
+            price=np.fromiter((r.get("price", 0) for r in records), np.float64, count),
+            pnl=np.fromiter((r.get("pnl", np.nan) for r in records), np.float64, count)
+        )
+
+    @staticmethod
+    def from_orders(rows: list) -> "TradeArrays":
+        """
+        由订单表的查询结果转换
+
+        Args:
+            rows: 字段顺序与 OrderManager.FIELDS 一致：symbol, date, action in/out, price, size, ...
+        """
+        if not rows:
+            return TradeArrays([], [], [], [])
+        columns = list(zip(*rows))
+        sign = np.where(np.asarray(columns[2]) == "in", 1.0, -1.0)
+        return TradeArrays(
+            dates=np.array(columns[1], dtype="datetime64[D]"),
+            symbols=columns[0],
+            size=sign * np.asarray(columns[4], dtype=np.float64),
+            price=np.array(columns[3], dtype=np.float64)
+        )
+
+    @staticmethod
+    def concat(parts: list) -> "TradeArrays":
+        """合并多个成交数组，用于分块读取的订单"""
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return TradeArrays([], [], [], [])
+        return TradeArrays(
+            dates=np.concatenate([p.dates for p in parts]),
+            symbols=np.concatenate([p.symbols for p in parts]),
+            size=np.concatenate([p.size for p in parts]),
+            price=np.concatenate([p.price for p in parts]),
+            pnl=np.concatenate([p.pnl for p in parts])
+        )
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    滚动窗口最大值，前 window - 1 个点使用已有的数据
+
+    按 window 分块计算块内前缀最大值和后缀最大值（van Herk/Gil-Werman），
+    耗时与窗口长度无关
+    """
+    values = np.asarray(values, dtype=np.float64)
+    count = len(values)
+    if count == 0 or window <= 1:
+        return values.copy()
+    blocks = -(-count // window)
+    padded = np.full(blocks * window, -np.inf)
+    padded[:count] = values
+    padded = padded.reshape(blocks, window)
+    prefix = np.maximum.accumulate(padded, axis=1).ravel()
+    suffix = np.maximum.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+
+    result = np.maximum.accumulate(values[:window - 1]) if count >= window else np.maximum.accumulate(values)
+    if count < window:
+        return result
+    # 窗口 [i - window + 1, i] 跨越两个块：前一段取块的后缀最大值，后一段取下一块的前缀最大值
+    end = np.arange(window - 1, count)
+    return np.concatenate((result, np.maximum(suffix[end - window + 1], prefix[end])))
+
+
+def drawdowns(equity: np.ndarray, window: int = None) -> np.ndarray:
+    """
+    回撤曲线：当前市值相对历史最高点的跌幅（比例）
+
+    Args:
+        equity: 组合市值
+        window: 为 None 时相对全部历史最高点，否则相对最近 window 个点的最高点
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    peak = np.maximum.accumulate(equity) if window is None else rolling_max(equity, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(peak > 0, 1.0 - equity / peak, 0.0)
+
+
+def annual_returns(equity: np.ndarray, dates: np.ndarray, initial_value: float = None) -> dict:
+    """
+    年度收益率：各自然年最后一个数据点相对上一年最后一个数据点（第一年相对初始资金）
+
+    Returns:
+        dict: {年份: 收益率}
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) == 0:
+        return {}
+    years = np.asarray(dates, dtype="datetime64[Y]")
+    year_end = np.flatnonzero(np.append(years[1:] != years[:-1], True))
+    base = np.concatenate(([equity[0] if initial_value is None else initial_value], equity[year_end]))
+    returns = base[1:] / base[:-1] - 1.0
+    return dict(zip((years[year_end].astype(np.int64) + 1970).tolist(), returns.tolist()))
+
+
+def trade_stats(pnl) -> dict:
+    """
+    盈亏交易统计
+
+    Args:
+        pnl: 单笔盈亏，NaN 视为 0
+
+    Returns:
+        dict: 总交易次数、盈利/亏损次数、平均盈利/亏损（没有时为 None）、胜率、盈亏比
+    """
+    pnl = np.nan_to_num(np.asarray(pnl, dtype=np.float64))
+    won, lost = pnl > 0, pnl < 0
+    won_count, lost_count = int(won.sum()), int(lost.sum())
+    gross_win, gross_loss = float(pnl[won].sum()), float(-pnl[lost].sum())
+    return {
+        "total": len(pnl),
+        "won": won_count,
+        "lost": lost_count,
+        "avg_win": gross_win / won_count if won_count else None,
+        "avg_loss": -gross_loss / lost_count if lost_count else None,
+        "win_rate": won_count / (won_count + lost_count) if won_count + lost_count else None,
+        "profit_factor": gross_win / gross_loss if gross_loss else None
+    }
+
+
+def attribution(trades: TradeArrays, categories: dict, last_prices: dict = None) -> dict:
+    """
+    按资产类别的收益归因：成交现金流加上期末持仓市值
+
+    Args:
+        trades: 成交数组
+        categories: {资产代码: 资产类别}，不在其中的资产归入"其他"
+        last_prices: {资产代码: 期末价格}，缺少时按该资产最后一笔成交价格估值
+
+    Returns:
+        dict: {资产类别: {pnl 盈亏, traded_value 成交金额, trades 成交笔数, position_value 期末持仓市值}}
+    """
+    if len(trades) == 0:
+        return {}
+    symbols, index = np.unique(trades.symbols.astype(str), return_inverse=True)
+    flows = np.bincount(index, -trades.size * trades.price, len(symbols))
+    position = np.bincount(index, trades.size, len(symbols))
+    traded = np.bincount(index, trades.value, len(symbols))
+    counts = np.bincount(index, minlength=len(symbols))
+
+    last = np.zeros(len(symbols), dtype=np.int64)
+    np.maximum.at(last, index, np.arange(len(trades)))
+    prices = trades.price[last]
+    if last_prices:
+        prices = np.array([last_prices.get(symbol, price) for symbol, price in zip(symbols, prices)], dtype=np.float64)
+    position_value = position * prices
+
+    names = np.array([categories.get(symbol, "其他") for symbol in symbols], dtype=object)
+    result = {}
+    for name in dict.fromkeys(names):
+        mask = names == name
+        result[name] = {
+            "pnl": float(flows[mask].sum() + position_value[mask].sum()),
+            "traded_value": float(traded[mask].sum()),
+            "trades": int(counts[mask].sum()),
+            "position_value": float(position_value[mask].sum())
+        }
+    return result
+
+
+def analyze(equity, dates, trades: TradeArrays = None, initial_value: float = None, categories: dict = None,
+            last_prices: dict = None, window: int = TRADING_DAYS, risk_free_rate: float = RISK_FREE_RATE) -> dict:
+    """
+    计算全部绩效指标
+
+    Args:
+        equity: 每个数据点的组合市值
+        dates: 与 equity 对应的日期
+        trades: 成交数组，为 None 时不计算换手率、交易统计和归因
+        initial_value: 初始资金，为 None 时使用第一个数据点
+        categories: {资产代码: 资产类别}，为 None 时不计算归因
+        last_prices: {资产代码: 期末价格}，归因时为期末持仓估值
+        window: 滚动回撤的窗口长度（数据点数）
+        risk_free_rate: 年化无风险利率
+
+    Returns:
+        dict: 标量指标、annual_returns 年度收益率、drawdown/rolling_drawdown 回撤曲线，
+              以及 trade_stats 交易统计、attribution 归因和 unattributed_pnl 未归因盈亏
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    count = len(equity)
+    if count == 0:
+        raise ValueError("市值曲线为空")
+    initial_value = float(equity[0] if initial_value is None else initial_value)
+
+    returns = np.diff(equity, prepend=initial_value) / np.concatenate(([initial_value], equity[:-1]))
+    excess = returns - risk_free_rate / TRADING_DAYS
+    mean = excess.mean()
+    deviation = returns.std(ddof=1) if count > 1 else 0.0
+    downside = np.sqrt(np.mean(np.minimum(excess, 0.0) ** 2))
+
+    drawdown = drawdowns(equity)
+    peak_index = np.maximum.accumulate(np.where(drawdown == 0, np.arange(count), 0))
+    final_value = float(equity[-1])
+    growth = final_value / initial_value
+
+    report = {
+        "initial_value": initial_value,
+        "final_value": final_value,
+        "total_return": growth - 1.0,
+        "annual_return": growth ** (TRADING_DAYS / count) - 1.0 if growth > 0 else -1.0,
+        "volatility": float(deviation * np.sqrt(TRADING_DAYS)),
+        "sharpe_ratio": float(mean / deviation * np.sqrt(TRADING_DAYS)) if deviation > 0 else None,
+        "sortino_ratio": float(mean / downside * np.sqrt(TRADING_DAYS)) if downside > 0 else None,
+        "max_drawdown": float(drawdown.max()),
+        "max_drawdown_date": str(dates[int(drawdown.argmax())]),
+        "max_drawdown_duration": int((np.arange(count) - peak_index).max()),
+        "annual_returns": annual_returns(equity, dates, initial_value),
+        "drawdown": drawdown,
+        "rolling_drawdown": drawdowns(equity, window),
+        "window": window
+    }
+
+    if trades is not None:
+        traded_value = float(trades.value.sum())
+        report["turnover"] = traded_value / float(equity.mean())
+        report["annual_turnover"] = report["turnover"] * TRADING_DAYS / count
+        report["trade_stats"] = trade_stats(trades.pnl)
+        if categories is not None:
+            report["attribution"] = attribution(trades, categories, last_prices)
+            # 未归入各类别的盈亏：交易成本等直接调整现金的部分
+            report["unattributed_pnl"] = final_value - initial_value - sum(
+                item["pnl"] for item in report["attribution"].values())
+    return report
+
+
+def _test_result_columns(rows: list) -> tuple:
+    """test_result 查询结果中的日期和 remaining_cash（保存时的组合市值）"""
+    dates = np.array([row[0] for row in rows], dtype="datetime64[D]")
+    values = np.array([np.nan if row[-2] is None else float(row[-2]) for row in rows], dtype=np.float64)
+    return dates, values
+
+
+def equity_curve(dates, values) -> tuple:
+    """按日期排序，同一日期有多个数据点时取最后一个"""
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(dates, kind="stable")
+    dates, values = dates[order], values[order]
+    last = np.append(dates[1:] != dates[:-1], True) if len(dates) else np.array([], dtype=bool)
+    return dates[last], values[last]
+
+
+def from_test_results(rows: list) -> tuple:
+    """
+    由 test_result 的查询结果得到市值曲线
+
+    Args:
+        rows: 字段顺序与 TestResultManager.FIELDS 一致：date, ..., remaining_cash, run_id
+
+    Returns:
+        tuple: (日期 datetime64[D], 组合市值)
+    """
+    return equity_curve(*_test_result_columns(rows))
+
+
+def load_run(run_id: int, chunk_size: int = 100000, window: int = TRADING_DAYS) -> dict:
+    """
+    分析已保存的回测批次：市值曲线来自 test_result，成交来自 order，资产类别来自策略配置
+
+    Args:
+        run_id: 回测批次
+        chunk_size: 每次从游标读取的行数
+        window: 滚动回撤的窗口长度
+    """
+    # 在函数内导入：utils 引用本模块，而 order/test_result 引用 utils
+    from backtest_run import BacktestRunManager
+    from order import OrderManager
+    from test_result import TestResultManager
+    from testyf import DualMovingAverageStrategy
+
+    columns = [_test_result_columns(rows) for rows in TestResultManager.iter_all(chunk_size=chunk_size, run_id=run_id)]
+    dates, equity = equity_curve(np.concatenate([c[0] for c in columns]) if columns else [],
+                                 np.concatenate([c[1] for c in columns]) if columns else [])
+    trades = TradeArrays.concat([TradeArrays.from_orders(rows)
+                                 for rows in OrderManager.iter_all(chunk_size=chunk_size, run_id=run_id)])
+    run = BacktestRunManager.get(run_id)
+    categories = {symbol: category for category, symbols in DualMovingAverageStrategy.asset_categories_config.items()
+                  for symbol in symbols}
+    report = analyze(equity, dates, trades, run.initial_cash if run is not None else None, categories, window=window)
+    report["run_id"] = run_id
+    return report
@@ -1,10 +1,273 @@
-from flask import Flask
+import json
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Flask, Response, jsonify, request, stream_with_context
+
+from dbutils import PageResult
+from export import FORMATS, iter_export
+from job_queue import JobQueue, JobQueueFull
+from order import OrderManager
+from progress import CHANNEL
+from response_cache import CachedResponse, ResponseCache
+from test_result import TestResultManager
 
 app = Flask(__name__)
 
+# 查询接口的响应缓存：同一查询 5 秒内只查询一次数据库
+response_cache = ResponseCache(max_size=256, ttl=5.0)
+
+# 每页数据量上限
+MAX_PAGE_SIZE = 1000
+
+# 回测任务队列：最多同时运行 2 个回测，每个客户端同时只运行 1 个
+job_queue = JobQueue(max_workers=2, max_queued=20, max_per_client=1)
+
+# 进度推送：每个连接每秒最多推送的次数，没有更新时发送心跳的间隔（秒）
+MAX_EVENT_RATE = 10
+KEEPALIVE_INTERVAL = 15
+
+
+class BadRequest(ValueError):
+    """请求参数错误，返回 400"""
+
+
+@app.errorhandler(BadRequest)
+def bad_request(e):
+    return jsonify({"error": str(e)}), 400
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value)}")
+
+
+def _int_arg(name: str, default: int = None, low: int = None, high: int = None) -> int:
+    value = request.args.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest(f"参数 {name} 必须是整数: {value}")
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise BadRequest(f"参数 {name} 超出范围 [{low}, {high}]: {value}")
+    return value
+
+
+def _date_arg(name: str) -> str:
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise BadRequest(f"参数 {name} 必须是 YYYY-MM-DD 格式的日期: {value}")
+
+
+def _page_args(key_columns: tuple) -> dict:
+    """
+    游标分页公共参数：after 续页令牌、page_size 每页数量、count 是否统计总记录数、run_id、start、end
+
+    Args:
+        key_columns: 查询表的排序键字段，用于检查续页令牌
+    """
+    after = request.args.get("after")
+    try:
+        last_key = PageResult.decode_key(after)
+    except Exception:
+        raise BadRequest(f"续页令牌无效: {after}")
+    if last_key is not None and len(last_key) != len(key_columns):
+        raise BadRequest(f"续页令牌无效: {after}")
+    return {
+        "last_key": last_key,
+        "page_size": _int_arg("page_size", 100, 1, MAX_PAGE_SIZE),
+        "with_count": bool(_int_arg("count", 0)),
+        "run_id": _int_arg("run_id"),
+        "start": _date_arg("start"),
+        "end": _date_arg("end")
+    }
+
+
+def _page_body(result: PageResult, fields: tuple) -> dict:
+    return {
+        "data": [dict(zip(fields, row)) for row in result.data],
+        "page_size": result.page_size,
+        "records": result.records,
+        "next": result.next_token,
+        "eop": result.eop
+    }
+
+
+def cached_json(loader) -> Response:
+    """
+    返回带缓存的 JSON 响应
+
+    以请求路径和参数为缓存键；支持 gzip 压缩，以及 ETag / If-None-Match 条件请求，
+    内容未变化时返回 304。
+
+    Args:
+        loader: 无参数函数，返回可序列化为 JSON 的数据
+    """
+    key = (request.path, tuple(sorted(request.args.items(multi=True))))
+    cached = response_cache.get_or_load(key, lambda: CachedResponse(
+        json.dumps(loader(), ensure_ascii=False, default=_json_value, separators=(",", ":")).encode("utf-8")))
+
+    if request.if_none_match.contains_weak(cached.etag):
+        response = Response(status=304)
+    elif cached.gzipped is not None and request.accept_encodings["gzip"]:
+        response = Response(cached.gzipped, mimetype=cached.mimetype)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(cached.body, mimetype=cached.mimetype)
+    response.set_etag(cached.etag, weak=True)
+    response.headers["Vary"] = "Accept-Encoding"
+    # 客户端每次都带 If-None-Match 重新验证
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
 @app.route("/")
 def index():
     return "this is from code-server website for python flask ok"
 
+
+@app.route("/api/orders")
+def list_orders():
+    """订单分页查询，参数见 _page_args，另支持 symbol 股票代码"""
+    args = _page_args(OrderManager.KEY_COLUMNS)
+    args["symbol"] = request.args.get("symbol") or None
+    return cached_json(lambda: _page_body(OrderManager.list_after(**args), OrderManager.FIELDS))
+
+
+@app.route("/api/test_results")
+def list_test_results():
+    """回测日志分页查询，参数见 _page_args"""
+    args = _page_args(TestResultManager.KEY_COLUMNS)
+    return cached_json(lambda: _page_body(TestResultManager.list_after(**args), TestResultManager.FIELDS))
+
+
+def _client() -> str:
+    """客户端标识：请求头 X-Client-Id，没有时使用客户端地址"""
+    return request.headers.get("X-Client-Id") or request.remote_addr
+
+
+def _job_body(job) -> dict:
+    body = job.to_dict()
+    body["position"] = job_queue.position(job)
+    return body
+
+
+def _get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        return None, (jsonify({"error": f"任务不存在: {job_id}"}), 404)
+    return job, None
+
+
+@app.route("/api/backtests", methods=["POST"])
+def submit_backtest():
+    """提交回测任务，请求体为 run_backtest 的参数，例如 {"start": "2020-01-01", "max_hedge_ratio": 0.2}"""
+    params = request.get_json(silent=True)
+    if not isinstance(params, dict):
+        raise BadRequest("请求体必须是 JSON 对象")
+    try:
+        job = job_queue.submit(params, _client())
+    except ValueError as e:
+        raise BadRequest(str(e))
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 429
+    return jsonify(_job_body(job)), 202, {"Location": f"/api/backtests/{job.id}"}
+
+
+@app.route("/api/backtests")
+def list_backtests():
+    """当前客户端提交的回测任务"""
+    return jsonify([_job_body(job) for job in job_queue.list(_client())])
+
+
+@app.route("/api/backtests/<job_id>")
+def get_backtest(job_id):
+    """回测任务状态"""
+    job, error = _get_job(job_id)
+    return error or jsonify(_job_body(job))
+
+
+@app.route("/api/backtests/<job_id>/summary")
+def get_backtest_summary(job_id):
+    """回测指标，任务未完成时返回 409"""
+    job, error = _get_job(job_id)
+    if error:
+        return error
+    if job.status != "finished":
+        return jsonify({"error": f"任务未完成: {job.status}", "status": job.status}), 409
+    return jsonify(job.summary)
+
+
+@app.route("/api/backtests/<job_id>", methods=["DELETE"])
+def cancel_backtest(job_id):
+    """取消排队中或运行中的回测任务，任务已结束时返回 409"""
+    job, error = _get_job(job_id)
+    if error:
+        return error
+    if not job_queue.cancel(job_id):
+        return jsonify({"error": f"任务已结束: {job.status}", "status": job.status}), 409
+    return jsonify(_job_body(job))
+
+
+@app.route("/api/backtests/<job_id>/events")
+def backtest_events(job_id):
+    """
+    回测进度的 SSE 推送
+
+    事件数据为最新的K线日期、组合市值、现金、任务状态，以及上次推送之后的新订单。
+    每秒最多推送 rate 次（默认 2），两次推送之间的进度合并为一次；任务结束后关闭连接。
+    """
+    job, error = _get_job(job_id)
+    if error:
+        return error
+    interval = 1.0 / _int_arg("rate", 2, 1, MAX_EVENT_RATE)
+    subscription = CHANNEL.subscribe(job_id)
+    # 订阅之前任务已经结束时不会再有事件
+    subscription.merge({"status": job.status})
+
+    def stream():
+        try:
+            while True:
+                update = subscription.get(timeout=KEEPALIVE_INTERVAL)
+                if update is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: progress\ndata: {json.dumps(update, ensure_ascii=False, default=_json_value)}\n\n"
+                if update.get("status") in ("finished", "failed", "cancelled"):
+                    break
+                time.sleep(interval)
+        finally:
+            CHANNEL.unsubscribe(subscription)
+
+    return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/api/export/<table>.<fmt>")
+def export_table(table, fmt):
+    """
+    导出订单或回测日志，table 为 order/test_result，fmt 为 csv/parquet，run_id 参数只导出该回测批次
+
+    从服务端游标分块读取并逐块输出，不经过响应缓存
+    """
+    try:
+        chunks = iter_export(table, fmt, _int_arg("run_id"))
+    except ValueError as e:
+        raise BadRequest(str(e))
+    filename = f"{table}_{request.args['run_id']}.{fmt}" if request.args.get("run_id") else f"{table}.{fmt}"
+    return Response(stream_with_context(chunks), mimetype=FORMATS[fmt],
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=6666)
\ No newline at end of file
+    app.run(debug=True, host="0.0.0.0", port=6666)
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+import json
+from datetime import datetime
+
+from dbutils import DBUtil, PageResult
+
+class BacktestRun:
+    """回测批次模型"""
+
+    def __init__(self, params: dict, start_date: str, end_date: str, initial_cash: float,
+                 name: str = None, status: str = "running", started_at: datetime = None,
+                 finished_at: datetime = None, final_value: float = None, total_return: float = None,
+                 sharpe_ratio: float = None, max_drawdown: float = None, annual_return: float = None,
+                 total_trades: int = None, id: int = 0):
+        # 主键，保存后由数据库生成
+        self.id = id
+
+        # 批次名称
+        self.name = name
+
+        # 本次回测使用的策略参数
+        self.params = params
+
+        # 数据开始日期
+        self.start_date = start_date
+
+        # 数据结束日期
+        self.end_date = end_date
+
+        # 初始资金
+        self.initial_cash = initial_cash
+
+        # 状态：running 运行中；finished 已完成；failed 失败
+        self.status = status
+
+        # 开始时间
+        self.started_at = started_at or datetime.now()
+
+        # 结束时间
+        self.finished_at = finished_at
+
+        # 最终市值
+        self.final_value = final_value
+
+        # 总收益率（%）
+        self.total_return = total_return
+
+        # 夏普比率
+        self.sharpe_ratio = sharpe_ratio
+
+        # 最大回撤（%）
+        self.max_drawdown = max_drawdown
+
+        # 年化收益率（%）
+        self.annual_return = annual_return
+
+        # 总交易次数
+        self.total_trades = total_trades
+
+
+class BacktestRunManager:
+    """
+    回测批次管理 创建、完成、查询、删除
+
+    order 和 test_result 的每一行都带有 run_id。两张表按 run_id 做 LIST 分区时
+    （见 migrations/004_backtest_run.sql），创建批次时为其增加分区，删除批次直接丢弃分区；
+    未分区时按 (run_id, date) 索引分块删除，每次只锁定少量行。
+    """
+
+    # 查询、写入字段
+    FIELDS = ("name", "params", "start_date", "end_date", "initial_cash", "status", "started_at")
+
+    # 汇总指标字段
+    METRIC_FIELDS = ("final_value", "total_return", "sharpe_ratio", "max_drawdown", "annual_return", "total_trades")
+
+    # 写入语句
+    INSERT_SQL = DBUtil.insert_sql("backtest_run", FIELDS)
+
+    # 查询语句
+    SELECT_SQL = DBUtil.select_sql("backtest_run", ("id",) + FIELDS + ("finished_at",) + METRIC_FIELDS)
+
+    # 游标分页排序键
+    KEY_COLUMNS = ("id",)
+
+    # 带有 run_id 的结果表
+    RESULT_TABLES = ("order", "test_result")
+
+    # 未分区时每次删除的行数
+    delete_chunk_size = 5000
+
+    # 各结果表是否按 run_id 分区，首次使用时查询 information_schema
+    _partitioned = {}
+
+    @staticmethod
+    def to_row(run: BacktestRun) -> tuple:
+        """
+        转换为写入语句的参数
+
+        Args:
+            run: 回测批次
+        """
+        return (
+            run.name,
+            json.dumps(run.params, ensure_ascii=False, default=str),
+            run.start_date,
+            run.end_date,
+            DBUtil.to_number(run.initial_cash, 2),
+            run.status,
+            run.started_at.strftime("%Y-%m-%d %H:%M:%S")
+        )
+
+    @staticmethod
+    def from_row(row: tuple) -> BacktestRun:
+        """
+        查询结果转换为回测批次，字段顺序与 SELECT_SQL 一致
+
+        Args:
+            row: get/list_after 返回的一行数据
+        """
+        (run_id, name, params, start_date, end_date, initial_cash, status, started_at, finished_at,
+         final_value, total_return, sharpe_ratio, max_drawdown, annual_return, total_trades) = row[:15]
+        return BacktestRun(
+            id=int(run_id),
+            name=name,
+            params=json.loads(params) if isinstance(params, (str, bytes)) else params,
+            start_date=str(start_date),
+            end_date=str(end_date),
+            initial_cash=DBUtil.from_number(initial_cash),
+            status=status,
+            started_at=started_at,
+            finished_at=finished_at,
+            final_value=None if final_value is None else float(final_value),
+            total_return=total_return,
+            sharpe_ratio=sharpe_ratio,
+            max_drawdown=max_drawdown,
+            annual_return=annual_return,
+            total_trades=total_trades
+        )
+
+    @staticmethod
+    def is_partitioned(table: str) -> bool:
+        """
+        结果表是否按 run_id 做了 LIST 分区
+
+        Args:
+            table: 表名
+        """
+        if table not in BacktestRunManager._partitioned:
+            row = DBUtil.INS().get_one(
+                "SELECT COUNT(1) FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL", (table,))
+            if row is None:
+                return False
+            BacktestRunManager._partitioned[table] = row[0] > 0
+        return BacktestRunManager._partitioned[table]
+
+    @staticmethod
+    def create(run: BacktestRun) -> int:
+        """
+        保存回测批次，结果表已分区时为该批次增加分区
+
+        Args:
+            run: 回测批次，保存后 run.id 为生成的主键
+
+        Returns:
+            int: 批次主键，保存失败时为 0
+        """
+        run.id = DBUtil.INS().insert(BacktestRunManager.INSERT_SQL, BacktestRunManager.to_row(run))
+        if run.id:
+            for table in BacktestRunManager.RESULT_TABLES:
+                if BacktestRunManager.is_partitioned(table):
+                    DBUtil.INS().update(f"ALTER TABLE `{table}` ADD PARTITION (PARTITION p{run.id} VALUES IN ({run.id}))")
+        return run.id
+
+    @staticmethod
+    def finish(run_id: int, metrics: dict = None, status: str = "finished") -> int:
+        """
+        记录回测结束时间和汇总指标
+
+        Args:
+            run_id: 批次主键
+            metrics: collect_metrics 返回的回测指标，rnorm100 记为年化收益率
+            status: 结束状态 finished/failed
+        """
+        metrics = metrics or {}
+        values = {
+            "final_value": DBUtil.to_number(metrics.get("final_value"), 2),
+            "total_return": DBUtil.to_number(metrics.get("total_return")),
+            "sharpe_ratio": DBUtil.to_number(metrics.get("sharpe_ratio")),
+            "max_drawdown": DBUtil.to_number(metrics.get("max_drawdown")),
+            "annual_return": DBUtil.to_number(metrics.get("rnorm100")),
+            "total_trades": metrics.get("total_trades")
+        }
+        assignments = ", ".join(f"`{name}` = %s" for name in values)
+        sql = f"UPDATE `backtest_run` SET `status` = %s, `finished_at` = %s, {assignments} WHERE `id` = %s"
+        params = (status, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), *values.values(), run_id)
+        return DBUtil.INS().update(sql, params)
+
+    @staticmethod
+    def get(run_id: int) -> BacktestRun:
+        """
+        查询回测批次
+
+        Args:
+            run_id: 批次主键
+        """
+        row = DBUtil.INS().get_one(BacktestRunManager.SELECT_SQL + " WHERE `id` = %s", (run_id,))
+        return BacktestRunManager.from_row(row) if row else None
+
+    @staticmethod
+    def list_after(last_key: tuple = None, page_size: int = 10) -> PageResult:
+        """
+        游标分页回测批次
+
+        Args:
+            last_key: 上一页返回的 next_key，为 None 时从第一页开始
+            page_size：每页显示数量，默认10条数据
+        """
+        fields = ("id",) + BacktestRunManager.FIELDS + ("finished_at",) + BacktestRunManager.METRIC_FIELDS
+        return DBUtil.INS().get_page("backtest_run", fields, BacktestRunManager.KEY_COLUMNS, last_key, page_size)
+
+    @staticmethod
+    def delete_results(run_id: int, table: str) -> int:
+        """
+        删除结果表中某个批次的全部数据
+
+        Args:
+            run_id: 批次主键
+            table: 结果表名
+
+        Returns:
+            int: 删除的行数，丢弃分区时为 -1
+        """
+        if BacktestRunManager.is_partitioned(table):
+            DBUtil.INS().update(f"ALTER TABLE `{table}` DROP PARTITION p{int(run_id)}", raise_errors=True)
+            return -1
+        return BacktestRunManager._delete_chunked(table, "`run_id` = %s", (run_id,))
+
+    @staticmethod
+    def delete_results_since(run_id: int, date) -> dict:
+        """
+        删除某个批次在指定日期及之后的订单和回测日志，从检查点恢复前调用，避免重复写入
+
+        Args:
+            run_id: 批次主键，不能为 0
+            date: 开始日期（含）
+
+        Returns:
+            dict: {表名: 删除的行数}
+        """
+        if not run_id:
+            raise ValueError("run_id 不能为 0")
+        return {table: BacktestRunManager._delete_chunked(table, "`run_id` = %s AND `date` >= %s", (run_id, date))
+                for table in BacktestRunManager.RESULT_TABLES}
+
+    @staticmethod
+    def last_ids(run_id: int) -> dict:
+        """
+        各结果表中该批次的最大主键
+
+        Args:
+            run_id: 批次主键
+
+        Returns:
+            dict: {表名: 最大主键}，没有数据时为 0
+        """
+        last_ids = {}
+        for table in BacktestRunManager.RESULT_TABLES:
+            row = DBUtil.INS().get_one(f"SELECT MAX(`id`) FROM `{table}` WHERE `run_id` = %s", (run_id,))
+            last_ids[table] = int(row[0]) if row and row[0] is not None else 0
+        return last_ids
+
+    @staticmethod
+    def delete_results_after(run_id: int, last_ids: dict) -> dict:
+        """
+        删除某个批次在 last_ids 之后写入的订单和回测日志，增量更新前调用，清理上次中断的更新
+
+        Args:
+            run_id: 批次主键，不能为 0
+            last_ids: last_ids 返回的 {表名: 最大主键}
+
+        Returns:
+            dict: {表名: 删除的行数}
+        """
+        if not run_id:
+            raise ValueError("run_id 不能为 0")
+        return {table: BacktestRunManager._delete_chunked(table, "`run_id` = %s AND `id` > %s", (run_id, last_id))
+                for table, last_id in last_ids.items()}
+
+    @staticmethod
+    def extend(run_id: int, end_date: str) -> int:
+        """
+        增量更新后延长批次的数据结束日期
+
+        Args:
+            run_id: 批次主键
+            end_date: 新的数据结束日期
+        """
+        sql = "UPDATE `backtest_run` SET `end_date` = %s, `finished_at` = %s WHERE `id` = %s"
+        return DBUtil.INS().update(sql, (end_date, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), run_id))
+
+    @staticmethod
+    def _delete_chunked(table: str, where: str, params: tuple) -> int:
+        """
+        分块删除，每次只锁定少量行，返回删除的行数
+
+        Raises:
+            pymysql.err.Error: 某一块删除失败时停止并抛出，不把失败当成已删除完
+        """
+        total = 0
+        sql = f"DELETE FROM `{table}` WHERE {where} LIMIT %s"
+        while True:
+            count = DBUtil.INS().delete(sql, params + (BacktestRunManager.delete_chunk_size,), raise_errors=True)
+            total += count
+            if count < BacktestRunManager.delete_chunk_size:
+                return total
+
+    @staticmethod
+    def delete(run_id: int) -> dict:
+        """
+        删除回测批次及其订单、回测日志
+
+        Args:
+            run_id: 批次主键，不能为 0（0 为未关联批次的历史数据）
+
+        Returns:
+            dict: {表名: 删除的行数}
+
+        Raises:
+            RuntimeError: 订单或回测日志未能全部删除，此时保留批次记录，避免留下没有批次的结果数据
+        """
+        if not run_id:
+            raise ValueError("run_id 不能为 0")
+
+        deleted = {table: BacktestRunManager.delete_results(run_id, table) for table in BacktestRunManager.RESULT_TABLES}
+        # 确认结果数据已全部删除后才删除批次记录
+        for table in BacktestRunManager.RESULT_TABLES:
+            row = DBUtil.INS().get_one(f"SELECT COUNT(1) FROM `{table}` WHERE `run_id` = %s", (run_id,))
+            if row is None or row[0]:
+                raise RuntimeError(f"批次 {run_id} 的 {table} 数据未能全部删除，保留批次记录")
+        deleted["backtest_run"] = DBUtil.INS().delete("DELETE FROM `backtest_run` WHERE `id` = %s", (run_id,),
+                                                      raise_errors=True)
+        return deleted
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from dbutils import DBUtil
+
+class BatchWriter:
+    """
+    异步批量写入缓冲
+
+    收集待插入的数据行，满足以下任一条件时以多行 INSERT 批量写入：
+    1. 缓冲行数达到 batch_size
+    2. 距上次写入超过 flush_interval 秒
+    3. 显式调用 flush() 或 close()
+
+    写入在后台线程中进行，回测主循环只负责把数据行放入缓冲。
+    写入失败的批次连同其后的数据放回缓冲头部，等待 retry_backoff 秒后重试，连续失败时等待时间加倍；
+    close() 之后仍有数据未写入时抛出异常，由调用方把回测批次标记为失败。
+    """
+
+    def __init__(self, sql: str, batch_size: int = 500, flush_interval: float = 2.0, name: str = "batch-writer",
+                 retry_backoff: float = 1.0, max_backoff: float = 30.0, close_retries: int = 3):
+        # 带 %s 占位符的 INSERT 语句
+        self.sql = sql
+        
+        # 单批最大行数
+        self.batch_size = batch_size
+        
+        # 定时写入间隔（秒）
+        self.flush_interval = flush_interval
+
+        # 缓冲积压超过该行数时，由调用方同步写入，避免无限堆积
+        self.max_pending = batch_size * 4
+
+        # 写入失败后首次重试的等待时间（秒），连续失败时加倍，不超过 max_backoff
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+
+        # close() 时写入剩余数据的最多重试次数
+        self.close_retries = close_retries
+
+        # 写入统计
+        self.stats = {"rows": 0, "batches": 0, "failures": 0}
+
+        self._rows = []
+        # 连续失败次数和下次允许重试的时间
+        self._failed = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        # 保证多个批次按顺序写入
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def add(self, row: tuple) -> None:
+        """放入一行数据"""
+        if self._closed:
+            raise RuntimeError("BatchWriter 已关闭")
+
+        with self._lock:
+            self._rows.append(row)
+            pending = len(self._rows)
+
+        if pending >= self.max_pending:
+            self.flush()
+        elif pending >= self.batch_size:
+            self._wake.set()
+
+    def pending(self) -> int:
+        """缓冲中尚未写入的行数"""
+        with self._lock:
+            return len(self._rows)
+
+    @property
+    def failed(self) -> bool:
+        """缓冲中是否有写入失败、等待重试的数据"""
+        return self._failed > 0
+
+    def flush(self, force: bool = False) -> int:
+        """
+        写入缓冲中的全部数据，返回写入行数
+
+        Args:
+            force: 为 True 时忽略失败后的等待时间立即重试
+        """
+        with self._write_lock:
+            if not force and self._failed and time.monotonic() < self._retry_at:
+                return 0
+
+            with self._lock:
+                rows, self._rows = self._rows, []
+
+            written = 0
+            for i in range(0, len(rows), self.batch_size):
+                batch = rows[i:i + self.batch_size]
+                count = DBUtil.INS().save_batch(self.sql, batch)
+                if not count:
+                    # 失败的批次和之后的数据放回缓冲头部，保持写入顺序
+                    with self._lock:
+                        self._rows[:0] = rows[i:]
+                    self.stats["failures"] += 1
+                    self._failed += 1
+                    backoff = min(self.retry_backoff * 2 ** (self._failed - 1), self.max_backoff)
+                    self._retry_at = time.monotonic() + backoff
+                    break
+                written += count
+                self.stats["rows"] += count
+                self.stats["batches"] += 1
+            else:
+                self._failed = 0
+            return written
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._closed:
+                break
+            self.flush()
+
+    def close(self) -> None:
+        """
+        停止后台线程并写入剩余数据
+
+        Raises:
+            RuntimeError: 重试 close_retries 次后仍有数据未写入
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush(force=True)
+        for _ in range(self.close_retries):
+            if not self.pending():
+                return
+            time.sleep(max(0.0, self._retry_at - time.monotonic()))
+            self.flush(force=True)
+        pending = self.pending()
+        if pending:
+            raise RuntimeError(f"批量写入失败，{pending} 行数据未写入")
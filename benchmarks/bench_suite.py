@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+回测、持久化和数据加载热点路径的基准测试
+
+1. load_data: 空缓存（生成模拟行情、写 Parquet、计算指标）与已有缓存两次加载
+2. DualMovingAverageStrategy.next: 每根K线耗时，分别测不写库和批量写库
+3. OrderManager.save: 逐条写入与 BatchWriter 批量写入
+4. DBUtil.get_all: 不同深度的 OFFSET 分页，与同一位置的游标分页 get_page 对比
+
+行情由 StubProvider 生成，不访问网络；数据库默认使用临时目录中的 SQLite，
+--mysql 时使用 dbutils.mysql_config 配置的 MySQL（需先执行 init.sql），测试数据写入
+run_id = BENCH_RUN_ID 并在结束时删除。结果输出为 JSON，--baseline 传入之前保存的结果时
+附带各项耗时与基线的比值，便于比较不同提交。
+
+在仓库根目录运行: python -m benchmarks.bench_suite --years 4 --rows 100000 --output bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import testyf
+from dbutils import DBUtil
+from market_data import MarketDataCache, StubProvider
+from order import OrderInfo, OrderManager
+from utils import BacktestPrinter, QUIET
+
+# 基准测试数据的回测批次，MySQL 上测试结束后按批次删除；分页测试单独使用一个批次
+BENCH_RUN_ID = 900000001
+BENCH_PAGE_RUN_ID = 900000002
+
+
+class _TimedStrategy(testyf.DualMovingAverageStrategy):
+    """统计 next() 调用次数和耗时"""
+
+    def __init__(self):
+        super().__init__()
+        self.next_calls = 0
+        self.next_elapsed = 0.0
+
+    def next(self):
+        started = time.perf_counter()
+        super().next()
+        self.next_elapsed += time.perf_counter() - started
+        self.next_calls += 1
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def bench_load_data(cache_root: str, start: str, end: str, latency: float) -> tuple:
+    """空缓存和已有缓存各加载一次，返回 (结果, 数据源)"""
+    cache = MarketDataCache(cache_root, provider=StubProvider("2018-01-01", end, latency=latency))
+    timings = {}
+    for name in ("cold_s", "warm_s"):
+        started = time.perf_counter()
+        # load_data 逐个资产输出加载信息，计时期间不输出
+        with contextlib.redirect_stdout(io.StringIO()):
+            feeds = testyf.load_data(start, end, cache=cache)
+        timings[name] = time.perf_counter() - started
+    bars = sum(len(feed.p.dataname) for feed in feeds.values())
+    return {"symbols": len(feeds), "bars": bars, **timings}, cache
+
+
+def bench_strategy_next(cache: MarketDataCache, start: str, end: str, seed: int, run_id: int) -> dict:
+    """DualMovingAverageStrategy.next 每根K线的耗时"""
+    result = {}
+    for name, persist in (("memory", False), ("persist", True)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            feeds = testyf.load_data(start, end, cache=cache)
+        np.random.seed(seed)
+        cerebro = testyf.build_cerebro(feeds, strategy=_TimedStrategy, persist=persist, run_id=run_id)
+        started = time.perf_counter()
+        strat = cerebro.run()[0]
+        elapsed = time.perf_counter() - started
+        result[name] = {
+            "bars": strat.next_calls,
+            "run_s": elapsed,
+            "next_s": strat.next_elapsed,
+            "per_bar_us": strat.next_elapsed / max(strat.next_calls, 1) * 1e6
+        }
+    return result
+
+
+def _orders(count: int, run_id: int) -> list:
+    rng = np.random.default_rng(0)
+    symbols = testyf.strategy_symbols()
+    day = datetime(2019, 1, 1)
+    return [
+        OrderInfo(symbols[i % len(symbols)], day + timedelta(days=i // len(symbols)), "买入" if i % 2 else "卖出",
+                  float(rng.uniform(10, 500)), int(rng.integers(1, 1000)), float(rng.uniform(1e3, 1e6)),
+                  float(rng.uniform(1e6, 2e7)), run_id)
+        for i in range(count)
+    ]
+
+
+def bench_order_save(count: int, run_id: int) -> dict:
+    """OrderManager.save 逐条写入与批量写入"""
+    orders = _orders(count, run_id)
+    result = {"rows": count}
+
+    OrderManager.stop_batch()
+    started = time.perf_counter()
+    for order in orders:
+        OrderManager.save(order)
+    result["single_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    OrderManager.start_batch()
+    for order in orders:
+        OrderManager.save(order)
+    OrderManager.stop_batch()
+    result["batched_s"] = time.perf_counter() - started
+
+    result["single_per_row_us"] = result["single_s"] / count * 1e6
+    result["batched_per_row_us"] = result["batched_s"] / count * 1e6
+    result["speedup"] = result["single_s"] / result["batched_s"]
+    return result
+
+
+def _best_of(repeat: int, func) -> float:
+    elapsed = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - started)
+    return min(elapsed)
+
+
+def bench_get_all(rows: int, run_id: int, page_size: int, repeat: int) -> dict:
+    """不同深度的 OFFSET 分页与游标分页"""
+    db = DBUtil.INS()
+    for i in range(0, rows, 10000):
+        db.save_batch(OrderManager.INSERT_SQL, [OrderManager.to_row(o) for o in _orders(min(10000, rows - i), run_id)])
+
+    where, params = "`run_id` = %s", (run_id,)
+    sql = OrderManager.SELECT_SQL + " WHERE " + where
+    # 游标分页的起点：OFFSET 位置前一行的排序键
+    keys = [tuple(row) for row in db.stream(
+        f"SELECT `date`, `id` FROM `order` WHERE {where} ORDER BY `date`, `id`", params)]
+
+    offsets = []
+    for depth in (0.0, 0.25, 0.5, 0.9, 0.999):
+        page = int(depth * rows) // page_size + 1
+        offset = (page - 1) * page_size
+        last_key = keys[offset - 1] if offset else None
+        offsets.append({
+            "page": page,
+            "offset": offset,
+            "get_all_ms": _best_of(repeat, lambda: db.get_all(sql, page, page_size, params)) * 1e3,
+            "get_page_ms": _best_of(repeat, lambda: db.get_page(
+                "order", OrderManager.FIELDS, OrderManager.KEY_COLUMNS, last_key, page_size, where, params)) * 1e3
+        })
+    return {"rows": rows, "page_size": page_size, "offsets": offsets}
+
+
+def compare(result: dict, baseline: dict) -> dict:
+    """各项耗时与基线的比值，大于 1 表示变慢"""
+    ratios = {}
+
+    def walk(current, base, path):
+        if isinstance(current, dict) and isinstance(base, dict):
+            for key, value in current.items():
+                walk(value, base.get(key), f"{path}.{key}" if path else key)
+        elif isinstance(current, list) and isinstance(base, list):
+            for i, (value, base_value) in enumerate(zip(current, base)):
+                walk(value, base_value, f"{path}[{i}]")
+        elif path.endswith(("_s", "_ms", "_us")) and isinstance(base, (int, float)) and base > 0:
+            ratios[path] = current / base
+
+    walk(result, baseline, "")
+    return ratios
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回测、持久化和数据加载基准测试")
+    parser.add_argument("--years", type=int, default=4, help="模拟数据年数")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟数据源每次请求的延迟（秒）")
+    parser.add_argument("--seed", type=int, default=3, help="情绪得分随机种子")
+    parser.add_argument("--orders", type=int, default=2000, help="OrderManager.save 写入行数")
+    parser.add_argument("--rows", type=int, default=100000, help="get_all 测试表的订单行数")
+    parser.add_argument("--page-size", type=int, default=50, help="分页大小")
+    parser.add_argument("--repeat", type=int, default=3, help="分页查询重复次数，取最短耗时")
+    parser.add_argument("--mysql", action="store_true", help="使用 dbutils 配置的 MySQL，默认使用临时 SQLite")
+    parser.add_argument("--output", help="结果另存为 JSON 文件")
+    parser.add_argument("--baseline", help="之前保存的结果文件，输出各项耗时与其比值")
+    args = parser.parse_args()
+
+    start, end = "2019-05-10", f"{2019 + args.years - 1}-12-31"
+    BacktestPrinter.configure(level=QUIET, echo=False)
+    result = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "backend": "mysql" if args.mysql else "sqlite",
+        "start": start,
+        "end": end
+    }
+    with tempfile.TemporaryDirectory() as root:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if args.mysql:
+                db = DBUtil.INS()
+            else:
+                from benchmarks import sqlite_db
+                db = sqlite_db.install(os.path.join(root, "bench.db"))
+
+        try:
+            result["load_data"], cache = bench_load_data(os.path.join(root, "cache"), start, end, args.latency)
+            result["strategy_next"] = bench_strategy_next(cache, start, end, args.seed, BENCH_RUN_ID)
+            result["order_save"] = bench_order_save(args.orders, BENCH_RUN_ID)
+            result["get_all"] = bench_get_all(args.rows, BENCH_PAGE_RUN_ID, args.page_size, args.repeat)
+        finally:
+            if args.mysql:
+                for table in ("order", "test_result"):
+                    db.delete(f"DELETE FROM `{table}` WHERE `run_id` IN (%s, %s)", (BENCH_RUN_ID, BENCH_PAGE_RUN_ID))
+            db.close()
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+            result["baseline"] = {"commit": baseline.get("commit"), "ratios": compare(result, baseline)}
+
+    text = json.dumps(result, indent=2, ensure_ascii=False, default=float)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+DualMovingAverageStrategy 回测耗时与结果对比
+
+before: cerebro.run() 逐根K线事件循环
+after:  vector_engine.run_vectorized 在 (日期, 资产) 矩阵上运行
+
+两者使用同一份模拟行情面板和同一个情绪得分，输出各项指标的差异。
+
+在仓库根目录运行: python -m benchmarks.bench_vector --years 4 --repeat 5
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import testyf
+from market_data import MarketDataCache, StubProvider
+from utils import BacktestPrinter, QUIET
+from vector_engine import MarketArrays, run_vectorized
+
+METRICS = ("final_value", "total_return", "sharpe_ratio", "max_drawdown", "rnorm100",
+           "total_trades", "won_trades", "lost_trades")
+
+
+def run_backtrader(panel, start: str, end: str, initial_cash: float, seed: int, **params) -> tuple:
+    np.random.seed(seed)
+    cerebro = testyf.build_cerebro(panel.feeds(start, end, indicators=True), initial_cash, persist=False, **params)
+    started = time.perf_counter()
+    strat = cerebro.run()[0]
+    elapsed = time.perf_counter() - started
+    return testyf.collect_metrics(strat, initial_cash, cerebro.broker.getvalue()), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="backtrader 与向量化回测对比")
+    parser.add_argument("--years", type=int, default=4, help="模拟数据年数")
+    parser.add_argument("--cash", type=float, default=15000000, help="初始资金")
+    parser.add_argument("--hedge", type=float, default=0.3, help="max_hedge_ratio")
+    parser.add_argument("--seed", type=int, default=3, help="情绪得分随机种子")
+    parser.add_argument("--repeat", type=int, default=5, help="向量化回测重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    start, end = "2019-05-10", f"{2019 + args.years - 1}-12-31"
+    BacktestPrinter.configure(level=QUIET, echo=False)
+    with tempfile.TemporaryDirectory() as root:
+        cache = MarketDataCache(os.path.join(root, "cache"), provider=StubProvider("2019-01-01", end))
+        panel = testyf.build_panel(os.path.join(root, "panel"), start, end, cache=cache)
+
+        before, bt_elapsed = run_backtrader(panel, start, end, args.cash, args.seed, max_hedge_ratio=args.hedge)
+
+        started = time.perf_counter()
+        market = MarketArrays(panel, start, end)
+        prepare = time.perf_counter() - started
+        elapsed = []
+        for _ in range(args.repeat):
+            np.random.seed(args.seed)
+            after = run_vectorized(market, args.cash, max_hedge_ratio=args.hedge)
+            elapsed.append(after["elapsed"])
+
+    print(json.dumps({
+        "steps": market.shape[0],
+        "symbols": market.shape[1],
+        "backtrader_s": bt_elapsed,
+        "vector_prepare_s": prepare,
+        "vector_run_s": min(elapsed),
+        "speedup": bt_elapsed / min(elapsed),
+        "metrics": {name: {"backtrader": before[name], "vector": after[name]} for name in METRICS}
+    }, indent=2, default=float))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+波动率止损 Z-score 的每根K线耗时对比
+
+before: 每根K线为每个持仓重建20日收盘价列表，再调用 np.mean / np.std
+after:  RollingZScore 指标增量计算，策略中只读取 zscore[-1]
+
+在仓库根目录运行: python -m benchmarks.bench_zscore --symbols 16 --years 6
+"""
+import argparse
+import json
+import time
+
+import backtrader as bt
+import numpy as np
+
+from indicators import RollingZScore
+from market_data import StubProvider
+
+
+class _ZScoreBench(bt.Strategy):
+    params = (("mode", "after"),)
+
+    def __init__(self):
+        self.elapsed = 0.0
+        self.bars = 0
+        self.triggered = 0
+        if self.p.mode == "after":
+            self.close_zscore = {d._name: RollingZScore(d.close, period=20) for d in self.datas}
+
+    def next(self):
+        started = time.perf_counter()
+        for data in self.datas:
+            if len(data.close) < 20:
+                continue
+            if self.p.mode == "before":
+                close_prices = np.array([data.close[i] for i in range(-20, 0)])
+                z_score = ((close_prices - np.mean(close_prices)) / np.std(close_prices))[-1]
+            else:
+                z_score = self.close_zscore[data._name][-1]
+            if z_score < -1.5:
+                self.triggered += 1
+        self.elapsed += time.perf_counter() - started
+        self.bars += 1
+
+
+def run(mode: str, frames: dict) -> dict:
+    cerebro = bt.Cerebro()
+    for symbol, stock_data in frames.items():
+        cerebro.adddata(bt.feeds.PandasData(dataname=stock_data), name=symbol)
+    cerebro.addstrategy(_ZScoreBench, mode=mode)
+
+    started = time.perf_counter()
+    strat = cerebro.run()[0]
+    total = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "bars": strat.bars,
+        "per_bar_us": strat.elapsed / max(strat.bars, 1) * 1e6,
+        "total_run_s": total,
+        "triggered": strat.triggered
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Z-score 止损每根K线耗时对比")
+    parser.add_argument("--symbols", type=int, default=16, help="资产数量")
+    parser.add_argument("--years", type=int, default=6, help="模拟数据年数")
+    args = parser.parse_args()
+
+    provider = StubProvider("2019-01-01", f"{2019 + args.years - 1}-12-31")
+    frames = {f"S{i:03d}.US": provider.fetch(f"S{i:03d}.US") for i in range(args.symbols)}
+
+    before = run("before", frames)
+    after = run("after", frames)
+    print(json.dumps({
+        "symbols": args.symbols,
+        "before": before,
+        "after": after,
+        "speedup": before["per_bar_us"] / after["per_bar_us"] if after["per_bar_us"] else None
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试使用的 SQLite 数据库
+
+本机没有 MySQL 时代替 DBUtil 的连接：连接和游标的接口与 pymysql 一致，
+%s 占位符转换为 ?，表结构与 init.sql 中的 order、test_result 表相同（省略注释和默认值函数）。
+"""
+import sqlite3
+
+from dbutils import ConnectionPool, DBUtil
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS `order` (
+    `id`             INTEGER PRIMARY KEY AUTOINCREMENT,
+    `run_id`         BIGINT      NOT NULL DEFAULT 0,
+    `symbol`         VARCHAR(20) NOT NULL,
+    `date`           DATE        NOT NULL,
+    `action`         VARCHAR(8)  NOT NULL DEFAULT 'in',
+    `price`          DECIMAL(18, 4) NOT NULL,
+    `size`           INT         NOT NULL,
+    `total_cost`     DECIMAL(20, 2) NOT NULL,
+    `remaining_cash` DECIMAL(20, 2) NOT NULL,
+    `create_time`    DATETIME    DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS `idx_order_date` ON `order` (`date`);
+CREATE INDEX IF NOT EXISTS `idx_order_run_date` ON `order` (`run_id`, `date`);
+CREATE INDEX IF NOT EXISTS `idx_order_symbol_date` ON `order` (`symbol`, `date`);
+
+CREATE TABLE IF NOT EXISTS `test_result` (
+    `id`                 INTEGER PRIMARY KEY AUTOINCREMENT,
+    `run_id`             BIGINT  NOT NULL DEFAULT 0,
+    `date`               DATE    NOT NULL,
+    `hsi_rsi`            DOUBLE,
+    `spx_rsi`            DOUBLE,
+    `vix`                DOUBLE,
+    `volatility_limiter` DOUBLE  NOT NULL,
+    `sentiment_scores`   DOUBLE,
+    `news_weight`        DOUBLE  NOT NULL,
+    `max_hedge_ratio`    DOUBLE  NOT NULL,
+    `rebalance_window`   INT     NOT NULL,
+    `commission`         DOUBLE  NOT NULL,
+    `slippage`           DOUBLE  NOT NULL,
+    `day_stop_loss`      INT     NOT NULL,
+    `remaining_cash`     DECIMAL(20, 2) NOT NULL,
+    `create_time`        DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS `idx_test_result_date` ON `test_result` (`date`);
+CREATE INDEX IF NOT EXISTS `idx_test_result_run_date` ON `test_result` (`run_id`, `date`);
+"""
+
+
+def _translate(sql: str) -> str:
+    return sql.replace("%s", "?")
+
+
+class SQLiteCursor:
+    """pymysql 风格的游标"""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    @property
+    def lastrowid(self) -> int:
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=None) -> int:
+        self._cursor.execute(_translate(sql), tuple(params or ()))
+        return self._cursor.rowcount
+
+    def executemany(self, sql, args) -> int:
+        self._cursor.executemany(_translate(sql), [tuple(row) for row in args])
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size: int):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self) -> None:
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SQLiteConnection:
+    """pymysql 风格的连接，批量写入在后台线程中进行，因此允许跨线程使用"""
+
+    def __init__(self, path: str):
+        # DATE 字段与 pymysql 一样返回 datetime.date
+        self._con = sqlite3.connect(path, timeout=30, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+
+    def cursor(self, cursor_class=None) -> SQLiteCursor:
+        # SSCursor 等游标类型忽略，SQLite 本身就是逐行读取
+        return SQLiteCursor(self._con.cursor())
+
+    def ping(self, reconnect: bool = False) -> None:
+        self._con.execute("SELECT 1")
+
+    def commit(self) -> None:
+        self._con.commit()
+
+    def rollback(self) -> None:
+        self._con.rollback()
+
+    def close(self) -> None:
+        self._con.close()
+
+
+def install(path: str) -> DBUtil:
+    """
+    创建表结构，并把 DBUtil 的连接池替换为 SQLite 连接
+
+    Args:
+        path: 数据库文件路径
+    """
+    con = sqlite3.connect(path)
+    con.executescript(SCHEMA)
+    con.close()
+
+    db = DBUtil.INS()
+    db.close()
+    db.pool = ConnectionPool(lambda: SQLiteConnection(path), min_size=1, max_size=4)
+    db._count_cache.clear()
+    return db
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import os
+import pickle
+from datetime import datetime
+
+class Checkpoint:
+    """回测检查点模型，记录某根K线结束时的策略状态"""
+
+    def __init__(self, bar: int, date: datetime, persist_from: int, initialized: bool, cash: float,
+                 value: float, positions: dict, trades: list, all_trades: list, sentiment_scores: dict = None,
+                 run_id: int = 0, config: dict = None, created_at: datetime = None, time: datetime = None,
+                 orders: list = None, cash_additions: list = None, last_ids: dict = None):
+        # K线序号，即该K线上 len(strategy)
+        self.bar = bar
+
+        # K线时间（策略时钟，全部资产交易日的并集）
+        self.time = time
+
+        # K线日期（datas[0] 的日期，与订单、回测日志的日期一致）
+        self.date = date
+
+        # 与 date 同一日期的第一根K线序号，恢复时从该K线开始重新写入订单和回测日志
+        self.persist_from = persist_from
+
+        # 是否已完成初始建仓
+        self.initialized = initialized
+
+        # 现金余额
+        self.cash = cash
+
+        # 组合市值
+        self.value = value
+
+        # 持仓 {资产代码: (数量, 均价)}，只包含非空仓位
+        self.positions = positions
+
+        # 策略记录的交易 self.trades
+        self.trades = trades
+
+        # 策略记录的全部交易 self.all_trades
+        self.all_trades = all_trades
+
+        # AI 情绪得分，恢复时沿用，保证重放与原运行一致
+        self.sentiment_scores = sentiment_scores or {}
+
+        # 回测批次
+        self.run_id = run_id
+
+        # 回测配置：开始结束日期、初始资金和策略参数，恢复时必须一致
+        self.config = config or {}
+
+        # 保存时间
+        self.created_at = created_at or datetime.now()
+
+        # 以下只在期末状态中保存，供增量更新使用
+        # 尚未成交的订单 [(资产代码, 带符号数量)]
+        self.orders = orders or []
+
+        # 尚未入账的现金调整（交易成本）
+        self.cash_additions = cash_additions or []
+
+        # 保存时各结果表中该批次的最大主键 {表名: id}，增量更新前删除之后写入的数据
+        self.last_ids = last_ids or {}
+
+
+class CheckpointFile:
+    """
+    回测检查点文件
+
+    策略每隔 every 根K线把状态写入本地文件（先写临时文件再替换，中途崩溃不会损坏上一个检查点）。
+    backtrader 的数据线、指标和分析器无法序列化，恢复时从头重放：检查点之前的K线照常计算，
+    但不写订单和回测日志、不输出日志；到达检查点K线时核对现金和持仓，恢复策略状态后继续。
+    重放只有计算开销，长回测的主要耗时在逐K线写库。
+    """
+
+    def __init__(self, path: str, every: int = 60, config: dict = None):
+        # 检查点文件路径
+        self.path = path
+
+        # 检查点间隔（K线数）
+        self.every = every
+
+        # 回测配置，写入检查点并在恢复时校验
+        self.config = config or {}
+
+        # 恢复运行时读取到的检查点，为 None 时从头运行
+        self.resume_from = None
+
+    def load(self) -> Checkpoint:
+        """
+        读取检查点，作为本次运行的恢复起点
+
+        Returns:
+            Checkpoint: 文件不存在时为 None
+
+        Raises:
+            ValueError: 检查点的回测配置与本次运行不一致
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            checkpoint = pickle.load(f)
+        if self.config and checkpoint.config != self.config:
+            changed = sorted(name for name in set(self.config) | set(checkpoint.config)
+                             if self.config.get(name) != checkpoint.config.get(name))
+            raise ValueError(f"检查点 {self.path} 的回测配置与本次运行不一致: {changed}")
+        self.resume_from = checkpoint
+        return checkpoint
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        """写入检查点"""
+        checkpoint.config = self.config
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def remove(self) -> None:
+        """回测完成后删除检查点"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,5 +1,12 @@
 # -*- coding: utf-8 -*-
+import base64
 import json
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache
+
 import pymysql
 
 mysql_config = {
@@ -11,6 +18,20 @@ mysql_config = {
     "charsets": "UTF8"
 }
 
+# 连接池配置
+pool_config = {
+    # 最小空闲连接数，启动时预先建立
+    "minSize": 1,
+    # 最大连接数（空闲 + 借出）
+    "maxSize": 8,
+    # 空闲连接超时时间（秒），超时后关闭
+    "idleTimeout": 300,
+    # 借出连接时等待的最长时间（秒），None 表示一直等待
+    "waitTimeout": 30,
+    # 借出连接前是否检测连接可用性
+    "pingOnCheckout": True
+}
+
 class PageResult:
     """MySQL 分页查询结果"""
 
@@ -36,6 +57,48 @@ class PageResult:
         # 分页结束
         self.eop = False
 
+        # 游标分页：当前页最后一行的排序键，作为下一页的起点
+        self.next_key = None
+
+        # 游标分页：next_key 编码后的续页令牌
+        self.next_token = None
+
+    @staticmethod
+    def encode_key(key) -> str:
+        """将排序键编码为续页令牌"""
+        if key is None:
+            return None
+        raw = json.dumps(list(key), default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_key(token: str):
+        """将续页令牌还原为排序键"""
+        if not token:
+            return None
+        return tuple(json.loads(base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8")))
+
+    def load_seek_data(self, data: [], next_key, records: int = None):
+        """
+        加载游标分页数据
+
+        Args:
+            data: 当前页数据
+            next_key: 下一页的起点排序键，没有下一页时为 None
+            records: 总记录数，未统计时为 None
+        """
+        self.data = data
+        self.next_key = next_key
+        self.next_token = PageResult.encode_key(next_key)
+        self.eop = next_key is None
+
+        if records is not None:
+            self.records = records
+            self.pages = (records - 1) // self.page_size + 1 if records > 0 else 0
+        else:
+            self.records = None
+            self.pages = None
+
     def load_page_data(self, data: [], records: int):
         # 当前页数据
         self.data = data
@@ -53,19 +116,208 @@ class PageResult:
         self.eop = self.page == self.pages
 
 
+class ConnectionPool:
+    """
+    线程安全的有界连接池
+
+    复用数据库连接，避免每条语句都重新进行 TCP 握手和认证：
+    1. 空闲连接超过 idle_timeout 后关闭
+    2. 借出时 ping 检测连接是否可用，不可用则重新建立
+    3. 借出连接数达到 max_size 时阻塞等待归还
+    4. 归还时回滚未提交的事务，下次借出的连接不会沿用旧的读快照
+    """
+
+    def __init__(self, creator, min_size: int = 1, max_size: int = 8,
+                 idle_timeout: float = 300, wait_timeout: float = 30,
+                 ping_on_checkout: bool = True):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"连接池大小配置错误: min_size={min_size}, max_size={max_size}")
+
+        # 创建新连接的函数
+        self.creator = creator
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self.ping_on_checkout = ping_on_checkout
+
+        # 空闲连接队列，元素为 (连接, 归还时间)
+        self._idle = deque()
+        # 当前连接总数（空闲 + 借出）
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # 连接池统计
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "creates": 0,
+            "closes": 0,
+            "ping_failures": 0
+        }
+
+        for _ in range(min_size):
+            self._idle.append((self._create(), time.monotonic()))
+            self._size += 1
+
+    def _count(self, key: str) -> None:
+        with self._cond:
+            self._stats[key] += 1
+
+    def _create(self):
+        con = self.creator()
+        self._count("creates")
+        return con
+
+    def _discard(self, con) -> None:
+        try:
+            con.close()
+        except Exception:
+            pass
+        self._count("closes")
+
+    def _is_alive(self, con) -> bool:
+        try:
+            con.ping(reconnect=False)
+            return True
+        except Exception:
+            self._count("ping_failures")
+            return False
+
+    def _evict_idle(self, now: float) -> None:
+        """关闭超时的空闲连接，保留 min_size 个"""
+        while self._idle and self._size > self.min_size:
+            con, released = self._idle[0]
+            if now - released < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._discard(con)
+
+    def _create_reserved(self):
+        """为已占位的名额建立连接，失败时归还占位"""
+        try:
+            return self._create()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def acquire(self):
+        """借出一个连接，连接池耗尽时等待"""
+        deadline = None if self.wait_timeout is None else time.monotonic() + self.wait_timeout
+        con = None
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed:
+                    raise RuntimeError("连接池已关闭")
+
+                self._evict_idle(time.monotonic())
+                if self._idle:
+                    # 后进先出，优先复用最近使用过的热连接
+                    con, _ = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # 先占位，在锁外建立连接
+                    self._size += 1
+                    break
+
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"等待数据库连接超时（{self.wait_timeout}秒）")
+                self._cond.wait(remaining)
+
+            self._stats["checkouts"] += 1
+
+        if con is None:
+            return self._create_reserved()
+
+        if self.ping_on_checkout and not self._is_alive(con):
+            self._discard(con)
+            return self._create_reserved()
+        return con
+
+    def release(self, con, discard: bool = False) -> None:
+        """
+        归还连接
+
+        Args:
+            con: 借出的连接
+            discard: 连接已损坏时为 True，直接关闭不再复用
+        """
+        if not discard and not self._closed:
+            # 结束未提交的事务：只读查询也会在 REPEATABLE READ 下开启快照，
+            # 不结束的话复用这个连接的查询会一直读到旧数据
+            try:
+                con.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            if discard or self._closed:
+                self._size -= 1
+                self._discard(con)
+            else:
+                self._idle.append((con, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """借出连接的上下文，退出时自动归还；发生数据库连接错误时丢弃该连接"""
+        con = self.acquire()
+        broken = False
+        try:
+            yield con
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(con, discard=broken)
+
+    def stats(self) -> dict:
+        """连接池统计信息"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            return stats
+
+    def close(self) -> None:
+        """关闭所有空闲连接，借出的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                con, _ = self._idle.popleft()
+                self._size -= 1
+                self._discard(con)
+            self._cond.notify_all()
+
+
 class DBUtil:
     """MySQL 工具类"""
     _instance = None
-    
-    db = None
-    cursor = None
+    _lock = threading.Lock()
 
     def __new__(cls, *args, **kwargs):
         if not cls._instance:
-            cls._instance = super(DBUtil, cls).__new__(cls, *args, **kwargs)
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super(DBUtil, cls).__new__(cls, *args, **kwargs)
 
         return cls._instance
 
+    # 游标分页总记录数缓存时间（秒）
+    count_cache_ttl = 60
+
+    # 游标分页总记录数缓存的最大条目数，超过后淘汰最久未使用的条目
+    count_cache_size = 1024
+
     def __init__(self):
         if not hasattr(self, 'initialized'):
             self.initialized = True
@@ -76,42 +328,122 @@ class DBUtil:
             self.dbName = mysql_config['dbName']
             #self.charsets = mysql_config['charsets']
             print("配置文件：" + json.dumps(mysql_config))
-    
+            self.pool = None
+            # 总记录数缓存 {(sql, params): (记录数, 过期时间)}，按最近使用顺序排列，多个请求线程共用
+            self._count_cache = OrderedDict()
+            self._count_lock = threading.Lock()
+
     @staticmethod
     def INS():
         return DBUtil()
 
-    # 链接数据库
-    def get_con(self):
-        """获取数据库连接"""
-        self.db = pymysql.connect(
+    def _connect(self):
+        """建立一个新的数据库连接"""
+        return pymysql.connect(
             host=self.host,
             port=self.port,
             user=self.userName,
             passwd=self.password,
             db=self.dbName
         )
-        self.cursor = self.db.cursor()
+
+    def _get_pool(self) -> ConnectionPool:
+        # 首次使用时才建立连接池，避免导入模块时就连接数据库
+        if self.pool is None:
+            with DBUtil._lock:
+                if self.pool is None:
+                    self.pool = ConnectionPool(
+                        self._connect,
+                        min_size=pool_config['minSize'],
+                        max_size=pool_config['maxSize'],
+                        idle_timeout=pool_config['idleTimeout'],
+                        wait_timeout=pool_config['waitTimeout'],
+                        ping_on_checkout=pool_config['pingOnCheckout']
+                    )
+        return self.pool
+
+    # 链接数据库
+    def get_con(self):
+        """从连接池借出数据库连接，用法: with DBUtil.INS().get_con() as db"""
+        return self._get_pool().connection()
 
     # 关闭链接
     def close(self):
-        self.cursor.close()
-        self.db.close()
+        """关闭连接池"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    # 连接池统计
+    def pool_stats(self) -> dict:
+        return self._get_pool().stats()
+
+    # 生成 INSERT 语句模板
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def insert_sql(table: str, columns: tuple) -> str:
+        """
+        生成带 %s 占位符的 INSERT 语句，相同表和字段只生成一次
+
+        Args:
+            table: 表名
+            columns: 字段元组
+        """
+        fields = ", ".join(f"`{c}`" for c in columns)
+        placeholders = ", ".join(["%s"] * len(columns))
+        return f"INSERT INTO `{table}`({fields}) VALUES ({placeholders})"
+
+    # 生成 SELECT 语句模板
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def select_sql(table: str, columns: tuple) -> str:
+        """
+        生成 SELECT 语句，相同表和字段只生成一次
+
+        Args:
+            table: 表名
+            columns: 字段元组
+        """
+        fields = ", ".join(f"`{c}`" for c in columns)
+        return f"SELECT {fields} FROM `{table}`"
+
+    # 数值写入参数
+    @staticmethod
+    def to_number(value, digits: int = None):
+        """
+        转换为 DECIMAL/DOUBLE 字段的写入参数，NaN 和无穷大写入 NULL
+
+        Args:
+            value: 数值，支持 numpy 数值类型
+            digits: 保留的小数位数，与 DECIMAL 字段的小数位一致，为 None 时不舍入
+        """
+        if value is None:
+            return None
+        value = float(value)
+        if value != value or value in (float("inf"), float("-inf")):
+            return None
+        return round(value, digits) if digits is not None else value
+
+    # 数值查询结果
+    @staticmethod
+    def from_number(value) -> float:
+        """DECIMAL 字段查询结果为 Decimal，统一转换为 float，NULL 转换为 NaN"""
+        return float("nan") if value is None else float(value)
 
     # 主键查询数据
-    def get_one(self, sql):
+    def get_one(self, sql, params: tuple = None):
         res = None
         try:
-            self.get_con()
-            self.cursor.execute(sql)
-            res = self.cursor.fetchone()
-            self.close()
+            with self.get_con() as db:
+                with db.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    res = cursor.fetchone()
         except Exception as e:
             print("查询失败！" + str(e))
         return res
 
     # 查询列表数据
-    def get_all(self, sql, page: int, page_size: int = 10) -> PageResult:
+    def get_all(self, sql, page: int, page_size: int = 10, params: tuple = None) -> PageResult:
         result = PageResult(page, page_size)
         try:
             fields = sql[len("select "):sql.lower().index(' from')]
@@ -120,43 +452,300 @@ class DBUtil:
             offset = (page - 1) * page_size
             sql = sql + f" limit {offset}, {page_size}"
 
-            self.get_con()
-            self.cursor.execute(sql_records)
-            records = self.cursor.fetchone()[0]
+            with self.get_con() as db:
+                with db.cursor() as cursor:
+                    cursor.execute(sql_records, params)
+                    records = cursor.fetchone()[0]
 
-            if records > 0:
-                self.cursor.execute(sql)
-                data = self.cursor.fetchall()
-                self.close()
-            else:
-                data = []
+                    if records > 0:
+                        cursor.execute(sql, params)
+                        data = cursor.fetchall()
+                    else:
+                        data = []
 
             result.load_page_data(data, records)
         except Exception as e:
             print("查询失败！" + str(e))
         return result
 
+    # 统计记录数（带缓存）
+    def _count(self, cursor, sql: str, params: tuple) -> int:
+        """查询总记录数，结果缓存 count_cache_ttl 秒，最多缓存 count_cache_size 条"""
+        cache_key = (sql, params)
+        with self._count_lock:
+            cached = self._count_cache.get(cache_key)
+            if cached is not None and cached[1] > time.monotonic():
+                self._count_cache.move_to_end(cache_key)
+                return cached[0]
+
+        cursor.execute(sql, params)
+        records = cursor.fetchone()[0]
+
+        with self._count_lock:
+            now = time.monotonic()
+            # 写入时清理已过期的条目，再按最近使用顺序淘汰超出上限的条目
+            for key in [key for key, (_, expires) in self._count_cache.items() if expires <= now]:
+                del self._count_cache[key]
+            self._count_cache[cache_key] = (records, now + self.count_cache_ttl)
+            self._count_cache.move_to_end(cache_key)
+            while len(self._count_cache) > self.count_cache_size:
+                self._count_cache.popitem(last=False)
+        return records
+
+    @staticmethod
+    def _seek_condition(key_columns: tuple) -> str:
+        """
+        生成 (k1, k2, ...) > (v1, v2, ...) 的展开条件
+
+        首列额外加上 k1 >= v1，便于 MySQL 使用索引做范围扫描
+        """
+        condition = None
+        for column in reversed(key_columns):
+            if condition is None:
+                condition = f"`{column}` > %s"
+            else:
+                condition = f"`{column}` > %s OR (`{column}` = %s AND ({condition}))"
+        return f"`{key_columns[0]}` >= %s AND ({condition})"
+
+    @staticmethod
+    def _seek_params(last_key: tuple) -> list:
+        params = [last_key[0]]
+        for i, value in enumerate(last_key):
+            params.append(value)
+            if i < len(last_key) - 1:
+                params.append(value)
+        return params
+
+    # 过滤条件
+    @staticmethod
+    def filter_condition(equals: dict = None, ranges: dict = None) -> tuple:
+        """
+        生成 get_page / iter_pages 的 where 条件，值为 None 的条件忽略
+
+        Args:
+            equals: {字段: 值}，生成 `字段` = %s
+            ranges: {字段: (下限, 上限)}，闭区间，生成 `字段` >= %s / `字段` <= %s
+
+        Returns:
+            tuple: (where, params)，没有条件时 where 为 None
+        """
+        conditions = []
+        params = []
+        for column, value in (equals or {}).items():
+            if value is not None:
+                conditions.append(f"`{column}` = %s")
+                params.append(value)
+        for column, (low, high) in (ranges or {}).items():
+            if low is not None:
+                conditions.append(f"`{column}` >= %s")
+                params.append(low)
+            if high is not None:
+                conditions.append(f"`{column}` <= %s")
+                params.append(high)
+        return (" AND ".join(conditions) if conditions else None), tuple(params)
+
+    # 游标分页查询
+    def get_page(self, table: str, fields: list, key_columns: tuple, last_key: tuple = None,
+                 page_size: int = 10, where: str = None, params: tuple = (),
+                 with_count: bool = False) -> PageResult:
+        """
+        游标（keyset）分页查询
+
+        按 key_columns 排序，从 last_key 之后开始读取一页，不使用 OFFSET，
+        翻页耗时与页码无关。
+
+        Args:
+            table: 表名
+            fields: 查询字段
+            key_columns: 排序键字段，组合后必须唯一，例如 ("date", "id")
+            last_key: 上一页返回的 next_key，为 None 时从第一页开始
+            page_size: 每页数据量
+            where: 附加过滤条件，使用 %s 占位符
+            params: where 条件的参数
+            with_count: 是否统计总记录数（结果缓存 count_cache_ttl 秒）
+
+        Raises:
+            ValueError: last_key 与 key_columns 长度不一致
+            pymysql.err.Error: 查询失败时直接抛出，不返回空页，避免调用方当成数据已经结束
+        """
+        result = PageResult(1, page_size)
+        conditions = []
+        args = list(params)
+        if where:
+            conditions.append(f"({where})")
+        if last_key is not None:
+            if len(last_key) != len(key_columns):
+                raise ValueError(f"排序键长度不匹配: {last_key}")
+            conditions.append(f"({self._seek_condition(key_columns)})")
+            args.extend(self._seek_params(last_key))
+
+        columns = ", ".join(f"`{f}`" for f in list(fields) + list(key_columns))
+        order_by = ", ".join(f"`{k}`" for k in key_columns)
+        sql = f"SELECT {columns} FROM `{table}`"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        # 多取一行用于判断是否还有下一页
+        sql += f" ORDER BY {order_by} LIMIT {page_size + 1}"
+
+        records = None
+        with self.get_con() as db:
+            with db.cursor() as cursor:
+                if with_count:
+                    sql_records = f"SELECT COUNT(1) FROM `{table}`" + (f" WHERE {where}" if where else "")
+                    records = self._count(cursor, sql_records, tuple(params))
+                cursor.execute(sql, args)
+                rows = cursor.fetchall()
+
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        width = len(fields)
+        data = [row[:width] for row in rows]
+        next_key = tuple(rows[-1][width:]) if has_more else None
+        result.load_seek_data(data, next_key, records)
+        return result
+
+    # 游标分页遍历
+    def iter_pages(self, table: str, fields: list, key_columns: tuple, page_size: int = 1000,
+                   where: str = None, params: tuple = (), last_key: tuple = None):
+        """
+        逐页遍历查询结果，每次翻页都从上一页的排序键继续，总耗时与记录数成线性关系
+
+        查询失败时抛出异常，中途出错不会被当成遍历结束
+        """
+        page = 0
+        while True:
+            result = self.get_page(table, fields, key_columns, last_key, page_size, where, params)
+            page += 1
+            result.page = page
+            yield result
+            if result.eop or result.next_key is None:
+                break
+            last_key = result.next_key
+
+    # 流式查询
+    def stream(self, sql, params: tuple = (), chunk_size: int = None):
+        """
+        基于服务端游标（SSCursor）的流式查询，内存占用与结果集大小无关
+
+        查询期间独占一个连接；提前结束遍历时该连接不再复用，
+        避免为了读完剩余结果而阻塞。
+
+        Args:
+            sql: 查询语句，可使用 %s 占位符
+            params: 查询参数
+            chunk_size: 为 None 时逐行返回，否则每次返回不超过 chunk_size 行的列表
+        """
+        pool = self._get_pool()
+        db = pool.acquire()
+        finished = False
+        try:
+            cursor = db.cursor(pymysql.cursors.SSCursor)
+            try:
+                cursor.execute(sql, params)
+                if chunk_size:
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        yield rows
+                else:
+                    for row in cursor:
+                        yield row
+                finished = True
+            finally:
+                if finished:
+                    cursor.close()
+        except Exception as e:
+            print("查询失败！" + str(e))
+            raise
+        finally:
+            pool.release(db, discard=not finished)
+
     # 插入数据
-    def __insert(self, sql):
+    def __insert(self, sql, params: tuple = None, raise_errors: bool = False):
         count = 0
         try:
-            self.get_con()
-            count = self.cursor.execute(sql)
-            self.db.commit()
-            self.close()
+            with self.get_con() as db:
+                try:
+                    with db.cursor() as cursor:
+                        count = cursor.execute(sql, params)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
         except Exception as e:
-           print("操作失败！" + str(e))
-           self.db.rollback()
+            if raise_errors:
+                raise
+            print("操作失败！" + str(e))
         return count
 
     # 保存数据
-    def save(self, sql):
-        return self.__insert(sql)
+    def save(self, sql, params: tuple = None):
+        return self.__insert(sql, params)
+
+    # 保存数据并返回自增主键
+    def insert(self, sql, params: tuple = None) -> int:
+        """
+        写入一行数据，返回自增主键，写入失败时返回 0
+
+        Args:
+            sql: 带 %s 占位符的 INSERT 语句
+            params: 参数
+        """
+        row_id = 0
+        try:
+            with self.get_con() as db:
+                try:
+                    with db.cursor() as cursor:
+                        cursor.execute(sql, params)
+                        row_id = cursor.lastrowid
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+        except Exception as e:
+           print("操作失败！" + str(e))
+           row_id = 0
+        return row_id
+
+    # 批量保存数据
+    def save_batch(self, sql, args: list):
+        """
+        批量保存数据，一次提交
+
+        Args:
+            sql: 带 %s 占位符的 INSERT 语句，pymysql 会将其合并为多行 INSERT
+            args: 每行的参数列表
+        """
+        count = 0
+        if not args:
+            return count
+        try:
+            with self.get_con() as db:
+                try:
+                    with db.cursor() as cursor:
+                        count = cursor.executemany(sql, args)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+        except Exception as e:
+           print("批量操作失败！" + str(e))
+        return count
 
     # 更新数据
-    def update(self, sql):
-        return self.__insert(sql)
+    def update(self, sql, params: tuple = None, raise_errors: bool = False):
+        """
+        Args:
+            raise_errors: 为 True 时抛出数据库错误，否则打印错误并返回 0
+        """
+        return self.__insert(sql, params, raise_errors)
 
     # 删除数据
-    def delete(self, sql):
-        return self.__insert(sql)
+    def delete(self, sql, params: tuple = None, raise_errors: bool = False):
+        """
+        Args:
+            raise_errors: 为 True 时抛出数据库错误，否则打印错误并返回 0；
+                分块删除需要区分“没有可删除的行”和“删除失败”
+        """
+        return self.__insert(sql, params, raise_errors)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+订单和回测日志导出
+
+从服务端游标（DBUtil.stream）分块读取，每块写成 CSV 文本或 Parquet 行组后立即输出，
+内存占用只与 chunk_size 有关，与导出的行数无关。
+
+命令行: python export.py order orders.parquet --run-id 3
+"""
+import argparse
+import csv
+import io
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from order import OrderManager
+from test_result import TestResultManager
+
+# 可导出的表 {表名: 管理类}
+TABLES = {
+    "order": OrderManager,
+    "test_result": TestResultManager
+}
+
+# 导出格式 {格式: 响应类型}
+FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# 整数字段，其余数值字段导出为 double
+INT_FIELDS = ("size", "rebalance_window", "day_stop_loss", "run_id")
+
+# 字符串字段
+STRING_FIELDS = ("symbol", "action")
+
+
+def schema(table: str) -> pa.Schema:
+    """Parquet 文件结构，字段顺序与管理类的 FIELDS 一致"""
+    fields = []
+    for name in TABLES[table].FIELDS:
+        if name == "date":
+            fields.append(pa.field(name, pa.date32()))
+        elif name in STRING_FIELDS:
+            fields.append(pa.field(name, pa.string()))
+        elif name in INT_FIELDS:
+            fields.append(pa.field(name, pa.int64()))
+        else:
+            fields.append(pa.field(name, pa.float64()))
+    return pa.schema(fields)
+
+
+def _chunks(table: str, run_id: int = None, chunk_size: int = 10000):
+    if table not in TABLES:
+        raise ValueError(f"不支持导出的表: {table}")
+    return TABLES[table].iter_all(chunk_size=chunk_size, run_id=run_id)
+
+
+def iter_csv(table: str, run_id: int = None, chunk_size: int = 10000):
+    """
+    逐块生成 CSV 内容（UTF-8），第一块为表头
+
+    Args:
+        table: 表名 order/test_result
+        run_id: 只导出该回测批次，为 None 时导出整张表
+        chunk_size: 每次从游标读取的行数
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(TABLES[table].FIELDS)
+    for rows in _chunks(table, run_id, chunk_size):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """ParquetWriter 的输出目标，写入的内容在每个行组之后取出"""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _record_batch(rows: list, table_schema: pa.Schema) -> pa.RecordBatch:
+    columns = list(zip(*rows))
+    arrays = []
+    for field, values in zip(table_schema, columns):
+        if pa.types.is_floating(field.type):
+            # DECIMAL 字段查询结果为 Decimal
+            values = [None if value is None else float(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=table_schema)
+
+
+def iter_parquet(table: str, run_id: int = None, chunk_size: int = 10000):
+    """
+    逐块生成 Parquet 文件内容，每次从游标读取的行写成一个行组
+
+    Args:
+        table: 表名 order/test_result
+        run_id: 只导出该回测批次，为 None 时导出整张表
+        chunk_size: 每次从游标读取的行数，即行组大小
+    """
+    table_schema = schema(table)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, table_schema, compression="snappy")
+    try:
+        for rows in _chunks(table, run_id, chunk_size):
+            writer.write_batch(_record_batch(rows, table_schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(table: str, fmt: str, run_id: int = None, chunk_size: int = 10000):
+    """按格式逐块生成导出内容，格式为 csv/parquet"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    if table not in TABLES:
+        raise ValueError(f"不支持导出的表: {table}")
+    return (iter_csv if fmt == "csv" else iter_parquet)(table, run_id, chunk_size)
+
+
+def export(table: str, path: str, fmt: str = None, run_id: int = None, chunk_size: int = 10000) -> int:
+    """
+    导出到文件
+
+    Args:
+        table: 表名 order/test_result
+        path: 输出文件路径
+        fmt: csv/parquet，为 None 时按文件扩展名判断
+        run_id: 只导出该回测批次，为 None 时导出整张表
+        chunk_size: 每次从游标读取的行数
+
+    Returns:
+        int: 写入的字节数
+    """
+    fmt = fmt or path.rsplit(".", 1)[-1].lower()
+    size = 0
+    with open(path, "wb") as f:
+        for chunk in iter_export(table, fmt, run_id, chunk_size):
+            f.write(chunk)
+            size += len(chunk)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出订单或回测日志")
+    parser.add_argument("table", choices=sorted(TABLES), help="表名")
+    parser.add_argument("path", help="输出文件，扩展名为 .csv 或 .parquet")
+    parser.add_argument("--format", choices=sorted(FORMATS), help="导出格式，默认按扩展名判断")
+    parser.add_argument("--run-id", type=int, help="只导出该回测批次")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="每次从游标读取的行数")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    size = export(args.table, args.path, args.format, args.run_id, args.chunk_size)
+    print(f"导出完成 {args.path}: {size} 字节, 耗时: {time.perf_counter() - started:.2f}秒")
+
+
+if __name__ == '__main__':
+    main()
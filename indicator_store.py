@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from indicators import rsi_values, stddev_values, zscore_values
+
+# 预计算的指标线，顺序与指标面板第三维一致
+INDICATOR_FIELDS = ("rsi14", "stddev20", "zscore20")
+
+# 各指标的最短周期，与 bt.indicators.RSI(14) / StandardDeviation(20) / RollingZScore(20) 一致
+INDICATOR_MINPERIODS = {"rsi14": 15, "stddev20": 20, "zscore20": 20}
+
+
+def precompute(close) -> dict:
+    """
+    向量化计算单个资产的全部预计算指标
+
+    Args:
+        close: 收盘价序列，必须与回测时数据源提供的K线完全一致（同一起止日期、不含停牌日）
+
+    Returns:
+        dict: {指标名: ndarray}，长度与 close 相同
+    """
+    close = np.asarray(close, dtype=np.float64)
+    return {
+        "rsi14": rsi_values(close, 14),
+        "stddev20": stddev_values(close, 20),
+        "zscore20": zscore_values(close, 20)
+    }
+
+
+def snapshot_key(*arrays) -> str:
+    """行情快照的哈希值，数据或日期范围变化时随之变化"""
+    digest = hashlib.sha1(",".join(INDICATOR_FIELDS).encode("utf-8"))
+    for values in arrays:
+        values = np.ascontiguousarray(values)
+        digest.update(str(values.dtype).encode("utf-8"))
+        digest.update(values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+class IndicatorCache:
+    """
+    预计算指标缓存
+
+    与行情缓存放在同一目录下的 indicators 子目录，文件名中带有行情快照的哈希值：
+    同一份行情数据只计算一次，参数扫描的各组参数直接读取结果。
+    """
+
+    def __init__(self, root: str = "data_cache"):
+        # 缓存目录
+        self.root = os.path.join(root, "indicators")
+
+    def _path(self, name: str, key: str, suffix: str) -> str:
+        return os.path.join(self.root, f"{name.replace('/', '_')}_{key}{suffix}")
+
+    @staticmethod
+    def compute_panel(close: np.ndarray) -> np.ndarray:
+        """
+        计算面板窗口内全部资产的指标，不读写缓存
+
+        Args:
+            close: 收盘价 (日期, 资产)，停牌日为 NaN
+        """
+        values = np.full(close.shape + (len(INDICATOR_FIELDS),), np.nan)
+        for j in range(close.shape[1]):
+            # 与 PanelFeed 一致，只使用收盘价不为 NaN 的K线
+            rows = np.flatnonzero(~np.isnan(close[:, j]))
+            for k, series in enumerate(precompute(close[rows, j]).values()):
+                values[rows, j, k] = series
+        return values
+
+    def load_frame(self, symbol: str, stock_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        读取或计算单个资产的指标
+
+        Args:
+            symbol: 资产代码
+            stock_data: 回测使用的日线数据，包含 Close 列
+
+        Returns:
+            DataFrame: 与 stock_data 相同索引，列为 INDICATOR_FIELDS
+        """
+        close = stock_data["Close"].to_numpy(dtype=np.float64)
+        key = snapshot_key(stock_data.index.values.astype("datetime64[ns]").astype(np.int64), close)
+        path = self._path(symbol, key, ".parquet")
+        if os.path.exists(path):
+            try:
+                return pd.read_parquet(path)
+            except Exception as e:
+                print(f"读取指标缓存失败 {path}: {e}")
+
+        indicators = pd.DataFrame(precompute(close), index=stock_data.index)
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        indicators.to_parquet(tmp)
+        os.replace(tmp, path)
+        return indicators
+
+    def load_panel(self, name: str, close: np.ndarray) -> np.ndarray:
+        """
+        读取或计算价格面板一个日期窗口内全部资产的指标
+
+        Args:
+            name: 面板名称
+            close: 窗口内的收盘价 (日期, 资产)，停牌日为 NaN
+
+        Returns:
+            ndarray: (日期, 资产, 指标)，停牌日为 NaN，以只读内存映射方式打开
+        """
+        key = snapshot_key(close)
+        path = self._path(name, key, ".npy")
+        if os.path.exists(path):
+            return np.load(path, mmap_mode="r")
+
+        values = IndicatorCache.compute_panel(close)
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, values)
+        os.replace(tmp, path)
+        return np.load(path, mmap_mode="r")
+
+
+class IndicatorPandasData(bt.feeds.PandasData):
+    """带有预计算指标线的 PandasData，指标列名与线名相同"""
+
+    lines = INDICATOR_FIELDS
+    params = tuple((field, -1) for field in INDICATOR_FIELDS)
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import math
+from array import array
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+
+def rsi_values(close, period: int = 14) -> np.ndarray:
+    """
+    向量化计算 RSI，与 bt.indicators.RSI 的结果逐位一致
+
+    涨跌幅使用 Wilder 平滑（SMMA，alpha = 1/period），种子为前 period 个值的简单平均；
+    前 period 个结果为 NaN。
+
+    Args:
+        close: 收盘价序列
+        period: 周期
+    """
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+
+    up = np.maximum(close[1:] - close[:-1], 0.0)
+    down = np.maximum(close[:-1] - close[1:], 0.0)
+
+    def _smma(values):
+        seed = math.fsum(values[:period]) / period
+        series = pd.Series(np.concatenate(([seed], values[period:])))
+        return series.ewm(alpha=1.0 / period, adjust=False).mean().to_numpy()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = _smma(up) / _smma(down)
+    out[period:] = 100.0 - 100.0 / (1.0 + rs)
+    return out
+
+
+def stddev_values(values, period: int = 20) -> np.ndarray:
+    """
+    向量化计算滚动总体标准差，与 bt.indicators.StandardDeviation 相同：sqrt(|E[x²] - E[x]²|)
+
+    Args:
+        values: 数据序列
+        period: 窗口长度，前 period - 1 个结果为 NaN
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) < period:
+        return out
+
+    windows = np.lib.stride_tricks.sliding_window_view(values, period)
+    mean = windows.mean(axis=1)
+    meansq = (windows * windows).mean(axis=1)
+    out[period - 1:] = np.sqrt(np.abs(meansq - mean * mean))
+    return out
+
+
+def zscore_values(values, period: int = 20) -> np.ndarray:
+    """
+    向量化计算滚动 Z-score，与 RollingZScore 的批量计算结果一致
+
+    Args:
+        values: 数据序列
+        period: 窗口长度，前 period - 1 个结果为 NaN；标准差为 0 时结果为 NaN
+    """
+    src = np.asarray(values, dtype=np.float64)
+    out = np.full(len(src), np.nan)
+    if len(src) < period:
+        return out
+
+    # 以窗口为单位做差分的累加和，首个窗口结束于 period - 1
+    csum = np.concatenate(([0.0], np.cumsum(src)))
+    csumsq = np.concatenate(([0.0], np.cumsum(src * src)))
+    idx = np.arange(period - 1, len(src))
+    mean = (csum[idx + 1] - csum[idx + 1 - period]) / period
+    var = (csumsq[idx + 1] - csumsq[idx + 1 - period]) / period - mean * mean
+
+    valid = var > 1e-12 * np.maximum(mean * mean, 1.0)
+    zscore = np.full(len(idx), np.nan)
+    zscore[valid] = (src[idx][valid] - mean[valid]) / np.sqrt(var[valid])
+    out[period - 1:] = zscore
+    return out
+
+
+class RollingZScore(bt.Indicator):
+    """
+    滚动 Z-score 指标
+
+    zscore = (当前值 - 最近 period 个值的均值) / 最近 period 个值的总体标准差
+
+    逐根计算时维护窗口内的累加和与平方和，每根 K 线 O(1) 更新；
+    批量计算（runonce）时使用 NumPy 累加和一次算出全部结果。
+    标准差为 0 时结果为 NaN。
+    """
+
+    lines = ('zscore',)
+    params = (('period', 20),)
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+        self._sum = 0.0
+        self._sumsq = 0.0
+
+    def _push(self):
+        value = self.data[0]
+        self._sum += value
+        self._sumsq += value * value
+        if len(self.data) > self.p.period:
+            # 窗口已满，移出最早的一个值
+            oldest = self.data[-self.p.period]
+            self._sum -= oldest
+            self._sumsq -= oldest * oldest
+
+    def prenext(self):
+        self._push()
+
+    def next(self):
+        self._push()
+        period = self.p.period
+        mean = self._sum / period
+        var = self._sumsq / period - mean * mean
+        if var > 1e-12 * max(mean * mean, 1.0):
+            self.lines.zscore[0] = (self.data[0] - mean) / var ** 0.5
+        else:
+            self.lines.zscore[0] = float('nan')
+
+    def once(self, start, end):
+        period = self.p.period
+        if end < period:
+            return
+
+        first = max(start, period - 1)
+        zscore = zscore_values(self.data.array[:end], period)
+        self.lines.zscore.array[first:end] = array('d', zscore[first:end])
+
+
+class PrecomputedLine(bt.Indicator):
+    """
+    把数据源中预计算的指标线包装为指标
+
+    只复制数值，不做计算；period 与对应的 backtrader 指标的最短周期一致，
+    保证策略开始调用 next 的K线与在线计算指标时相同。
+    """
+
+    lines = ('value',)
+    params = (('period', 1),)
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+
+    def next(self):
+        self.lines.value[0] = self.data[0]
+
+    def once(self, start, end):
+        self.lines.value.array[start:end] = self.data.array[start:end]
@@ -4,33 +4,86 @@ CREATE DATABASE IF NOT EXISTS `demo`  DEFAULT CHARACTER SET utf8mb4  COLLATE utf
 -- 创建订单表
 DROP TABLE IF EXISTS `demo`.`order`;
 CREATE TABLE IF NOT EXISTS `demo`.`order` (
-    `symbol`         varchar(50)                 not null comment '股票代码',
+    `id`             bigint                      not null auto_increment comment '主键',
+    `run_id`         bigint      default 0       not null comment '回测批次',
+    `symbol`         varchar(20)                 not null comment '股票代码',
     `date`           date                        not null comment '交易日期',
-    `action`         varchar(20) default 'in'    not null comment '交易动作（in买入/out卖出）',
-    `price`          varchar(100)                not null comment '成交价格',
-    `size`           varchar(100)                not null comment '成交数量',
-    `total_cost`     varchar(100)                not null comment '总成本',
-    `remaining_cash` varchar(100)                not null comment '剩余资金',
-    `create_time`    datetime    default (now()) null comment '创建日期'
+    `action`         varchar(8)  default 'in'    not null comment '交易动作（in买入/out卖出）',
+    `price`          decimal(18, 4)              not null comment '成交价格',
+    `size`           int                         not null comment '成交数量',
+    `total_cost`     decimal(20, 2)              not null comment '总成本',
+    `remaining_cash` decimal(20, 2)              not null comment '剩余资金',
+    `create_time`    datetime    default (now()) null comment '创建日期',
+    primary key (`id`),
+    key `idx_order_date` (`date`),
+    key `idx_order_run_date` (`run_id`, `date`),
+    key `idx_order_symbol_date` (`symbol`, `date`)
 ) comment '订单日志';
 
 -- 创建订单表
 DROP TABLE IF EXISTS `demo`.`test_result`;
 CREATE TABLE IF NOT EXISTS `demo`.`test_result` (
+    `id`                  bigint                       not null auto_increment comment '主键',
+    `run_id`              bigint      default 0        not null comment '回测批次',
     `date`                date                         not null comment '交易日期',
-    `hsi_rsi`             varchar(100)                 not null comment '恒生指数 相对强弱指数',
-    `spx_rsi`             varchar(100)                 not null comment '标普500指数 相对强弱指数',
-    `vix`                 varchar(100)                 not null comment '波动率 恐慌指数',
-    `volatility_limiter`  varchar(100)                 not null comment '波动率限制',
-    `sentiment_scores`    varchar(100)                 not null comment 'AI情绪得分',
-    `news_weight`         varchar(100)                 not null comment 'AI新闻权重',
-    `max_hedge_ratio`     varchar(100)                 not null comment '对冲比例',
-    `rebalance_window`    varchar(100)                 not null comment '对冲窗口',
-    `commission`          varchar(100)                 not null comment '交易佣金率',
-    `slippage`            varchar(100)                 not null comment '滑点成本',
-    `day_stop_loss`       varchar(100)                 not null comment '最大持仓天数',
-    `remaining_cash`      varchar(100)                 not null comment '剩余资金',
-    `create_time`         datetime    default (now())  null     comment '创建日期'
+    `hsi_rsi`             double                       null     comment '恒生指数 相对强弱指数',
+    `spx_rsi`             double                       null     comment '标普500指数 相对强弱指数',
+    `vix`                 double                       null     comment '波动率 恐慌指数',
+    `volatility_limiter`  double                       not null comment '波动率限制',
+    `sentiment_scores`    double                       null     comment 'AI情绪得分',
+    `news_weight`         double                       not null comment 'AI新闻权重',
+    `max_hedge_ratio`     double                       not null comment '对冲比例',
+    `rebalance_window`    int                          not null comment '对冲窗口',
+    `commission`          double                       not null comment '交易佣金率',
+    `slippage`            double                       not null comment '滑点成本',
+    `day_stop_loss`       int                          not null comment '最大持仓天数',
+    `remaining_cash`      decimal(20, 2)               not null comment '剩余资金',
+    `create_time`         datetime    default (now())  null     comment '创建日期',
+    primary key (`id`),
+    key `idx_test_result_date` (`date`),
+    key `idx_test_result_run_date` (`run_id`, `date`)
 ) comment '回测日志';
 
+-- 创建参数扫描结果表
+DROP TABLE IF EXISTS `demo`.`sweep_result`;
+CREATE TABLE IF NOT EXISTS `demo`.`sweep_result` (
+    `id`                  bigint                       not null auto_increment comment '主键',
+    `sweep_id`            varchar(64)                  not null comment '扫描批次',
+    `params`              json                         not null comment '策略参数',
+    `max_hedge_ratio`     double                       not null comment '对冲比例',
+    `rebalance_window`    int                          not null comment '再平衡周期',
+    `volatility_limiter`  double                       not null comment '波动率限制',
+    `time_stop_loss`      int                          not null comment '最大持仓天数',
+    `ai_news_weight`      double                       not null comment 'AI情绪权重',
+    `final_value`         decimal(20, 2)               null     comment '最终市值',
+    `total_return`        double                       null     comment '总收益率（%）',
+    `sharpe_ratio`        double                       null     comment '夏普比率',
+    `max_drawdown`        double                       null     comment '最大回撤（%）',
+    `annual_return`       double                       null     comment '年化收益率（%）',
+    `total_trades`        int                          null     comment '总交易次数',
+    `create_time`         datetime    default (now())  null     comment '创建日期',
+    primary key (`id`),
+    key `idx_sweep_result_sweep` (`sweep_id`, `sharpe_ratio`)
+) comment '参数扫描结果';
 
+-- 创建回测批次表
+DROP TABLE IF EXISTS `demo`.`backtest_run`;
+CREATE TABLE IF NOT EXISTS `demo`.`backtest_run` (
+    `id`                  bigint                       not null auto_increment comment '主键',
+    `name`                varchar(100)                 null     comment '批次名称',
+    `params`              json                         not null comment '策略参数',
+    `start_date`          date                         not null comment '数据开始日期',
+    `end_date`            date                         not null comment '数据结束日期',
+    `initial_cash`        decimal(20, 2)               not null comment '初始资金',
+    `status`              varchar(16) default 'running' not null comment '状态（running/finished/failed）',
+    `started_at`          datetime                     not null comment '开始时间',
+    `finished_at`         datetime                     null     comment '结束时间',
+    `final_value`         decimal(20, 2)               null     comment '最终市值',
+    `total_return`        double                       null     comment '总收益率（%）',
+    `sharpe_ratio`        double                       null     comment '夏普比率',
+    `max_drawdown`        double                       null     comment '最大回撤（%）',
+    `annual_return`       double                       null     comment '年化收益率（%）',
+    `total_trades`        int                          null     comment '总交易次数',
+    primary key (`id`),
+    key `idx_backtest_run_started` (`started_at`)
+) comment '回测批次';
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from progress import CHANNEL
+
+# run_backtest 可由任务指定的参数，策略参数另见 DualMovingAverageStrategy.params
+RUN_PARAMS = ("start", "end", "initial_cash", "panel_path")
+
+# 可由任务指定的运行参数，其余 testyf.RUNTIME_PARAMS 由任务队列和 run_backtest 设置
+JOB_RUNTIME_PARAMS = ("persist",)
+
+# 任务进程内的进度主题，每个进程只运行一个回测
+JOB_TOPIC = "job"
+
+
+class JobQueueFull(RuntimeError):
+    """排队任务数已达上限"""
+
+
+class JobCancelled(Exception):
+    """任务进程收到取消信号"""
+
+
+class BacktestJob:
+    """回测任务模型"""
+
+    def __init__(self, params: dict, client: str = None):
+        # 任务编号
+        self.id = uuid.uuid4().hex
+
+        # run_backtest 的参数
+        self.params = params
+
+        # 提交任务的客户端，用于限制每个客户端同时运行的任务数
+        self.client = client
+
+        # 状态：queued 排队中；running 运行中；finished 已完成；failed 失败；cancelled 已取消
+        self.status = "queued"
+
+        # 提交时间
+        self.submitted_at = datetime.now()
+
+        # 开始运行时间
+        self.started_at = None
+
+        # 结束时间
+        self.finished_at = None
+
+        # run_backtest 返回的回测指标
+        self.summary = None
+
+        # 失败原因
+        self.error = None
+
+        # 是否已请求取消
+        self.cancel_requested = False
+
+        # 运行任务的进程
+        self.process = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("finished", "failed", "cancelled")
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "client": self.client,
+            "submitted_at": self.submitted_at.isoformat(timespec="seconds"),
+            "started_at": self.started_at.isoformat(timespec="seconds") if self.started_at else None,
+            "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+            "run_id": (self.summary or {}).get("run_id"),
+            "error": self.error
+        }
+
+
+def _cancel_handler(signum, frame):
+    raise JobCancelled("任务已取消")
+
+
+def _forward_progress(subscription, conn, lock: threading.Lock, interval: float, stop: threading.Event) -> None:
+    """任务进程内把合并后的进度每隔 interval 秒发送给主进程"""
+    while not stop.is_set():
+        update = subscription.get(timeout=interval)
+        if update is not None:
+            with lock:
+                conn.send(("progress", update))
+        stop.wait(interval)
+
+
+def _run_job(params: dict, conn, progress_interval: float = 0.2) -> None:
+    """
+    在任务进程中运行回测
+
+    运行期间通过管道发送 ("progress", 进度)，结束时发送 (状态, 指标或错误信息)，状态为 finished/failed/cancelled
+    """
+    # SIGTERM 转换为异常，run_backtest 据此把回测批次标记为失败
+    signal.signal(signal.SIGTERM, _cancel_handler)
+    # 回测过程的逐K线输出对服务端没有意义
+    sys.stdout = open(os.devnull, "w")
+    lock = threading.Lock()
+    stop = threading.Event()
+    subscription = CHANNEL.subscribe(JOB_TOPIC)
+    forwarder = threading.Thread(target=_forward_progress, args=(subscription, conn, lock, progress_interval, stop),
+                                 name="progress-forwarder", daemon=True)
+    forwarder.start()
+    try:
+        from testyf import run_backtest
+        from utils import QUIET
+        metrics = run_backtest(log_level=QUIET, progress=JOB_TOPIC, **params)
+        result = ("finished", {name: value.item() if hasattr(value, "item") else value
+                               for name, value in metrics.items()})
+    except JobCancelled as e:
+        result = ("cancelled", str(e))
+    except Exception:
+        result = ("failed", traceback.format_exc())
+    stop.set()
+    forwarder.join()
+    CHANNEL.unsubscribe(subscription)
+    with lock:
+        update = subscription.get(timeout=0)
+        if update is not None:
+            conn.send(("progress", update))
+        conn.send(result)
+    conn.close()
+
+
+class JobQueue:
+    """
+    回测任务队列
+
+    Web 请求只负责提交任务和查询状态，回测在独立的工作进程中运行：
+    1. 同时运行的任务数不超过 max_workers，其余任务按提交顺序排队，排队数超过 max_queued 时拒绝提交
+    2. 每个客户端同时运行的任务数不超过 max_per_client，轮到已达上限的客户端时跳过，先运行其他客户端的任务
+    3. 排队中的任务直接取消；运行中的任务向进程发送 SIGTERM，grace 秒后仍未退出则强制结束
+    4. 任务进程的回测进度和最终状态发布到 progress.CHANNEL，主题为任务编号
+
+    每个任务使用一个新进程（spawn 启动），运行中的任务可以取消，结束后内存随进程释放。
+    """
+
+    def __init__(self, max_workers: int = 2, max_queued: int = 20, max_per_client: int = 1,
+                 max_history: int = 500, grace: float = 10.0):
+        # 最大并发任务数
+        self.max_workers = max_workers
+
+        # 最大排队任务数
+        self.max_queued = max_queued
+
+        # 每个客户端最大并发任务数
+        self.max_per_client = max_per_client
+
+        # 保留的已结束任务数，超过后删除最早结束的任务
+        self.max_history = max_history
+
+        # 取消运行中任务时等待进程退出的时间（秒）
+        self.grace = grace
+
+        # 全部任务 {任务编号: BacktestJob}，按提交顺序排列
+        self._jobs = OrderedDict()
+        self._queue = deque()
+        self._running = {}
+        self._cond = threading.Condition()
+        self._context = multiprocessing.get_context("spawn")
+        self._dispatcher = None
+        self._closed = False
+
+    @staticmethod
+    def validate(params: dict) -> dict:
+        """
+        检查任务参数，只允许 run_backtest 的数据参数和 DualMovingAverageStrategy 的策略参数
+
+        Raises:
+            ValueError: 包含未知参数或运行参数
+        """
+        from testyf import RUNTIME_PARAMS, DualMovingAverageStrategy
+        allowed = set(RUN_PARAMS) | set(DualMovingAverageStrategy.params._getkeys())
+        reserved = set(RUNTIME_PARAMS) - set(JOB_RUNTIME_PARAMS)
+        unknown = sorted(name for name in params if name not in allowed or name in reserved)
+        if unknown:
+            raise ValueError(f"不支持的回测参数: {unknown}")
+        return dict(params)
+
+    def submit(self, params: dict, client: str = None) -> BacktestJob:
+        """
+        提交回测任务
+
+        Args:
+            params: run_backtest 的参数
+            client: 客户端标识
+
+        Raises:
+            ValueError: 参数错误
+            JobQueueFull: 排队任务数已达上限
+        """
+        job = BacktestJob(JobQueue.validate(params), client)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("任务队列已关闭")
+            if len(self._queue) >= self.max_queued:
+                raise JobQueueFull(f"排队任务数已达上限 {self.max_queued}")
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._prune()
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="job-dispatcher", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id: str) -> BacktestJob:
+        """查询任务，不存在时返回 None"""
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def list(self, client: str = None) -> list:
+        """全部任务，client 不为 None 时只返回该客户端的任务"""
+        with self._cond:
+            return [job for job in self._jobs.values() if client is None or job.client == client]
+
+    def position(self, job: BacktestJob) -> int:
+        """排队中的任务前面还有多少个任务，不在排队中时返回 None"""
+        with self._cond:
+            for i, queued in enumerate(self._queue):
+                if queued is job:
+                    return i
+        return None
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消任务
+
+        Returns:
+            bool: 任务不存在或已结束时返回 False
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return False
+            if job.status == "queued":
+                self._queue.remove(job)
+                self._finish(job, "cancelled", error="任务已取消")
+                return True
+            job.cancel_requested = True
+            process = job.process
+        process.terminate()
+        timer = threading.Timer(self.grace, lambda: process.is_alive() and process.kill())
+        timer.daemon = True
+        timer.start()
+        return True
+
+    def shutdown(self) -> None:
+        """取消全部排队和运行中的任务"""
+        with self._cond:
+            self._closed = True
+            job_ids = [job.id for job in list(self._queue) + list(self._running.values())]
+            self._cond.notify_all()
+        for job_id in job_ids:
+            self.cancel(job_id)
+
+    def _running_count(self, client: str) -> int:
+        return sum(1 for job in self._running.values() if job.client == client)
+
+    def _next_job(self) -> BacktestJob:
+        """按提交顺序选出下一个可运行的任务，跳过已达并发上限的客户端"""
+        if len(self._running) >= self.max_workers:
+            return None
+        for job in self._queue:
+            if job.client is None or self._running_count(job.client) < self.max_per_client:
+                return job
+        return None
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None and not self._closed:
+                    self._cond.wait()
+                    job = self._next_job()
+                if self._closed:
+                    return
+                self._queue.remove(job)
+                receiver, sender = self._context.Pipe(duplex=False)
+                job.process = self._context.Process(target=_run_job, args=(job.params, sender),
+                                                    name=f"backtest-{job.id[:8]}", daemon=True)
+                job.process.start()
+                sender.close()
+                job.status = "running"
+                job.started_at = datetime.now()
+                self._running[job.id] = job
+                CHANNEL.publish(job.id, {"status": job.status})
+            threading.Thread(target=self._wait, args=(job, receiver), name=f"job-{job.id[:8]}", daemon=True).start()
+
+    def _wait(self, job: BacktestJob, receiver) -> None:
+        """转发任务进程的进度，等待任务进程返回结果"""
+        status, value = None, None
+        try:
+            while True:
+                status, value = receiver.recv()
+                if status != "progress":
+                    break
+                CHANNEL.publish(job.id, value)
+        except EOFError:
+            status, value = None, None
+        finally:
+            receiver.close()
+        job.process.join()
+
+        with self._cond:
+            if status == "finished":
+                self._finish(job, status, summary=value)
+            elif status == "cancelled" or job.cancel_requested:
+                self._finish(job, "cancelled", error="任务已取消")
+            else:
+                self._finish(job, "failed", error=value or f"任务进程异常退出，退出码 {job.process.exitcode}")
+
+    def _finish(self, job: BacktestJob, status: str, summary: dict = None, error: str = None) -> None:
+        job.status = status
+        job.summary = summary
+        job.error = error
+        job.finished_at = datetime.now()
+        job.process = None
+        self._running.pop(job.id, None)
+        self._cond.notify_all()
+        CHANNEL.publish(job.id, {"status": status})
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
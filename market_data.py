@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，不加文件锁，只依赖临时文件替换保证文件完整
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+# 行情字段统一命名，与 bt.feeds.PandasData 的自动识别规则一致
+COLUMNS_RENAME = {
+    'date': 'datetime',
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close': 'Close',
+    'volume': 'Volume'
+}
+
+
+class AkshareProvider:
+    """
+    akshare 行情数据源
+
+    港股使用 stock_hk_daily，美股使用 stock_us_daily。
+    两个接口都只能返回全部历史，start 参数在本地过滤。
+    """
+
+    name = "akshare"
+
+    def fetch(self, symbol: str, adjust: str = "qfq", start=None) -> pd.DataFrame:
+        """
+        下载单个资产的日线数据
+
+        Args:
+            symbol: 资产代码，例如 00700.HK、AAPL.US
+            adjust: 复权方式
+            start: 只返回该日期之后（含）的数据，为 None 时返回全部
+
+        Returns:
+            DataFrame: 以 datetime 为索引，包含 Open/High/Low/Close/Volume 列
+        """
+        # 延迟导入，命中缓存时不需要加载 akshare
+        import akshare as ak
+
+        if '.HK' in symbol:
+            stock_data = ak.stock_hk_daily(symbol=symbol.replace('.HK', ''), adjust=adjust)
+        elif '.US' in symbol:
+            stock_data = ak.stock_us_daily(symbol=symbol.replace('.US', ''), adjust=adjust)
+        else:
+            raise ValueError(f"不支持的市场: {symbol}")
+
+        if stock_data is None or stock_data.empty:
+            return pd.DataFrame()
+
+        stock_data = normalize_frame(stock_data)
+        if start is not None:
+            stock_data = stock_data.loc[pd.Timestamp(start):]
+        return stock_data
+
+
+class StubProvider:
+    """
+    本地模拟行情数据源
+
+    按资产代码生成固定的随机游走日线，不访问网络，用于测试和基准测试。
+    """
+
+    name = "stub"
+
+    def __init__(self, start: str = "2018-01-01", end: str = "2025-12-31", latency: float = 0.0, seed: int = 0):
+        # 模拟数据的日期范围
+        self.start = start
+        self.end = end
+
+        # 模拟网络延迟（秒）
+        self.latency = latency
+
+        # 随机种子，与资产代码共同决定生成的数据
+        self.seed = seed
+
+    def fetch(self, symbol: str, adjust: str = "qfq", start=None) -> pd.DataFrame:
+        if self.latency:
+            time.sleep(self.latency)
+
+        index = pd.bdate_range(self.start, self.end, name="datetime")
+        rng = np.random.default_rng(zlib.crc32(symbol.encode("utf-8")) + self.seed)
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(index))))
+        open_ = close * (1 + rng.normal(0, 0.003, len(index)))
+        stock_data = pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.005, len(index)))),
+            'Low': np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.005, len(index)))),
+            'Close': close,
+            'Volume': rng.integers(100000, 10000000, len(index)).astype(float)
+        }, index=index)
+
+        if start is not None:
+            stock_data = stock_data.loc[pd.Timestamp(start):]
+        return stock_data
+
+
+class RateLimiter:
+    """令牌桶限流器，线程安全"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        # 每秒允许的请求数
+        self.rate = rate
+
+        # 允许的突发请求数
+        self.burst = burst
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """取得一个令牌，令牌不足时等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedProvider:
+    """
+    为行情数据源增加按市场限流和失败重试
+
+    市场由资产代码后缀决定（HK/US），每个市场使用独立的限流器；
+    下载失败时按指数退避重试。
+    """
+
+    def __init__(self, provider, rate_limits: dict = None, retries: int = 3, backoff: float = 1.0):
+        self.provider = provider
+
+        # 各市场每秒请求数，例如 {"HK": 2, "US": 2}，未配置的市场不限流
+        self.limiters = {source: RateLimiter(rate) for source, rate in (rate_limits or {}).items()}
+
+        # 最大重试次数
+        self.retries = retries
+
+        # 首次重试等待时间（秒），之后每次翻倍
+        self.backoff = backoff
+
+    @property
+    def name(self) -> str:
+        return getattr(self.provider, "name", "default")
+
+    def fetch(self, symbol: str, adjust: str = "qfq", start=None) -> pd.DataFrame:
+        limiter = self.limiters.get(symbol.rsplit('.', 1)[-1])
+        for attempt in range(self.retries + 1):
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                return self.provider.fetch(symbol, adjust, start=start)
+            except Exception as e:
+                if attempt >= self.retries:
+                    raise
+                wait = self.backoff * (2 ** attempt) * (1 + random.random() * 0.1)
+                print(f"下载 {symbol} 失败，{wait:.1f}秒后第{attempt + 1}次重试: {e}")
+                time.sleep(wait)
+
+
+def normalize_frame(stock_data: pd.DataFrame) -> pd.DataFrame:
+    """统一列名和时间索引"""
+    stock_data = stock_data.rename(columns=COLUMNS_RENAME)
+    stock_data['datetime'] = pd.to_datetime(stock_data['datetime'])
+    stock_data = stock_data.set_index('datetime').sort_index()
+    return stock_data[~stock_data.index.duplicated(keep='last')]
+
+
+class MarketDataCache:
+    """
+    本地行情缓存
+
+    每个资产、每种复权方式保存为一个 Parquet 文件，并附带一个 json 元数据文件，
+    记录数据的起止日期和最后一次下载时间：
+    1. 缓存覆盖请求的结束日期时直接读取本地文件，不访问网络
+    2. 缓存未覆盖结束日期且超过 ttl 时更新：复权数据重新下载全部历史并整体替换缓存，
+       除权除息后复权基准会整体变化，只追加新数据会混用两个基准；不复权数据只追加缓存末尾之后的新数据
+    3. refresh=True 时重新下载全部历史
+    4. 每个资产的读取、下载和写入在 .lock 文件锁内进行，多个进程同时加载同一资产时只下载一次
+    """
+
+    def __init__(self, root: str = "data_cache", ttl: float = 12 * 3600, provider=None):
+        # 缓存目录
+        self.root = root
+
+        # 缓存有效期（秒），超过后才会尝试更新
+        self.ttl = ttl
+
+        # 行情数据源，默认 akshare，按市场限流并在失败时重试
+        self.provider = provider if provider is not None else RateLimitedProvider(
+            AkshareProvider(), rate_limits={"HK": 2, "US": 2})
+
+    def _path(self, symbol: str, adjust: str, suffix: str) -> str:
+        name = f"{symbol}_{adjust or 'none'}".replace('/', '_')
+        return os.path.join(self.root, getattr(self.provider, "name", "default"), name + suffix)
+
+    def data_path(self, symbol: str, adjust: str = "qfq") -> str:
+        return self._path(symbol, adjust, ".parquet")
+
+    def meta_path(self, symbol: str, adjust: str = "qfq") -> str:
+        return self._path(symbol, adjust, ".json")
+
+    def read_meta(self, symbol: str, adjust: str = "qfq") -> dict:
+        try:
+            with open(self.meta_path(symbol, adjust), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @contextmanager
+    def _locked(self, symbol: str, adjust: str):
+        """
+        单个资产缓存的文件锁，多个线程或进程（回测任务队列同时运行的回测）读取同一资产时，
+        只有一个下载并写入，其余等待后直接读取新缓存
+        """
+        path = self._path(symbol, adjust, ".lock")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _replace(path: str, write) -> None:
+        """
+        写入本进程、本线程独有的临时文件后替换目标文件，避免中断或并发写入时留下损坏的缓存
+
+        Args:
+            path: 目标文件
+            write: 接收临时文件路径并写入内容的函数
+        """
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _read(self, symbol: str, adjust: str) -> tuple:
+        meta = self.read_meta(symbol, adjust)
+        path = self.data_path(symbol, adjust)
+        if meta is None or not os.path.exists(path):
+            return None, None
+        stock_data = pd.read_parquet(path)
+        # 数据文件和元数据分别替换，行数不一致时说明两者不是同一次写入，视为没有缓存
+        if len(stock_data) != meta.get("rows"):
+            return None, None
+        return stock_data, meta
+
+    def _write(self, symbol: str, adjust: str, stock_data: pd.DataFrame, fetched_at: float) -> dict:
+        os.makedirs(os.path.dirname(self.data_path(symbol, adjust)), exist_ok=True)
+
+        # 先写临时文件再替换，避免中断时留下损坏的缓存
+        path = self.data_path(symbol, adjust)
+        MarketDataCache._replace(path, stock_data.to_parquet)
+
+        meta = {
+            "symbol": symbol,
+            "adjust": adjust,
+            "first": stock_data.index.min().strftime('%Y-%m-%d') if not stock_data.empty else None,
+            "last": stock_data.index.max().strftime('%Y-%m-%d') if not stock_data.empty else None,
+            "rows": len(stock_data),
+            "fetched_at": fetched_at
+        }
+        def _dump(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+        MarketDataCache._replace(self.meta_path(symbol, adjust), _dump)
+        return meta
+
+    def load(self, symbol: str, adjust: str = "qfq", start=None, end=None, refresh: bool = False) -> pd.DataFrame:
+        """
+        读取单个资产的日线数据，必要时下载并更新缓存
+
+        Args:
+            symbol: 资产代码
+            adjust: 复权方式
+            start: 开始日期，格式为'YYYY-MM-DD'
+            end: 结束日期，格式为'YYYY-MM-DD'
+            refresh: 是否忽略缓存重新下载
+
+        Returns:
+            DataFrame: 以 datetime 为索引的日线数据，已按 start/end 过滤
+        """
+        # 读取、下载和写入都在该资产的文件锁内，并发加载同一资产时只下载一次，也不会读到一半替换的缓存
+        with self._locked(symbol, adjust):
+            return self._load(symbol, adjust, start, end, refresh)
+
+    def _load(self, symbol: str, adjust: str, start, end, refresh: bool) -> pd.DataFrame:
+        stock_data, meta = (None, None) if refresh else self._read(symbol, adjust)
+        now = time.time()
+
+        if stock_data is None:
+            # 没有缓存，下载全部历史
+            stock_data = self.provider.fetch(symbol, adjust)
+            if stock_data is None or stock_data.empty:
+                return pd.DataFrame()
+            self._write(symbol, adjust, stock_data, now)
+        elif self._needs_top_up(meta, end, now):
+            if adjust:
+                # 复权价格以最新一天为基准，历史数据可能已经变化，用完整的新序列替换缓存
+                fresh = self.provider.fetch(symbol, adjust)
+                if fresh is not None and not fresh.empty:
+                    stock_data = fresh
+            else:
+                # 不复权价格不会变化，只追加缓存末尾之后的新数据
+                tail = pd.Timestamp(meta["last"])
+                fresh = self.provider.fetch(symbol, adjust, start=tail + pd.Timedelta(days=1))
+                if fresh is not None and not fresh.empty:
+                    fresh = fresh.loc[fresh.index > tail]
+                    stock_data = pd.concat([stock_data, fresh[stock_data.columns.intersection(fresh.columns)]])
+            self._write(symbol, adjust, stock_data, now)
+
+        return stock_data.loc[start:end]
+
+    def _needs_top_up(self, meta: dict, end, now: float) -> bool:
+        if meta.get("last") is None:
+            return True
+        # 缓存已覆盖请求的结束日期
+        if end is not None and pd.Timestamp(meta["last"]) >= pd.Timestamp(end):
+            return False
+        return now - meta.get("fetched_at", 0) > self.ttl
+
+
+def load_frames(symbols: list, start=None, end=None, cache: MarketDataCache = None, workers: int = 4,
+                adjust: str = "qfq", refresh: bool = False) -> tuple:
+    """
+    并发读取多个资产的日线数据
+
+    Args:
+        symbols: 资产代码列表
+        start: 开始日期，格式为'YYYY-MM-DD'
+        end: 结束日期，格式为'YYYY-MM-DD'
+        cache: 本地行情缓存，为 None 时使用默认缓存
+        workers: 并发线程数
+        adjust: 复权方式
+        refresh: 是否忽略缓存重新下载
+
+    Returns:
+        tuple: ({资产代码: DataFrame}, {资产代码: 耗时秒数})，加载失败的资产不在结果中
+    """
+    cache = cache if cache is not None else MarketDataCache()
+    frames = {}
+    timings = {}
+
+    def _load(symbol):
+        started = time.perf_counter()
+        try:
+            return cache.load(symbol, adjust=adjust, start=start, end=end, refresh=refresh)
+        finally:
+            timings[symbol] = time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="load-data") as executor:
+        futures = {executor.submit(_load, symbol): symbol for symbol in symbols}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                frames[symbol] = future.result()
+            except Exception as e:
+                print(f'Error downloading data for {symbol}: {e}')
+
+    # 保持与输入相同的顺序
+    frames = {symbol: frames[symbol] for symbol in symbols if symbol in frames}
+    return frames, timings
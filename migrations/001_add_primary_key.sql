@@ -0,0 +1,10 @@
+-- 为订单表和回测日志表增加自增主键，并为游标分页的排序键 (date, id) 建立索引
+-- 已有数据库执行本脚本；新建数据库直接使用 init.sql
+
+ALTER TABLE `demo`.`order`
+    ADD COLUMN `id` bigint NOT NULL AUTO_INCREMENT PRIMARY KEY COMMENT '主键' FIRST,
+    ADD KEY `idx_order_date` (`date`);
+
+ALTER TABLE `demo`.`test_result`
+    ADD COLUMN `id` bigint NOT NULL AUTO_INCREMENT PRIMARY KEY COMMENT '主键' FIRST,
+    ADD KEY `idx_test_result_date` (`date`);
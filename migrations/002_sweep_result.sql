@@ -0,0 +1,21 @@
+-- 创建参数扫描结果表
+
+CREATE TABLE IF NOT EXISTS `demo`.`sweep_result` (
+    `id`                  bigint                       not null auto_increment comment '主键',
+    `sweep_id`            varchar(64)                  not null comment '扫描批次',
+    `params`              json                         not null comment '策略参数',
+    `max_hedge_ratio`     double                       not null comment '对冲比例',
+    `rebalance_window`    int                          not null comment '再平衡周期',
+    `volatility_limiter`  double                       not null comment '波动率限制',
+    `time_stop_loss`      int                          not null comment '最大持仓天数',
+    `ai_news_weight`      double                       not null comment 'AI情绪权重',
+    `final_value`         decimal(20, 2)               null     comment '最终市值',
+    `total_return`        double                       null     comment '总收益率（%）',
+    `sharpe_ratio`        double                       null     comment '夏普比率',
+    `max_drawdown`        double                       null     comment '最大回撤（%）',
+    `annual_return`       double                       null     comment '年化收益率（%）',
+    `total_trades`        int                          null     comment '总交易次数',
+    `create_time`         datetime    default (now())  null     comment '创建日期',
+    primary key (`id`),
+    key `idx_sweep_result_sweep` (`sweep_id`, `sharpe_ratio`)
+) comment '参数扫描结果';
@@ -0,0 +1,44 @@
+-- 订单表和回测日志表的数值字段由 varchar(100) 改为 DECIMAL/INT/DOUBLE，
+-- 增加回测批次 run_id，并建立 (run_id, date)、(symbol, date) 索引
+-- 已有数据库执行本脚本；新建数据库直接使用 init.sql
+
+-- 1. 订单表：原数据均为格式化后的数字字符串，可直接转换
+ALTER TABLE `demo`.`order`
+    ADD COLUMN `run_id` bigint NOT NULL DEFAULT 0 COMMENT '回测批次' AFTER `id`,
+    MODIFY `symbol`         varchar(20)    NOT NULL COMMENT '股票代码',
+    MODIFY `action`         varchar(8)     NOT NULL DEFAULT 'in' COMMENT '交易动作（in买入/out卖出）',
+    MODIFY `price`          decimal(18, 4) NOT NULL COMMENT '成交价格',
+    MODIFY `size`           int            NOT NULL COMMENT '成交数量',
+    MODIFY `total_cost`     decimal(20, 2) NOT NULL COMMENT '总成本',
+    MODIFY `remaining_cash` decimal(20, 2) NOT NULL COMMENT '剩余资金',
+    ADD KEY `idx_order_run_date` (`run_id`, `date`),
+    ADD KEY `idx_order_symbol_date` (`symbol`, `date`);
+
+-- 2. 回测日志表：指标在数据不足时可能写入了 'nan'，先改为可空并清理为 NULL
+ALTER TABLE `demo`.`test_result`
+    MODIFY `hsi_rsi`          varchar(100) NULL,
+    MODIFY `spx_rsi`          varchar(100) NULL,
+    MODIFY `vix`              varchar(100) NULL,
+    MODIFY `sentiment_scores` varchar(100) NULL;
+
+UPDATE `demo`.`test_result`
+   SET `hsi_rsi`          = IF(`hsi_rsi`          REGEXP '^-?[0-9]+(\\.[0-9]+)?(e[-+]?[0-9]+)?$', `hsi_rsi`, NULL),
+       `spx_rsi`          = IF(`spx_rsi`          REGEXP '^-?[0-9]+(\\.[0-9]+)?(e[-+]?[0-9]+)?$', `spx_rsi`, NULL),
+       `vix`              = IF(`vix`              REGEXP '^-?[0-9]+(\\.[0-9]+)?(e[-+]?[0-9]+)?$', `vix`, NULL),
+       `sentiment_scores` = IF(`sentiment_scores` REGEXP '^-?[0-9]+(\\.[0-9]+)?(e[-+]?[0-9]+)?$', `sentiment_scores`, NULL);
+
+ALTER TABLE `demo`.`test_result`
+    ADD COLUMN `run_id` bigint NOT NULL DEFAULT 0 COMMENT '回测批次' AFTER `id`,
+    MODIFY `hsi_rsi`            double         NULL     COMMENT '恒生指数 相对强弱指数',
+    MODIFY `spx_rsi`            double         NULL     COMMENT '标普500指数 相对强弱指数',
+    MODIFY `vix`                double         NULL     COMMENT '波动率 恐慌指数',
+    MODIFY `volatility_limiter` double         NOT NULL COMMENT '波动率限制',
+    MODIFY `sentiment_scores`   double         NULL     COMMENT 'AI情绪得分',
+    MODIFY `news_weight`        double         NOT NULL COMMENT 'AI新闻权重',
+    MODIFY `max_hedge_ratio`    double         NOT NULL COMMENT '对冲比例',
+    MODIFY `rebalance_window`   int            NOT NULL COMMENT '对冲窗口',
+    MODIFY `commission`         double         NOT NULL COMMENT '交易佣金率',
+    MODIFY `slippage`           double         NOT NULL COMMENT '滑点成本',
+    MODIFY `day_stop_loss`      int            NOT NULL COMMENT '最大持仓天数',
+    MODIFY `remaining_cash`     decimal(20, 2) NOT NULL COMMENT '剩余资金',
+    ADD KEY `idx_test_result_run_date` (`run_id`, `date`);
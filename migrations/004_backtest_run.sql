@@ -0,0 +1,37 @@
+-- 创建回测批次表，order 和 test_result 通过 run_id 关联
+-- 已有数据库执行本脚本；新建数据库直接使用 init.sql
+
+CREATE TABLE IF NOT EXISTS `demo`.`backtest_run` (
+    `id`                  bigint                       not null auto_increment comment '主键',
+    `name`                varchar(100)                 null     comment '批次名称',
+    `params`              json                         not null comment '策略参数',
+    `start_date`          date                         not null comment '数据开始日期',
+    `end_date`            date                         not null comment '数据结束日期',
+    `initial_cash`        decimal(20, 2)               not null comment '初始资金',
+    `status`              varchar(16) default 'running' not null comment '状态（running/finished/failed）',
+    `started_at`          datetime                     not null comment '开始时间',
+    `finished_at`         datetime                     null     comment '结束时间',
+    `final_value`         decimal(20, 2)               null     comment '最终市值',
+    `total_return`        double                       null     comment '总收益率（%）',
+    `sharpe_ratio`        double                       null     comment '夏普比率',
+    `max_drawdown`        double                       null     comment '最大回撤（%）',
+    `annual_return`       double                       null     comment '年化收益率（%）',
+    `total_trades`        int                          null     comment '总交易次数',
+    primary key (`id`),
+    key `idx_backtest_run_started` (`started_at`)
+) comment '回测批次';
+
+-- 可选：order 和 test_result 按 run_id 做 LIST 分区，删除批次时直接丢弃分区。
+-- 分区键必须包含在主键中，因此主键改为 (id, run_id)。
+-- 分区后 BacktestRunManager 会自动识别，创建批次时增加分区 p<run_id>，删除批次时 DROP PARTITION。
+-- 未分区时按 (run_id, date) 索引分块 DELETE。
+--
+-- ALTER TABLE `demo`.`order`
+--     DROP PRIMARY KEY,
+--     ADD PRIMARY KEY (`id`, `run_id`)
+--     PARTITION BY LIST (`run_id`) (PARTITION p0 VALUES IN (0));
+--
+-- ALTER TABLE `demo`.`test_result`
+--     DROP PRIMARY KEY,
+--     ADD PRIMARY KEY (`id`, `run_id`)
+--     PARTITION BY LIST (`run_id`) (PARTITION p0 VALUES IN (0));
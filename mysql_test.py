@@ -20,6 +20,16 @@ def load_order():
     #        print(f"\t{iter}")
 
 
+def load_all_order():
+    # 游标分页遍历全部订单，不使用 OFFSET，总耗时与记录数成线性关系
+    page_size = 1000
+    records = 0
+    for pageResult in OrderManager.iter_pages(page_size):
+        records += len(pageResult.data)
+        print(f"iter_pages执行结果：第{pageResult.page}页 {len(pageResult.data)}条，续页令牌{pageResult.next_token}")
+    print(f"订单总记录数{records}条")
+
+
 def load_test_result():
     page = 1
     page_size = 50
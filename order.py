@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
+from batch_writer import BatchWriter
 from dbutils import DBUtil, PageResult
 from utils import BacktestPrinter
 
@@ -8,7 +9,7 @@ class OrderInfo:
     """订单信息模型"""
 
     def __init__(self, symbol: str, date: datetime, action: str, 
-                 price: float, size: int, total_cost: float, remaining_cash: float):
+                 price: float, size: int, total_cost: float, remaining_cash: float, run_id: int = 0):
         # 股票代码
         self.symbol = symbol
 
@@ -30,10 +31,97 @@ class OrderInfo:
         # 剩余现金
         self.remaining_cash = remaining_cash
 
+        # 回测批次，0 表示未关联批次
+        self.run_id = run_id
+
 
 class OrderManager:
     """订单管理 保存、查询"""
 
+    # 查询、写入字段
+    FIELDS = ("symbol", "date", "action", "price", "size", "total_cost", "remaining_cash", "run_id")
+
+    # 写入语句，逐条写入和批量写入共用
+    INSERT_SQL = DBUtil.insert_sql("order", FIELDS)
+
+    # 查询语句
+    SELECT_SQL = DBUtil.select_sql("order", FIELDS)
+
+    # 批量写入缓冲，为 None 时逐条写入
+    writer = None
+
+    # 游标分页排序键
+    KEY_COLUMNS = ("date", "id")
+
+    @staticmethod
+    def start_batch(batch_size: int = 500, flush_interval: float = 2.0) -> None:
+        """
+        开启批量写入模式
+        
+        Args:
+            batch_size: 缓冲达到该行数时写入
+            flush_interval: 定时写入间隔（秒）
+        """
+        if OrderManager.writer is None:
+            OrderManager.writer = BatchWriter(OrderManager.INSERT_SQL, batch_size, flush_interval, name="order-writer")
+
+    @staticmethod
+    def flush() -> None:
+        """立即写入缓冲中的订单"""
+        if OrderManager.writer is not None:
+            OrderManager.writer.flush()
+
+    @staticmethod
+    def stop_batch() -> None:
+        """
+        写入剩余订单并关闭批量写入模式
+
+        Raises:
+            RuntimeError: 重试后仍有订单未写入
+        """
+        writer, OrderManager.writer = OrderManager.writer, None
+        if writer is not None:
+            writer.close()
+
+    @staticmethod
+    def to_row(order: OrderInfo) -> tuple:
+        """
+        转换为写入语句的参数
+        
+        Args:
+            order: 订单信息
+        """
+        return (
+            order.symbol,
+            order.date.strftime("%Y-%m-%d"),
+            'in' if order.action == "买入" else 'out',
+            DBUtil.to_number(order.price, 4),
+            int(order.size),
+            DBUtil.to_number(order.total_cost, 2),
+            DBUtil.to_number(order.remaining_cash, 2),
+            int(order.run_id)
+        )
+
+    @staticmethod
+    def from_row(row: tuple) -> OrderInfo:
+        """
+        查询结果转换为订单信息，字段顺序与 FIELDS 一致
+        
+        Args:
+            row: list/list_after/iter_pages/iter_all 返回的一行数据
+        """
+        symbol, date, action, price, size, total_cost, remaining_cash, run_id = row[:len(OrderManager.FIELDS)]
+        return OrderInfo(
+            symbol=symbol,
+            date=datetime(date.year, date.month, date.day),
+            action="买入" if action == 'in' else "卖出",
+            price=DBUtil.from_number(price),
+            size=int(size),
+            total_cost=DBUtil.from_number(total_cost),
+            remaining_cash=DBUtil.from_number(remaining_cash),
+            run_id=int(run_id)
+        )
+
     @staticmethod
     def save(order: OrderInfo) -> None:
         """
@@ -44,16 +132,11 @@ class OrderManager:
         """
         BacktestPrinter.print_order_info(order.symbol, order.date, order.action, order.price, order.size, order.total_cost, order.remaining_cash)
 
-        sql = f"INSERT INTO `order`(`symbol`, `date`, `action`, `price`, `size`, `total_cost`, `remaining_cash`) VALUES (\
-'{order.symbol}', \
-'{order.date.strftime("%Y-%m-%d")}', \
-'{'in' if order.action=="买入" else 'out'}', \
-'{order.price:.2f}', \
-'{order.size}', \
-'{order.total_cost:.2f}', \
-'{order.remaining_cash:.2f}'\
-)"
-        DBUtil.INS().save(sql)
+        row = OrderManager.to_row(order)
+        if OrderManager.writer is not None:
+            OrderManager.writer.add(row)
+        else:
+            DBUtil.INS().save(OrderManager.INSERT_SQL, row)
 
     @staticmethod
     def list(page: int, page_size: int = 10) -> PageResult:
@@ -65,6 +148,46 @@ class OrderManager:
             page_size：每页显示数量，默认10条数据
         """
 
-        offset = (page - 1) * page_size
-        sql = f"SELECT `symbol`, `date`, `action`, `price`, `size`, `total_cost`, `remaining_cash` FROM `order`"
-        return DBUtil.INS().get_all(sql, page, page_size)
\ No newline at end of file
+        return DBUtil.INS().get_all(OrderManager.SELECT_SQL, page, page_size)
+
+    @staticmethod
+    def list_after(last_key: tuple = None, page_size: int = 10, with_count: bool = False, run_id: int = None,
+                   symbol: str = None, start: str = None, end: str = None) -> PageResult:
+        """
+        游标分页订单信息
+        
+        Args:
+            last_key: 上一页返回的 next_key，为 None 时从第一页开始
+            page_size：每页显示数量，默认10条数据
+            with_count: 是否统计总记录数
+            run_id: 回测批次，为 None 时不过滤
+            symbol: 股票代码，为 None 时不过滤
+            start: 开始日期（含），格式为'YYYY-MM-DD'
+            end: 结束日期（含），格式为'YYYY-MM-DD'
+        """
+        where, params = DBUtil.filter_condition({"run_id": run_id, "symbol": symbol}, {"date": (start, end)})
+        return DBUtil.INS().get_page("order", OrderManager.FIELDS, OrderManager.KEY_COLUMNS, last_key, page_size,
+                                     where, params, with_count=with_count)
+
+    @staticmethod
+    def iter_pages(page_size: int = 1000):
+        """
+        按日期顺序逐页遍历全部订单
+        
+        Args:
+            page_size：每页数量，默认1000条数据
+        """
+        return DBUtil.INS().iter_pages("order", OrderManager.FIELDS, OrderManager.KEY_COLUMNS, page_size)
+
+    @staticmethod
+    def iter_all(chunk_size: int = None, run_id: int = None):
+        """
+        流式遍历全部订单，数据不会一次性加载到内存
+        
+        Args:
+            chunk_size: 为 None 时逐行返回，否则每次返回不超过 chunk_size 行的列表
+            run_id: 只遍历该回测批次，为 None 时遍历全部
+        """
+        where, params = DBUtil.filter_condition({"run_id": run_id})
+        sql = OrderManager.SELECT_SQL + (f" WHERE {where}" if where else "")
+        return DBUtil.INS().stream(sql, params, chunk_size=chunk_size)
\ No newline at end of file
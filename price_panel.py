@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from indicator_store import INDICATOR_FIELDS, IndicatorCache
+
+# 面板中保存的行情字段，顺序与第三维一致
+PANEL_FIELDS = ("open", "high", "low", "close", "volume")
+
+# 1970-01-01 的公历序数，用于把 datetime64[D] 直接换算为 backtrader 的日期数值
+_EPOCH_ORDINAL = 719163
+
+
+class PricePanel:
+    """
+    内存映射的价格面板
+
+    所有资产的日线保存在一个 float64 数组中，形状为 (日期, 资产, 字段)，
+    停牌或未上市的日期填充 NaN。数组以 .npy 文件保存，读取时使用 mmap，
+    同一台机器上的多个回测进程共享操作系统页缓存中的同一份数据。
+    """
+
+    def __init__(self, values: np.ndarray, dates: np.ndarray, symbols: list, fields: tuple = PANEL_FIELDS):
+        # 面板数据 (日期, 资产, 字段)
+        self.values = values
+
+        # 交易日期 datetime64[D]
+        self.dates = dates
+
+        # 资产代码，顺序与第二维一致
+        self.symbols = list(symbols)
+
+        # 行情字段，顺序与第三维一致
+        self.fields = tuple(fields)
+
+        self._symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._field_index = {field: i for i, field in enumerate(self.fields)}
+
+        # backtrader 日期数值，每个交易日一个
+        self.date_nums = (dates.astype("datetime64[D]").astype(np.int64) + _EPOCH_ORDINAL).astype(np.float64)
+
+        # 面板文件路径（不含扩展名），由 open 设置；内存中的面板为 None
+        self.path = None
+
+        # 已读取的预计算指标 {(开始行, 结束行): ndarray}
+        self._indicators = {}
+
+    @staticmethod
+    def build(frames: dict, path: str) -> "PricePanel":
+        """
+        由各资产的日线 DataFrame 生成面板文件
+
+        Args:
+            frames: {资产代码: DataFrame}，DataFrame 以 datetime 为索引，包含 Open/High/Low/Close/Volume 列
+            path: 面板文件路径（不含扩展名），生成 path.npy 和 path.json
+        """
+        frames = {symbol: df for symbol, df in frames.items() if df is not None and not df.empty}
+        index = pd.DatetimeIndex([])
+        for stock_data in frames.values():
+            index = index.union(stock_data.index.normalize())
+        dates = index.values.astype("datetime64[D]")
+        symbols = list(frames)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        values = np.lib.format.open_memmap(path + ".npy.tmp", mode="w+", dtype=np.float64,
+                                           shape=(len(dates), len(symbols), len(PANEL_FIELDS)), fortran_order=False)
+        values[:] = np.nan
+        for j, symbol in enumerate(symbols):
+            stock_data = frames[symbol]
+            rows = np.searchsorted(dates, stock_data.index.normalize().values.astype("datetime64[D]"))
+            columns = {c.lower(): c for c in stock_data.columns}
+            for k, field in enumerate(PANEL_FIELDS):
+                if field in columns:
+                    values[rows, j, k] = stock_data[columns[field]].to_numpy(dtype=np.float64)
+        values.flush()
+        del values
+        os.replace(path + ".npy.tmp", path + ".npy")
+
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump({
+                "dates": [str(d) for d in dates],
+                "symbols": symbols,
+                "fields": list(PANEL_FIELDS)
+            }, f, ensure_ascii=False)
+
+        return PricePanel.open(path)
+
+    @staticmethod
+    def open(path: str) -> "PricePanel":
+        """
+        以只读内存映射方式打开面板文件
+
+        Args:
+            path: 面板文件路径（不含扩展名）
+        """
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        values = np.load(path + ".npy", mmap_mode="r")
+        dates = np.array(meta["dates"], dtype="datetime64[D]")
+        panel = PricePanel(values, dates, meta["symbols"], tuple(meta["fields"]))
+        panel.path = path
+        return panel
+
+    def symbol_index(self, symbol: str) -> int:
+        return self._symbol_index[symbol]
+
+    def field_index(self, field: str) -> int:
+        return self._field_index[field]
+
+    def date_range(self, start=None, end=None) -> slice:
+        """日期范围对应的行切片"""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, "D"), side="left"))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, "D"), side="right"))
+        return slice(lo, hi)
+
+    def indicators(self, start=None, end=None) -> np.ndarray:
+        """
+        日期范围内全部资产的预计算指标
+
+        指标按该日期范围内的K线计算，与 backtrader 从同一范围开始计算的结果一致；
+        结果缓存在面板目录下，以收盘价快照的哈希值区分。
+
+        Returns:
+            ndarray: (日期, 资产, 指标)，第一维与 date_range(start, end) 对应
+        """
+        window = self.date_range(start, end)
+        key = (window.start, window.stop)
+        if key not in self._indicators:
+            close = np.asarray(self.values[window, :, self.field_index("close")])
+            if self.path is not None:
+                cache = IndicatorCache(os.path.dirname(os.path.abspath(self.path)))
+                self._indicators[key] = cache.load_panel(os.path.basename(self.path), close)
+            else:
+                self._indicators[key] = IndicatorCache.compute_panel(close)
+        return self._indicators[key]
+
+    def feed(self, symbol: str, start=None, end=None, indicators: bool = False) -> "PanelFeed":
+        """
+        生成单个资产的 backtrader 数据源
+
+        Args:
+            indicators: 是否附带预计算指标线（IndicatorPanelFeed）
+        """
+        if indicators:
+            return IndicatorPanelFeed(panel=self, symbol=symbol, start=start, end=end,
+                                      indicators=self.indicators(start, end))
+        return PanelFeed(panel=self, symbol=symbol, start=start, end=end)
+
+    def feeds(self, start=None, end=None, indicators: bool = False) -> dict:
+        """
+        生成全部资产的 backtrader 数据源
+
+        Args:
+            indicators: 是否附带预计算指标线
+
+        Returns:
+            dict: {资产代码: PanelFeed}，与 load_data 的返回值相同
+        """
+        return {symbol: self.feed(symbol, start, end, indicators) for symbol in self.symbols}
+
+
+class PanelFeed(bt.feed.DataBase):
+    """
+    从内存映射面板逐根读取行情的 backtrader 数据源
+
+    不生成 DataFrame 副本，每根 K 线直接从面板读取；
+    跳过该资产收盘价为 NaN 的日期。
+
+    注意：backtrader 仍会把读到的每根 K 线复制到数据源自己的行缓冲中（默认 preload），
+    每个回测进程的行缓冲内存随资产数 × K 线数增长，面板只省去了 DataFrame 副本和重复下载。
+    exactbars=1 可以限制行缓冲长度，但有资产比其他资产更早结束时 backtrader 会读取已清空的缓冲而出错，
+    因此没有启用。
+    """
+
+    params = (
+        ("panel", None),     # PricePanel
+        ("symbol", None),    # 资产代码
+        ("start", None),     # 开始日期
+        ("end", None),       # 结束日期
+    )
+
+    def start(self):
+        super(PanelFeed, self).start()
+        panel = self.p.panel
+        self._column = panel.symbol_index(self.p.symbol)
+        self._field_columns = [panel.field_index(f) for f in ("open", "high", "low", "close", "volume")]
+
+        window = panel.date_range(self.p.start, self.p.end)
+        close = panel.values[window, self._column, panel.field_index("close")]
+        self._window_start = window.start
+        self._rows = np.flatnonzero(~np.isnan(close)) + window.start
+        self._cursor = 0
+
+    def _load(self):
+        if self._cursor >= len(self._rows):
+            return False
+
+        row = self._rows[self._cursor]
+        self._cursor += 1
+
+        panel = self.p.panel
+        bar = panel.values[row, self._column]
+        o, h, l, c, v = (float(bar[k]) for k in self._field_columns)
+
+        self.lines.datetime[0] = panel.date_nums[row]
+        self.lines.open[0] = o
+        self.lines.high[0] = h
+        self.lines.low[0] = l
+        self.lines.close[0] = c
+        self.lines.volume[0] = v
+        self.lines.openinterest[0] = 0.0
+        return True
+
+
+class IndicatorPanelFeed(PanelFeed):
+    """附带预计算指标线的 PanelFeed，指标来自 PricePanel.indicators"""
+
+    lines = INDICATOR_FIELDS
+
+    params = (
+        ("indicators", None),   # (日期, 资产, 指标)，与数据源日期范围对应
+    )
+
+    def _load(self):
+        if not super(IndicatorPanelFeed, self)._load():
+            return False
+
+        values = self.p.indicators[self._rows[self._cursor - 1] - self._window_start, self._column]
+        for k, field in enumerate(INDICATOR_FIELDS):
+            getattr(self.lines, field)[0] = float(values[k])
+        return True
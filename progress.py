@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict
+
+# 事件中累加而不是覆盖的字段
+ORDER_FIELDS = ("orders", "dropped_orders")
+
+
+class Subscription:
+    """
+    进度订阅
+
+    发布的事件在订阅中合并：日期、组合市值等状态字段只保留最新值，订单追加到列表中
+    （超过 max_orders 时丢弃最早的订单并计数）。读取方按自己的节奏调用 get()，
+    两次读取之间的全部事件合并为一次更新，发布方不会因为读取方慢而阻塞或堆积。
+    """
+
+    def __init__(self, topic: str, state: dict = None, max_orders: int = 100):
+        # 订阅主题
+        self.topic = topic
+
+        # 两次读取之间最多保留的订单数
+        self.max_orders = max_orders
+
+        self._state = dict(state or {})
+        self._orders = []
+        self._dropped = 0
+        self._dirty = bool(state)
+        self._cond = threading.Condition()
+
+    def merge(self, event: dict) -> None:
+        """合并一个事件"""
+        with self._cond:
+            for name, value in event.items():
+                if name not in ORDER_FIELDS:
+                    self._state[name] = value
+            self._orders.extend(event.get("orders", ()))
+            self._dropped += event.get("dropped_orders", 0)
+            if len(self._orders) > self.max_orders:
+                self._dropped += len(self._orders) - self.max_orders
+                del self._orders[:-self.max_orders]
+            self._dirty = True
+            self._cond.notify()
+
+    def get(self, timeout: float = None) -> dict:
+        """
+        读取上次读取之后合并的更新：最新状态、新订单和丢弃的订单数
+
+        Args:
+            timeout: 没有新事件时最长等待时间（秒），为 None 时一直等待
+
+        Returns:
+            dict: 超时仍没有新事件时返回 None
+        """
+        with self._cond:
+            if not self._dirty and not self._cond.wait_for(lambda: self._dirty, timeout):
+                return None
+            update = dict(self._state, orders=self._orders, dropped_orders=self._dropped)
+            self._orders, self._dropped, self._dirty = [], 0, False
+            return update
+
+
+class ProgressChannel:
+    """
+    进程内的回测进度发布/订阅通道
+
+    策略每根K线发布一次进度（没有订阅者时不发布，回测循环只多一次字典查询）；
+    订阅者拿到的是合并后的更新，读取频率与发布频率无关。
+    每个主题保留最新状态，新的订阅者从最新状态开始。
+    """
+
+    def __init__(self, max_topics: int = 1000):
+        # 保留最新状态的主题数，超过后删除最早的主题
+        self.max_topics = max_topics
+
+        # {主题: [Subscription]}
+        self._subscribers = {}
+        # {主题: 最新状态}
+        self._last = OrderedDict()
+        self._lock = threading.Lock()
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._subscribers.get(topic))
+
+    def subscribe(self, topic: str, max_orders: int = 100) -> Subscription:
+        """订阅主题，返回的订阅不再使用时必须调用 unsubscribe"""
+        with self._lock:
+            subscription = Subscription(topic, self._last.get(topic), max_orders)
+            self._subscribers[topic] = self._subscribers.get(topic, []) + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = [s for s in self._subscribers.get(subscription.topic, []) if s is not subscription]
+            if subscribers:
+                self._subscribers[subscription.topic] = subscribers
+            else:
+                self._subscribers.pop(subscription.topic, None)
+
+    def publish(self, topic: str, event: dict) -> None:
+        """
+        发布事件
+
+        Args:
+            topic: 主题
+            event: 状态字段（覆盖）和 orders 订单列表（追加）
+        """
+        with self._lock:
+            state = {name: value for name, value in event.items() if name not in ORDER_FIELDS}
+            if state:
+                self._last.setdefault(topic, {}).update(state)
+                self._last.move_to_end(topic)
+                while len(self._last) > self.max_topics:
+                    self._last.popitem(last=False)
+            subscribers = self._subscribers.get(topic, ())
+        for subscription in subscribers:
+            subscription.merge(event)
+
+    def last(self, topic: str) -> dict:
+        """主题的最新状态"""
+        with self._lock:
+            return dict(self._last.get(topic, {}))
+
+
+# 进程内默认通道
+CHANNEL = ProgressChannel()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+class CachedResponse:
+    """缓存的响应内容模型"""
+
+    def __init__(self, body: bytes, mimetype: str = "application/json", compress_min_size: int = 512):
+        # 未压缩的响应内容
+        self.body = body
+
+        # 响应类型
+        self.mimetype = mimetype
+
+        # 响应内容的哈希值，作为 ETag（弱校验，同一内容压缩与否使用同一个 ETag）
+        self.etag = hashlib.sha1(body).hexdigest()
+
+        # gzip 压缩后的内容，只在写入缓存时压缩一次；内容太短时为 None
+        self.gzipped = gzip.compress(body, compresslevel=6) if len(body) >= compress_min_size else None
+
+
+class ResponseCache:
+    """
+    进程内的 TTL + LRU 响应缓存
+
+    1. 每个条目缓存 ttl 秒，过期后下一次请求重新查询数据库
+    2. 条目数超过 max_size 时淘汰最久未使用的条目
+    3. 同一个键同时只有一个请求查询数据库，其余请求等待其结果
+
+    仪表盘每隔几秒轮询同一个接口时，同一个 ttl 内只查询一次数据库。
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 5.0):
+        # 最大条目数
+        self.max_size = max_size
+
+        # 缓存时间（秒）
+        self.ttl = ttl
+
+        # 命中统计
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        # {键: (CachedResponse, 过期时间)}，按最近使用顺序排列
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # {键: 锁}，避免缓存过期瞬间多个请求同时查询数据库
+        self._loading = {}
+
+    def get(self, key) -> CachedResponse:
+        """读取未过期的条目，不存在时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, response: CachedResponse) -> None:
+        """写入条目"""
+        with self._lock:
+            self._entries[key] = (response, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get_or_load(self, key, loader) -> CachedResponse:
+        """
+        读取条目，不存在或已过期时调用 loader 生成并写入缓存
+
+        Args:
+            key: 缓存键，必须可哈希
+            loader: 无参数函数，返回 CachedResponse
+        """
+        response = self.get(key)
+        if response is not None:
+            self.stats["hits"] += 1
+            return response
+
+        with self._lock:
+            lock = self._loading.setdefault(key, threading.Lock())
+        with lock:
+            # 等待期间其他请求可能已经写入
+            response = self.get(key)
+            if response is not None:
+                self.stats["hits"] += 1
+                return response
+            self.stats["misses"] += 1
+            try:
+                response = loader()
+                self.put(key, response)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return response
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+import itertools
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from price_panel import PricePanel
+from sweep_result import SweepResult, SweepResultManager
+from testyf import RUNTIME_PARAMS, DualMovingAverageStrategy, build_cerebro, build_panel, collect_metrics
+from utils import BacktestPrinter, QUIET
+from vector_engine import MarketArrays, run_batch
+
+# 参数扫描的默认搜索空间
+DEFAULT_SPACE = {
+    "max_hedge_ratio": [0.1, 0.2, 0.3, 0.4],
+    "rebalance_window": [5, 10, 15, 20],
+    "volatility_limiter": [0.015, 0.025, 0.035],
+    "time_stop_loss": [3, 5, 10],
+    "ai_news_weight": [0.5, 0.7, 0.9]
+}
+
+# 工作进程中打开的价格面板，由 _init_worker 设置
+_panel = None
+
+
+def grid(space: dict) -> list:
+    """
+    网格搜索：生成搜索空间中所有参数组合
+
+    Args:
+        space: {参数名: 候选值列表}
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_search(space: dict, n: int, seed: int = None) -> list:
+    """
+    随机搜索：从搜索空间中随机抽取 n 组参数
+
+    Args:
+        space: {参数名: 候选值列表 或 (下限, 上限)}，区间的上下限都是整数时抽取整数
+        n: 抽取组数
+        seed: 随机种子
+    """
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                lo, hi = values
+                config[name] = rng.randint(lo, hi) if isinstance(lo, int) and isinstance(hi, int) else rng.uniform(lo, hi)
+            else:
+                config[name] = rng.choice(values)
+        configs.append(config)
+    return configs
+
+
+def _init_worker(panel_path: str) -> None:
+    """工作进程初始化：以内存映射方式打开价格面板，所有进程共享页缓存；关闭回测过程输出"""
+    global _panel
+    _panel = PricePanel.open(panel_path)
+    BacktestPrinter.configure(level=QUIET)
+
+
+def _run_config(params: dict, start, end, initial_cash: float, seed: int = None) -> dict:
+    """在工作进程中运行一组参数，返回参数和回测指标"""
+    if seed is not None:
+        np.random.seed(seed)
+
+    started = time.perf_counter()
+    try:
+        cerebro = build_cerebro(_panel.feeds(start, end, indicators=True), initial_cash, persist=False, **params)
+        strat = cerebro.run()[0]
+        metrics = collect_metrics(strat, initial_cash, cerebro.broker.getvalue())
+        error = None
+    except Exception as e:
+        metrics = {}
+        error = str(e)
+    return {**params, **metrics, "elapsed": time.perf_counter() - started, "error": error}
+
+
+def run_sweep(configs: list, start="2019-05-10", end="2025-05-10", initial_cash=15000000,
+              workers: int = None, panel_path: str = None, seed: int = None,
+              persist: bool = True, sweep_id: str = None) -> pd.DataFrame:
+    """
+    使用进程池并行运行多组策略参数
+
+    行情数据只加载一次并写入内存映射价格面板，各工作进程直接读取同一个面板文件；
+    RSI、波动率和 Z-score 也只预计算一次，各组参数不再重复计算指标。
+
+    Args:
+        configs: 参数组合列表，每项为覆盖 DualMovingAverageStrategy.params 的字典
+        start: 开始日期，格式为'YYYY-MM-DD'
+        end: 结束日期，格式为'YYYY-MM-DD'
+        initial_cash: 初始资金
+        workers: 进程数，默认使用全部 CPU
+        panel_path: 已生成的价格面板路径，为 None 时先生成面板
+        seed: 随机种子，保证 AI 情绪得分在各组参数间一致
+        persist: 是否批量保存到 sweep_result 表
+        sweep_id: 扫描批次，默认自动生成
+
+    Returns:
+        DataFrame: 每组参数一行，包含参数、夏普比率、最大回撤、收益率和交易次数
+    """
+    unknown = {name for config in configs for name in config
+               if name not in DualMovingAverageStrategy.params._getkeys() or name in RUNTIME_PARAMS}
+    if unknown:
+        raise ValueError(f"未知的策略参数: {sorted(unknown)}")
+
+    if panel_path is None:
+        panel_path = os.path.join("data_cache", "panels", f"panel_{start}_{end}")
+        build_panel(panel_path, start, end)
+
+    # 指标只在主进程计算一次，工作进程直接读取缓存文件
+    PricePanel.open(panel_path).indicators(start, end)
+
+    sweep_id = sweep_id or uuid.uuid4().hex
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(panel_path,)) as executor:
+        futures = [executor.submit(_run_config, config, start, end, initial_cash, seed) for config in configs]
+        for i, future in enumerate(as_completed(futures), 1):
+            row = future.result()
+            rows.append(row)
+            print(f"参数扫描进度: {i}/{len(configs)} 夏普比率: {row.get('sharpe_ratio')} 耗时: {row['elapsed']:.1f}秒")
+
+    results = pd.DataFrame(rows)
+    if persist and not results.empty:
+        save_results(sweep_id, results)
+    results.attrs["sweep_id"] = sweep_id
+    return results
+
+
+def run_sweep_batch(configs: list, start="2019-05-10", end="2025-05-10", initial_cash=15000000,
+                    panel_path: str = None, seed: int = None, persist: bool = True, sweep_id: str = None) -> pd.DataFrame:
+    """
+    在单个进程中用 vector_engine.run_batch 一次运行全部参数组合，用于大规模参数筛选
+
+    参数和返回值与 run_sweep 相同；全部参数组使用同一个 AI 情绪得分。
+
+    Args:
+        configs: 参数组合列表，每项为覆盖 DualMovingAverageStrategy.params 的字典
+        start: 开始日期，格式为'YYYY-MM-DD'
+        end: 结束日期，格式为'YYYY-MM-DD'
+        initial_cash: 初始资金
+        panel_path: 已生成的价格面板路径，为 None 时先生成面板
+        seed: 随机种子
+        persist: 是否批量保存到 sweep_result 表
+        sweep_id: 扫描批次，默认自动生成
+    """
+    unknown = {name for config in configs for name in config
+               if name not in DualMovingAverageStrategy.params._getkeys() or name in RUNTIME_PARAMS}
+    if unknown:
+        raise ValueError(f"未知的策略参数: {sorted(unknown)}")
+
+    if panel_path is None:
+        panel_path = os.path.join("data_cache", "panels", f"panel_{start}_{end}")
+        build_panel(panel_path, start, end)
+
+    if seed is not None:
+        np.random.seed(seed)
+    market = MarketArrays(PricePanel.open(panel_path), start, end)
+    batch = run_batch(market, configs, initial_cash)
+    print(f"参数扫描完成: {len(configs)} 组参数 耗时: {batch['elapsed']:.1f}秒")
+
+    metrics = {name: values for name, values in batch.items() if name not in ("equity", "elapsed")}
+    results = pd.concat([pd.DataFrame(configs), pd.DataFrame(metrics)], axis=1)
+    results["elapsed"] = batch["elapsed"] / max(len(configs), 1)
+    results["error"] = None
+
+    sweep_id = sweep_id or uuid.uuid4().hex
+    if persist and not results.empty:
+        save_results(sweep_id, results)
+    results.attrs["sweep_id"] = sweep_id
+    return results
+
+
+def save_results(sweep_id: str, results: pd.DataFrame) -> int:
+    """
+    将参数扫描结果批量写入 sweep_result 表
+
+    Args:
+        sweep_id: 扫描批次
+        results: run_sweep 返回的结果表
+    """
+    defaults = dict(DualMovingAverageStrategy.params._getpairs())
+    for name in RUNTIME_PARAMS:
+        defaults.pop(name, None)
+    param_names = [name for name in results.columns if name in defaults]
+
+    def _value(row, name):
+        value = row.get(name)
+        if isinstance(value, np.generic):
+            value = value.item()
+        return None if value is None or (isinstance(value, float) and np.isnan(value)) else value
+
+    records = []
+    for row in results.to_dict("records"):
+        if row.get("error"):
+            continue
+        params = {**defaults, **{name: _value(row, name) for name in param_names}}
+        records.append(SweepResult(
+            sweep_id=sweep_id,
+            params=params,
+            max_hedge_ratio=params["max_hedge_ratio"],
+            rebalance_window=params["rebalance_window"],
+            volatility_limiter=params["volatility_limiter"],
+            time_stop_loss=params["time_stop_loss"],
+            ai_news_weight=params["ai_news_weight"],
+            final_value=_value(row, "final_value"),
+            total_return=_value(row, "total_return"),
+            sharpe_ratio=_value(row, "sharpe_ratio"),
+            max_drawdown=_value(row, "max_drawdown"),
+            annual_return=_value(row, "rnorm100"),
+            total_trades=_value(row, "total_trades")
+        ))
+    return SweepResultManager.save_all(records)
+
+
+if __name__ == '__main__':
+    results = run_sweep(random_search(DEFAULT_SPACE, 32, seed=1), seed=1)
+    print(results.sort_values("sharpe_ratio", ascending=False).head(10).to_string())
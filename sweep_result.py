@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import json
+
+from dbutils import DBUtil, PageResult
+
+class SweepResult:
+    """参数扫描结果模型"""
+
+    def __init__(self, sweep_id: str, params: dict, max_hedge_ratio: float, rebalance_window: int,
+                 volatility_limiter: float, time_stop_loss: int, ai_news_weight: float,
+                 final_value: float, total_return: float, sharpe_ratio: float,
+                 max_drawdown: float, annual_return: float, total_trades: int):
+        # 扫描批次
+        self.sweep_id = sweep_id
+
+        # 本次回测使用的全部策略参数
+        self.params = params
+
+        # 对冲比例
+        self.max_hedge_ratio = max_hedge_ratio
+
+        # 再平衡周期
+        self.rebalance_window = rebalance_window
+
+        # 波动率限制
+        self.volatility_limiter = volatility_limiter
+
+        # 最大持仓天数
+        self.time_stop_loss = time_stop_loss
+
+        # AI情绪权重
+        self.ai_news_weight = ai_news_weight
+
+        # 最终市值
+        self.final_value = final_value
+
+        # 总收益率（%）
+        self.total_return = total_return
+
+        # 夏普比率
+        self.sharpe_ratio = sharpe_ratio
+
+        # 最大回撤（%）
+        self.max_drawdown = max_drawdown
+
+        # 年化收益率（%）
+        self.annual_return = annual_return
+
+        # 总交易次数
+        self.total_trades = total_trades
+
+
+class SweepResultManager:
+    """参数扫描结果管理 批量保存、查询"""
+
+    # 查询、写入字段
+    FIELDS = ("sweep_id", "params", "max_hedge_ratio", "rebalance_window", "volatility_limiter", "time_stop_loss",
+              "ai_news_weight", "final_value", "total_return", "sharpe_ratio", "max_drawdown", "annual_return", "total_trades")
+
+    # 写入语句
+    INSERT_SQL = DBUtil.insert_sql("sweep_result", FIELDS)
+
+    # 游标分页排序键
+    KEY_COLUMNS = ("id",)
+
+    @staticmethod
+    def to_row(result: SweepResult) -> tuple:
+        """
+        转换为写入语句的参数
+        
+        Args:
+            result: 参数扫描结果
+        """
+        return (
+            result.sweep_id,
+            json.dumps(result.params, ensure_ascii=False, default=str),
+            result.max_hedge_ratio,
+            result.rebalance_window,
+            result.volatility_limiter,
+            result.time_stop_loss,
+            result.ai_news_weight,
+            result.final_value,
+            result.total_return,
+            result.sharpe_ratio,
+            result.max_drawdown,
+            result.annual_return,
+            result.total_trades
+        )
+
+    @staticmethod
+    def save_all(results: list) -> int:
+        """
+        批量保存参数扫描结果，一次提交
+        
+        Args:
+            results: SweepResult 列表
+        """
+        rows = [SweepResultManager.to_row(result) for result in results]
+        return DBUtil.INS().save_batch(SweepResultManager.INSERT_SQL, rows)
+
+    @staticmethod
+    def list_after(sweep_id: str, last_key: tuple = None, page_size: int = 10) -> PageResult:
+        """
+        游标分页查询某次扫描的结果
+        
+        Args:
+            sweep_id: 扫描批次
+            last_key: 上一页返回的 next_key，为 None 时从第一页开始
+            page_size：每页显示数量，默认10条数据
+        """
+        return DBUtil.INS().get_page("sweep_result", SweepResultManager.FIELDS, SweepResultManager.KEY_COLUMNS,
+                                     last_key, page_size, where="`sweep_id` = %s", params=(sweep_id,))
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
+from batch_writer import BatchWriter
 from dbutils import DBUtil, PageResult
+from utils import BacktestPrinter
 
 class TestResult:
     """回测日志模型"""
@@ -11,7 +13,7 @@ class TestResult:
                  max_hedge_ratio: float, rebalance_window: int, 
                  volatility_limiter: float, vix: float, 
                  commission: float, slippage: float, 
-                 day_stop_loss: int, remaining_cash: float):
+                 day_stop_loss: int, remaining_cash: float, run_id: int = 0):
         # 回测日期
         self.date = date
 
@@ -51,10 +53,111 @@ class TestResult:
         # 剩余现金
         self.remaining_cash = remaining_cash
 
+        # 回测批次，0 表示未关联批次
+        self.run_id = run_id
+
 
 class TestResultManager:
     """回测结果管理 保存、查询"""
 
+    # 查询、写入字段
+    FIELDS = ("date", "hsi_rsi", "spx_rsi", "vix", "volatility_limiter", "sentiment_scores", "news_weight",
+              "max_hedge_ratio", "rebalance_window", "commission", "slippage", "day_stop_loss", "remaining_cash", "run_id")
+
+    # 写入语句，逐条写入和批量写入共用
+    INSERT_SQL = DBUtil.insert_sql("test_result", FIELDS)
+
+    # 查询语句
+    SELECT_SQL = DBUtil.select_sql("test_result", FIELDS)
+
+    # 批量写入缓冲，为 None 时逐条写入
+    writer = None
+
+    # 游标分页排序键
+    KEY_COLUMNS = ("date", "id")
+
+    @staticmethod
+    def start_batch(batch_size: int = 500, flush_interval: float = 2.0) -> None:
+        """
+        开启批量写入模式
+        
+        Args:
+            batch_size: 缓冲达到该行数时写入
+            flush_interval: 定时写入间隔（秒）
+        """
+        if TestResultManager.writer is None:
+            TestResultManager.writer = BatchWriter(TestResultManager.INSERT_SQL, batch_size, flush_interval, name="test-result-writer")
+
+    @staticmethod
+    def flush() -> None:
+        """立即写入缓冲中的回测结果"""
+        if TestResultManager.writer is not None:
+            TestResultManager.writer.flush()
+
+    @staticmethod
+    def stop_batch() -> None:
+        """
+        写入剩余回测结果并关闭批量写入模式
+
+        Raises:
+            RuntimeError: 重试后仍有回测结果未写入
+        """
+        writer, TestResultManager.writer = TestResultManager.writer, None
+        if writer is not None:
+            writer.close()
+
+    @staticmethod
+    def to_row(result: TestResult) -> tuple:
+        """
+        转换为写入语句的参数
+        
+        Args:
+            result: 回测结果
+        """
+        return (
+            result.date.strftime("%Y-%m-%d"),
+            DBUtil.to_number(result.hsi_rsi),
+            DBUtil.to_number(result.spx_rsi),
+            DBUtil.to_number(result.vix),
+            DBUtil.to_number(result.volatility_limiter),
+            DBUtil.to_number(result.sentiment_scores),
+            DBUtil.to_number(result.news_weight),
+            DBUtil.to_number(result.max_hedge_ratio),
+            int(result.rebalance_window),
+            DBUtil.to_number(result.commission),
+            DBUtil.to_number(result.slippage),
+            int(result.day_stop_loss),
+            DBUtil.to_number(result.remaining_cash, 2),
+            int(result.run_id)
+        )
+
+    @staticmethod
+    def from_row(row: tuple) -> TestResult:
+        """
+        查询结果转换为回测结果，字段顺序与 FIELDS 一致
+        
+        Args:
+            row: list/list_after/iter_pages/iter_all 返回的一行数据
+        """
+        values = dict(zip(TestResultManager.FIELDS, row))
+        date = values["date"]
+        return TestResult(
+            date=datetime(date.year, date.month, date.day),
+            hsi_rsi=DBUtil.from_number(values["hsi_rsi"]),
+            spx_rsi=DBUtil.from_number(values["spx_rsi"]),
+            sentiment_scores=DBUtil.from_number(values["sentiment_scores"]),
+            news_weight=DBUtil.from_number(values["news_weight"]),
+            max_hedge_ratio=DBUtil.from_number(values["max_hedge_ratio"]),
+            rebalance_window=int(values["rebalance_window"]),
+            volatility_limiter=DBUtil.from_number(values["volatility_limiter"]),
+            vix=DBUtil.from_number(values["vix"]),
+            commission=DBUtil.from_number(values["commission"]),
+            slippage=DBUtil.from_number(values["slippage"]),
+            day_stop_loss=int(values["day_stop_loss"]),
+            remaining_cash=DBUtil.from_number(values["remaining_cash"]),
+            run_id=int(values["run_id"])
+        )
+
     @staticmethod
     def save(result: TestResult) -> None:
         """
@@ -63,37 +166,13 @@ class TestResultManager:
         Args:
             result: 回测结果
         """
-        print(f"回测日期:{result.date.strftime('%Y-%m-%d')}; \
-HSI.RSI:{result.hsi_rsi}; \
-SPX.RSI:{result.spx_rsi}; \
-VIX:{result.vix}; \
-AI情绪得分:{result.sentiment_scores}; \
-资金余额:{result.remaining_cash}; \
-对冲比例:{result.max_hedge_ratio}; \
-对冲窗口:{result.rebalance_window}; \
-AI情绪权重:{result.news_weight}; \
-波动率限制:{result.volatility_limiter}; \
-最大持仓天数:{result.day_stop_loss}; \
-交易佣金率:{result.commission}; \
-滑点成本:{result.slippage}")
-
-        sql = f"INSERT INTO `test_result`(`date`, `hsi_rsi`, `spx_rsi`, `vix`, `volatility_limiter`, \
-`sentiment_scores`, `news_weight`, `max_hedge_ratio`, `rebalance_window`, `commission`, `slippage`, `day_stop_loss`, `remaining_cash`) VALUES (\
-'{result.date.strftime("%Y-%m-%d")}', \
-'{result.hsi_rsi}', \
-'{result.spx_rsi}', \
-'{result.vix}', \
-'{result.volatility_limiter}', \
-'{result.sentiment_scores}', \
-'{result.news_weight}', \
-'{result.max_hedge_ratio}', \
-'{result.rebalance_window}', \
-'{result.commission}', \
-'{result.slippage}', \
-'{result.day_stop_loss}', \
-'{result.remaining_cash:.2f}')"
-        # print(sql)
-        DBUtil.INS().save(sql)
+        BacktestPrinter.print_test_result(result)
+
+        row = TestResultManager.to_row(result)
+        if TestResultManager.writer is not None:
+            TestResultManager.writer.add(row)
+        else:
+            DBUtil.INS().save(TestResultManager.INSERT_SQL, row)
 
     @staticmethod
     def list(page: int, page_size: int = 10) -> PageResult:
@@ -105,7 +184,45 @@ AI情绪权重:{result.news_weight}; \
             page_size：每页显示数量，默认10条数据
         """
 
-        offset = (page - 1) * page_size
-        sql = f"SELECT `date`, `hsi_rsi`, `spx_rsi`, `vix`, `volatility_limiter`, `sentiment_scores`, `news_weight`, \
-`max_hedge_ratio`, `rebalance_window`, `commission`, `slippage`, `day_stop_loss`, `remaining_cash` FROM `test_result`"
-        return DBUtil.INS().get_all(sql, page, page_size)
\ No newline at end of file
+        return DBUtil.INS().get_all(TestResultManager.SELECT_SQL, page, page_size)
+
+    @staticmethod
+    def list_after(last_key: tuple = None, page_size: int = 10, with_count: bool = False, run_id: int = None,
+                   start: str = None, end: str = None) -> PageResult:
+        """
+        游标分页回测结果信息
+        
+        Args:
+            last_key: 上一页返回的 next_key，为 None 时从第一页开始
+            page_size：每页显示数量，默认10条数据
+            with_count: 是否统计总记录数
+            run_id: 回测批次，为 None 时不过滤
+            start: 开始日期（含），格式为'YYYY-MM-DD'
+            end: 结束日期（含），格式为'YYYY-MM-DD'
+        """
+        where, params = DBUtil.filter_condition({"run_id": run_id}, {"date": (start, end)})
+        return DBUtil.INS().get_page("test_result", TestResultManager.FIELDS, TestResultManager.KEY_COLUMNS, last_key, page_size,
+                                     where, params, with_count=with_count)
+
+    @staticmethod
+    def iter_pages(page_size: int = 1000):
+        """
+        按日期顺序逐页遍历全部回测结果
+        
+        Args:
+            page_size：每页数量，默认1000条数据
+        """
+        return DBUtil.INS().iter_pages("test_result", TestResultManager.FIELDS, TestResultManager.KEY_COLUMNS, page_size)
+
+    @staticmethod
+    def iter_all(chunk_size: int = None, run_id: int = None):
+        """
+        流式遍历全部回测结果，数据不会一次性加载到内存
+        
+        Args:
+            chunk_size: 为 None 时逐行返回，否则每次返回不超过 chunk_size 行的列表
+            run_id: 只遍历该回测批次，为 None 时遍历全部
+        """
+        where, params = DBUtil.filter_condition({"run_id": run_id})
+        sql = TestResultManager.SELECT_SQL + (f" WHERE {where}" if where else "")
+        return DBUtil.INS().stream(sql, params, chunk_size=chunk_size)
\ No newline at end of file
@@ -1,12 +1,23 @@
 import backtrader as bt
 import pandas as pd
-import akshare as ak
 import numpy as np
 
-from utils import BacktestPrinter
+from analytics import TRADING_DAYS, TradeArrays, analyze, trade_stats
+from market_data import MarketDataCache, load_frames
+from indicators import PrecomputedLine, RollingZScore
+from indicator_store import INDICATOR_MINPERIODS, IndicatorCache, IndicatorPandasData, precompute
+from price_panel import PricePanel
+from utils import BacktestPrinter, DEBUG, INFO, WARNING, QUIET
+from backtest_run import BacktestRun, BacktestRunManager
+from checkpoint import Checkpoint, CheckpointFile
 from order import OrderInfo, OrderManager
+from progress import CHANNEL
 from test_result import TestResult, TestResultManager
 
+# DualMovingAverageStrategy.params 中的运行参数（见 params 第四部分），不属于策略配置：
+# 不写入回测批次和检查点的参数配置、不作为参数扫描的列，新增运行参数时只需加在这里
+RUNTIME_PARAMS = ("persist", "run_id", "checkpoint", "state", "progress")
+
 class DualMovingAverageStrategy(bt.Strategy):
     """
     多资产动态配置策略
@@ -35,7 +46,14 @@ class DualMovingAverageStrategy(bt.Strategy):
         
         # 三、交易成本参数
         ("commission", 0.001),           # 交易佣金率：双向收取
-        ("slippage", 0.005)             # 滑点成本：反映市场冲击成本
+        ("slippage", 0.005),            # 滑点成本：反映市场冲击成本
+        
+        # 四、运行参数，同时加入 RUNTIME_PARAMS
+        ("persist", True),              # 是否保存订单和回测日志：参数扫描时关闭
+        ("run_id", 0),                  # 回测批次：订单和回测日志按批次保存
+        ("checkpoint", None),           # 检查点文件 CheckpointFile：定期保存状态，带有恢复起点时从检查点继续
+        ("state", None),                # 期末状态文件 CheckpointFile：回测结束时保存，带有恢复起点时只运行之后的新K线
+        ("progress", None)              # 进度主题：有订阅者时向 progress.CHANNEL 发布每根K线的日期、组合市值和订单
     )
 
     # 资产类别配置表：构建分散化的多资产组合
@@ -76,12 +94,144 @@ class DualMovingAverageStrategy(bt.Strategy):
 
         self.asset_categories = self.asset_categories_config # 实例中也保留一份，方便访问
         
+        self._build_symbol_index()
         self._setup_technical_indicators()
         self._load_ai_sentiment_model()  # 模拟AI情绪模型（实盘接入NLPAPI）
         self.initialized = False  # 添加建仓标志位
         self.trades = []
         self.all_trades = []  # 用于记录所有交易
 
+        # 从检查点恢复时，检查点之前的K线只重放计算，不写订单和回测日志、不输出日志
+        resume_from = self.p.checkpoint.resume_from if self.p.checkpoint is not None else None
+        self._resume_bar = resume_from.bar if resume_from is not None else 0
+        self._persist_from = resume_from.persist_from if resume_from is not None else 0
+        self._log_level = None
+        if resume_from is not None:
+            self.sentiment_scores = dict(resume_from.sentiment_scores)
+            self._log_level, BacktestPrinter.level = BacktestPrinter.level, QUIET
+        # 当前K线日期及该日期的第一根K线
+        self._bar_date = None
+        self._bar_date_start = 0
+
+        # 增量更新：从上次的期末状态继续，期末及之前的K线只用于指标预热
+        self._state_from = self.p.state.resume_from if self.p.state is not None else None
+        if self._state_from is not None:
+            self.sentiment_scores = dict(self._state_from.sentiment_scores)
+            self.initialized = self._state_from.initialized
+            self.trades = list(self._state_from.trades)
+            self.all_trades = list(self._state_from.all_trades)
+        # 尚未成交的订单 ref -> order，以及当前K线扣除的交易成本，用于保存期末状态
+        self._open_orders = {}
+        self._cash_additions = []
+
+        # 订单和回测日志改为批量写入，在 stop() 中写入剩余数据
+        if self.p.persist:
+            OrderManager.start_batch()
+            TestResultManager.start_batch()
+
+    def start(self):
+        """增量更新时恢复期末持仓"""
+        if self._state_from is not None:
+            for symbol, (size, price) in self._state_from.positions.items():
+                self.broker.getposition(self.feeds[symbol]).set(size, price)
+
+    def stop(self):
+        """回测结束，写入缓冲中剩余的订单和回测日志，并保存期末状态"""
+        self._resume_logging()
+        if self.p.persist:
+            # 重试后仍未写入的数据会抛出异常，run_backtest 据此把回测批次标记为失败，也不保存期末状态
+            try:
+                OrderManager.stop_batch()
+            finally:
+                TestResultManager.stop_batch()
+        if self.p.state is not None:
+            state = self._snapshot_state()
+            state.orders = [(order.data._name, order.created.size) for order in self._open_orders.values()]
+            state.cash_additions = list(self._cash_additions)
+            state.last_ids = BacktestRunManager.last_ids(self.p.run_id) if self.p.persist and self.p.run_id else {}
+            self.p.state.save(state)
+        BacktestPrinter.flush()
+
+    def buy(self, *args, **kwargs):
+        return self._track_order(super().buy(*args, **kwargs))
+
+    def sell(self, *args, **kwargs):
+        return self._track_order(super().sell(*args, **kwargs))
+
+    def _track_order(self, order):
+        """记录尚未成交的订单"""
+        if order is not None:
+            self._open_orders[order.ref] = order
+        return order
+
+    def notify_order(self, order):
+        if not order.alive():
+            self._open_orders.pop(order.ref, None)
+
+    def _add_cash(self, amount):
+        """调整现金（扣除交易成本），记录当前K线的调整金额"""
+        self.broker.add_cash(amount)
+        self._cash_additions.append(amount)
+
+    def _save_order(self, order: OrderInfo):
+        """保存订单信息并关联回测批次，persist 关闭或重放检查点之前的K线时跳过"""
+        if self.p.persist and len(self) >= self._persist_from:
+            order.run_id = self.p.run_id
+            OrderManager.save(order)
+        if self.p.progress is not None and len(self) >= self._persist_from and CHANNEL.has_subscribers(self.p.progress):
+            CHANNEL.publish(self.p.progress, {"orders": [{
+                "symbol": order.symbol,
+                "date": order.date.strftime("%Y-%m-%d"),
+                "action": order.action,
+                "price": float(order.price),
+                "size": int(order.size)
+            }]})
+
+    def _save_result(self, result: TestResult):
+        """保存回测日志并关联回测批次，persist 关闭或重放检查点之前的K线时跳过"""
+        if self.p.persist and len(self) >= self._persist_from:
+            result.run_id = self.p.run_id
+            TestResultManager.save(result)
+
+    def _build_symbol_index(self):
+        """
+        建立资产代码索引，避免每根K线重复调用 getdatabyname
+        
+        1. feeds：资产代码 -> 数据源
+        2. symbol_category：资产代码 -> 资产类别
+        3. category_feeds：资产类别 -> [(资产代码, 数据源)]，只包含已加载数据的资产
+        """
+        self.feeds = {d._name: d for d in self.datas}
+        self.symbol_category = {}
+        self.category_feeds = {}
+        for category, symbols in self.asset_categories.items():
+            self.category_feeds[category] = [(symbol, self.feeds[symbol]) for symbol in symbols if symbol in self.feeds]
+            for symbol in symbols:
+                self.symbol_category[symbol] = category
+
+    def _snapshot_positions(self):
+        """
+        计算当前K线的持仓快照，供再平衡、对冲和风控共用
+        
+        订单在下一根K线才成交，同一根K线内持仓和组合市值不会变化，
+        因此每根K线只需计算一次：
+        1. portfolio_value：组合总市值
+        2. held_positions：[(资产代码, 数据源, 持仓, 持仓市值)]，仅包含非空仓位
+        3. category_values：各资产类别的多头持仓市值
+        """
+        self.portfolio_value = self.broker.getvalue()
+        self.held_positions = []
+        self.category_values = dict.fromkeys(self.category_feeds, 0.0)
+        for symbol, data in self.feeds.items():
+            pos = self.getposition(data)
+            if pos.size == 0:
+                continue
+            position_value = pos.size * data.close[0]
+            self.held_positions.append((symbol, data, pos, position_value))
+            category = self.symbol_category.get(symbol)
+            if category is not None and pos.size > 0:
+                self.category_values[category] += position_value
+
     def _setup_technical_indicators(self):
         """
         设置多维度市场监控指标
@@ -90,15 +240,36 @@ class DualMovingAverageStrategy(bt.Strategy):
         1. RSI指标：分别监控港股和美股市场的超买超卖状态
         2. VIX波动率：跟踪市场恐慌情绪和系统性风险
         3. 个股波动率：计算各资产的波动率，用于动态调仓
+        
+        数据源带有预计算指标线（IndicatorPandasData/IndicatorPanelFeed）时直接使用，
+        否则在 backtrader 中计算，两种方式结果相同。
         """
+        hsi, spx = self.feeds["HSI.HK"], self.feeds["SPY.US"]
         # 恒生指数RSI：识别港股市场超买超卖
-        self.hsi_rsi = bt.indicators.RSI(self.getdatabyname("HSI.HK"), period=14)
+        self.hsi_rsi = self._indicator(hsi, "rsi14", lambda: bt.indicators.RSI(hsi, period=14))
         # 标普500RSI：识别美股市场超买超卖
-        self.spx_rsi = bt.indicators.RSI(self.getdatabyname("SPY.US"), period=14)
+        self.spx_rsi = self._indicator(spx, "rsi14", lambda: bt.indicators.RSI(spx, period=14))
         # VIX波动率指数：市场恐慌情绪指标
-        self.vix = self.getdatabyname("VXX.US").close
+        self.vix = self.feeds["VXX.US"].close
         # 计算所有资产的20日波动率：用于风险评估
-        self.asset_vol = {d._name: bt.indicators.StandardDeviation(d, period=20) for d in self.datas}
+        self.asset_vol = {d._name: self._indicator(d, "stddev20", lambda d=d: bt.indicators.StandardDeviation(d, period=20))
+                          for d in self.datas}
+        # 所有资产收盘价的20日Z-score：用于波动率止损，每根K线O(1)更新
+        self.close_zscore = {d._name: self._indicator(d, "zscore20", lambda d=d: RollingZScore(d.close, period=20))
+                             for d in self.datas}
+
+    def _indicator(self, data, field: str, build):
+        """
+        优先使用数据源中的预计算指标线，没有时调用 build 在线计算
+        
+        Args:
+            data: 数据源
+            field: 预计算指标线名称
+            build: 在线计算指标的函数
+        """
+        if field in data.lines.getlinealiases():
+            return PrecomputedLine(getattr(data.lines, field), period=INDICATOR_MINPERIODS[field])
+        return build()
 
     def _load_ai_sentiment_model(self):
         """
@@ -122,6 +293,107 @@ class DualMovingAverageStrategy(bt.Strategy):
         }
         
     def next(self):
+        bar = len(self)
+        bar_date = self.datas[0].datetime.datetime(0)
+        if bar_date != self._bar_date:
+            self._bar_date, self._bar_date_start = bar_date, bar
+        if bar >= self._persist_from:
+            self._resume_logging()
+        self._cash_additions = []
+
+        if self._state_from is not None and self.datetime.datetime(0) <= self._state_from.time:
+            # 增量更新的预热K线：到期末K线时重新提交当时未成交的订单和尚未入账的交易成本
+            if self.datetime.datetime(0) == self._state_from.time:
+                self._restore_open_orders()
+            return
+
+        self._next_bar()
+
+        if self.p.progress is not None and bar >= self._persist_from and CHANNEL.has_subscribers(self.p.progress):
+            CHANNEL.publish(self.p.progress, {
+                "bar": bar,
+                "date": self._bar_date.strftime("%Y-%m-%d"),
+                "value": self.broker.getvalue(),
+                "cash": self.broker.get_cash()
+            })
+
+        if self.p.checkpoint is not None:
+            if bar == self._resume_bar:
+                self._restore_checkpoint()
+            elif bar > self._resume_bar and bar % self.p.checkpoint.every == 0:
+                self._save_checkpoint()
+
+    def _resume_logging(self):
+        """重放结束，恢复日志级别"""
+        if self._log_level is not None:
+            BacktestPrinter.level, self._log_level = self._log_level, None
+
+    def _positions(self):
+        """非空持仓 {资产代码: (数量, 均价)}"""
+        positions = {}
+        for symbol, data in self.feeds.items():
+            pos = self.getposition(data)
+            if pos.size != 0:
+                positions[symbol] = (pos.size, pos.price)
+        return positions
+
+    def _snapshot_state(self):
+        """当前K线结束时的策略状态"""
+        return Checkpoint(
+            bar=len(self),
+            time=self.datetime.datetime(0),
+            date=self._bar_date,
+            persist_from=self._bar_date_start,
+            initialized=self.initialized,
+            cash=self.broker.get_cash(),
+            value=self.broker.getvalue(),
+            positions=self._positions(),
+            trades=self.trades,
+            all_trades=self.all_trades,
+            sentiment_scores=self.sentiment_scores,
+            run_id=self.p.run_id
+        )
+
+    def _restore_open_orders(self):
+        """增量更新：在期末K线重新提交期末状态中的订单和交易成本，下一根K线与原回测相同地成交"""
+        for symbol, size in self._state_from.orders:
+            data = self.feeds[symbol]
+            if size > 0:
+                self.buy(data=data, size=size)
+            else:
+                self.sell(data=data, size=-size)
+        for amount in self._state_from.cash_additions:
+            self._add_cash(amount)
+
+    def _save_checkpoint(self):
+        """
+        保存检查点
+        
+        先写入缓冲中的订单和回测日志，保证检查点之前的数据都已入库；
+        缓冲中还有写入失败、等待重试的数据时跳过这次检查点，恢复时从上一个检查点重新写入。
+        """
+        if self.p.persist:
+            OrderManager.flush()
+            TestResultManager.flush()
+            writers = (OrderManager.writer, TestResultManager.writer)
+            if any(writer.failed for writer in writers if writer is not None):
+                BacktestPrinter.log(WARNING, "checkpoint", "订单或回测日志写入失败，等待重试，跳过这次检查点")
+                return
+        
+        self.p.checkpoint.save(self._snapshot_state())
+
+    def _restore_checkpoint(self):
+        """重放到检查点K线，核对现金和持仓后恢复策略状态"""
+        checkpoint = self.p.checkpoint.resume_from
+        if self.broker.get_cash() != checkpoint.cash or self._positions() != checkpoint.positions:
+            raise RuntimeError(f"重放到第{checkpoint.bar}根K线的现金和持仓与检查点不一致，行情数据或参数可能已变化")
+        self.initialized = checkpoint.initialized
+        self.trades = list(checkpoint.trades)
+        self.all_trades = list(checkpoint.all_trades)
+        BacktestPrinter.log(INFO, "checkpoint", f"从检查点恢复: 第{checkpoint.bar}根K线 {checkpoint.date:%Y-%m-%d}",
+                            bar=checkpoint.bar, date=checkpoint.date)
+
+    def _next_bar(self):
         if not self.initialized:
             # 找到所有数据源中最早的可用日期
             earliest_date = None
@@ -135,10 +407,10 @@ class DualMovingAverageStrategy(bt.Strategy):
                 return  # 如果没有可用数据，直接返回
             
             # 打印初始建仓时间点
-            print(f"\n开始初始建仓，当前日期是: {earliest_date.strftime('%Y-%m-%d')}")
+            BacktestPrinter.log(INFO, "init", f"\n开始初始建仓，当前日期是: {earliest_date.strftime('%Y-%m-%d')}", date=earliest_date)
 
             # 初始建仓
-            print("\n开始初始建仓...")
+            BacktestPrinter.log(INFO, "init", "\n开始初始建仓...")
             BacktestPrinter.print_order_header()
             
             # 保存初始资金总额作为配置基准
@@ -171,7 +443,7 @@ class DualMovingAverageStrategy(bt.Strategy):
                 # 对该类别中的每个资产进行建仓
                 for symbol in symbols:
                     try:
-                        data = self.getdatabyname(symbol)
+                        data = self.feeds[symbol]
                         price = data.close[0]
                         if price > 0:
                             size = int(per_asset_value / price)
@@ -183,7 +455,7 @@ class DualMovingAverageStrategy(bt.Strategy):
                                 # 扣除成本后执行交易
                                 order = self.buy(data=data, size=size)
                             if order:
-                                self.broker.add_cash(-total_cost)
+                                self._add_cash(-total_cost)
                                 if order:
                                     # 记录交易信息
                                     trade_info = {
@@ -203,7 +475,7 @@ class DualMovingAverageStrategy(bt.Strategy):
                                         
                                     # 打印交易信息
                                     # BacktestPrinter.print_order_info(
-                                    OrderManager.save(OrderInfo(
+                                    self._save_order(OrderInfo(
                                         symbol=symbol,
                                         date=earliest_date,
                                         action="买入",
@@ -213,17 +485,19 @@ class DualMovingAverageStrategy(bt.Strategy):
                                         remaining_cash=total_value
                                     ))
                         else:
-                            print(f"跳过{symbol}：未满足金叉条件")
+                            BacktestPrinter.log(INFO, "skip", f"跳过{symbol}：未满足金叉条件", symbol=symbol)
                     except Exception as e:
-                        print(f"建仓{symbol}时发生错误: {e}")
+                        BacktestPrinter.log(WARNING, "error", f"建仓{symbol}时发生错误: {e}", symbol=symbol)
                         continue
             
-            print("\n初始建仓完成")
+            BacktestPrinter.log(INFO, "init", "\n初始建仓完成")
             self.initialized = True
             
         else:
-            print(f"当前回测日期: {self.datas[0].datetime.datetime(0).strftime('%Y-%m-%d')}")
+            if BacktestPrinter.enabled(DEBUG):
+                BacktestPrinter.print_bar_date(self.datas[0].datetime.datetime(0))
             # 每日动态调整逻辑
+            self._snapshot_positions()
             self._dynamic_rebalance()
             self._adaptive_hedging()
             self._enforce_risk_controls()
@@ -282,15 +556,16 @@ class DualMovingAverageStrategy(bt.Strategy):
         """
         # 检查三重触发条件
         # print(f"回测日期:{self.datas[0].datetime.datetime(0).strftime('%Y-%m-%d')}; HSI.RSI:{self.hsi_rsi[0]}; SPX.RSI:{self.spx_rsi[0]}; VIX:{self.vix[0]}; AI情绪得分:{np.mean(list(self.sentiment_scores.values()))}; 资金余额:{self.broker.getvalue()}; 对冲比例:{self.p.max_hedge_ratio}; 对冲窗口:{self.p.rebalance_window}; AI情绪权重:{self.p.ai_news_weight}; 波动率限制:{self.p.volatility_limiter}; 最大持仓天数:{self.p.time_stop_loss}; 交易佣金率:{self.p.commission}; 滑点成本:{self.p.slippage}")
-        TestResultManager.save(TestResult(self.datas[0].datetime.datetime(0), self.hsi_rsi[0], self.spx_rsi[0], np.mean(list(self.sentiment_scores.values())), self.p.ai_news_weight, self.p.max_hedge_ratio, self.p.rebalance_window, self.p.volatility_limiter, self.vix[0], self.p.commission, self.p.slippage, self.p.time_stop_loss, self.broker.getvalue()))
+        self._save_result(TestResult(self.datas[0].datetime.datetime(0), self.hsi_rsi[0], self.spx_rsi[0], np.mean(list(self.sentiment_scores.values())), self.p.ai_news_weight, self.p.max_hedge_ratio, self.p.rebalance_window, self.p.volatility_limiter, self.vix[0], self.p.commission, self.p.slippage, self.p.time_stop_loss, self.portfolio_value))
         if (self.hsi_rsi < 30 or self.spx_rsi < 30) and \
             self.vix[0] > 25 and \
             np.mean(list(self.sentiment_scores.values())) < 0.4:  # 负面情绪主导
             # 计算对冲金额并执行对冲
-            hedge_amount = self.broker.getvalue() * self.p.max_hedge_ratio
+            hedge_amount = self.portfolio_value * self.p.max_hedge_ratio
             self._distribute_hedge_etf(hedge_amount)
         else:
-            print("未触发对冲条件")
+            if BacktestPrinter.enabled(DEBUG):
+                BacktestPrinter.log(DEBUG, "hedge", "未触发对冲条件")
 
     def _enforce_risk_controls(self):
         """
@@ -312,21 +587,15 @@ class DualMovingAverageStrategy(bt.Strategy):
             - 超限时自动减仓20%
             - 控制个股黑天鹅风险
         """
-        # 遍历所有持仓进行风控检查
-        for data_name, pos in self.getpositions().items():
-            if pos.size == 0:  # 跳过空仓位
-                continue
-            # 获取数据对象的股票代码
-            data = self.getdatabyname(data_name._name if hasattr(data_name, '_name') else data_name)
-            
+        # 遍历所有非空持仓进行风控检查
+        for symbol, data, pos, position_value in self.held_positions:
             # 1. 波动率止损检查
             if len(data.close) >= 20:
-                # 计算最近20日收盘价的Z-score
-                close_prices = np.array([data.close[i] for i in range(-20, 0)])
-                z_score = (close_prices - np.mean(close_prices)) / np.std(close_prices)
+                # 前一日收盘价在最近20日收盘价中的Z-score，由指标增量计算
+                z_score = self.close_zscore[symbol][-1]
                 
                 # Z-score过低表明价格异常下跌，触发止损
-                if z_score[-1] < -1.5:
+                if z_score < -1.5:
                     reduce_size = int(pos.size * 0.3)  # 减仓30%
                     if reduce_size > 0:
                         order = self.sell(data=data, size=reduce_size)
@@ -336,7 +605,7 @@ class DualMovingAverageStrategy(bt.Strategy):
                             slippage_cost = reduce_size * data.close[0] * self.p.slippage
                             total_cost = commission_cost + slippage_cost
                             # 扣除成本
-                            self.broker.add_cash(-total_cost)
+                            self._add_cash(-total_cost)
                             # 记录交易信息
                             trade_info = {
                                 'datetime': self.datas[0].datetime.datetime(0),
@@ -347,17 +616,8 @@ class DualMovingAverageStrategy(bt.Strategy):
                             }
                             self.trades.append(trade_info)
                             # 打印交易信息
-                            # print("{:<8} {:<12} {:<6} {:<10.2f} {:<8d} {:<12.2f} {:<14.2f}".format(
-                            #     data_name._name if hasattr(data_name, '_name') else data_name,
-                            #     self.datas[0].datetime.datetime(0).strftime("%Y-%m-%d"),
-                            #     "卖出",
-                            #     data.close[0],
-                            #     reduce_size,
-                            #     data.close[0] * reduce_size,
-                            #     self.broker.get_cash()
-                            # ))
-                            OrderManager.save(OrderInfo(
-                                symbol=data_name._name if hasattr(data_name, '_name') else data_name,
+                            self._save_order(OrderInfo(
+                                symbol=symbol,
                                 date=self.datas[0].datetime.datetime(0),
                                 action="卖出",
                                 price=data.close[0],
@@ -367,8 +627,7 @@ class DualMovingAverageStrategy(bt.Strategy):
                             ))
             
             # 2. 单一标的持仓上限控制
-            position_value = pos.size * data.close[0]
-            if position_value / self.broker.getvalue() > 0.08:  # 超过8%上限
+            if position_value / self.portfolio_value > 0.08:  # 超过8%上限
                 reduce_size = int(pos.size * 0.2)  # 减仓20%
                 if reduce_size > 0:
                     order = self.sell(data=data, size=reduce_size)
@@ -378,7 +637,7 @@ class DualMovingAverageStrategy(bt.Strategy):
                         slippage_cost = reduce_size * data.close[0] * self.p.slippage
                         total_cost = commission_cost + slippage_cost
                         # 扣除成本
-                        self.broker.add_cash(-total_cost)
+                        self._add_cash(-total_cost)
                         # 记录交易信息
                         trade_info = {
                             'datetime': self.datas[0].datetime.datetime(0),
@@ -389,17 +648,8 @@ class DualMovingAverageStrategy(bt.Strategy):
                         }
                         self.trades.append(trade_info)
                         # 打印交易信息
-                        # print("{:<8} {:<12} {:<6} {:<10.2f} {:<8d} {:<12.2f} {:<14.2f}".format(
-                        #     data_name._name if hasattr(data_name, '_name') else data_name,
-                        #     self.datas[0].datetime.datetime(0).strftime("%Y-%m-%d"),
-                        #     "卖出",
-                        #     data.close[0],
-                        #     reduce_size,
-                        #     data.close[0] * reduce_size,
-                        #     self.broker.get_cash()
-                        # ))
-                        OrderManager.save(OrderInfo(
-                            symbol=data_name._name if hasattr(data_name, '_name') else data_name,
+                        self._save_order(OrderInfo(
+                            symbol=symbol,
                             date=self.datas[0].datetime.datetime(0),
                             action="卖出",
                             price=data.close[0],
@@ -409,52 +659,26 @@ class DualMovingAverageStrategy(bt.Strategy):
                         ))
 
     def _calculate_current_allocation(self):
-        """实时资产配置计算"""
-        total_value = self.broker.getvalue()
-        allocations = {}
-        
-        for category, symbols in self.asset_categories.items():
-            category_value = 0
-            for symbol in symbols:
-                try:
-                    data = self.getdatabyname(symbol)
-                    pos = self.getposition(data)
-                    if pos and pos.size > 0:
-                        category_value += pos.size * data.close[0]
-                except Exception:
-                    continue
-            allocations[category] = category_value / total_value if total_value > 0 else 0
-            
-        return allocations
+        """实时资产配置计算，基于当前K线的持仓快照"""
+        total_value = self.portfolio_value
+        return {
+            category: category_value / total_value if total_value > 0 else 0
+            for category, category_value in self.category_values.items()
+        }
 
     def _rebalance_category(self, category_name, target_allocation):
         """执行单个类别的再平衡操作"""
-        current_value = self.broker.getvalue()
+        current_value = self.portfolio_value
         target_value = current_value * target_allocation
         
         # 获取当前类别的实际价值
-        current_category_value = 0
-        for symbol in self.asset_categories[category_name]:
-            try:
-                data = self.getdatabyname(symbol)
-                pos = self.getposition(data)
-                if pos and pos.size > 0:
-                    current_category_value += pos.size * data.close[0]
-            except Exception:
-                continue
+        current_category_value = self.category_values[category_name]
         
         # 计算需要调整的金额
         value_difference = target_value - current_category_value
         if abs(value_difference) > current_value * 0.02:  # 设置2%的最小调整阈值
             # 获取类别中的所有可交易资产
-            tradeable_assets = []
-            for symbol in self.asset_categories[category_name]:
-                try:
-                    data = self.getdatabyname(symbol)
-                    if data and data.close[0] > 0:
-                        tradeable_assets.append((symbol, data))
-                except Exception:
-                    continue
+            tradeable_assets = [(symbol, data) for symbol, data in self.category_feeds[category_name] if data.close[0] > 0]
             
             if tradeable_assets:
                 # 平均分配调整金额
@@ -470,7 +694,7 @@ class DualMovingAverageStrategy(bt.Strategy):
                             if order:
                                 # 打印交易信息
                                 #print("{:<8} {:<12} {:<6} {:<10.2f} {:<8d} {:<12.2f} {:<14.2f}".format(symbol, self.datas[0].datetime.datetime(0).strftime("%Y-%m-%d"), "买入", data.close[0], size_change, data.close[0] * size_change, self.broker.get_cash()))
-                                OrderManager.save(OrderInfo(
+                                self._save_order(OrderInfo(
                                         symbol=symbol,
                                         date=self.datas[0].datetime.datetime(0),
                                         action="买入",
@@ -487,11 +711,11 @@ class DualMovingAverageStrategy(bt.Strategy):
                             # 扣除成本后执行交易
                             order = self.sell(data=data, size=abs(size_change))
                             if order:
-                                self.broker.add_cash(-total_cost)
+                                self._add_cash(-total_cost)
                             if order:
                                 # print("{:<8} {:<12} {:<6} {:<10.2f} {:<8d} {:<12.2f} {:<14.2f}".format(symbol, self.datas[0].datetime.datetime(0).strftime("%Y-%m-%d"), "卖出", data.close[0], abs(size_change), data.close[0] * abs(size_change), self.broker.get_cash()))
                                 # 打印交易信息
-                                OOrderManager.save(OrderInfo(
+                                self._save_order(OrderInfo(
                                     symbol=symbol,
                                     date=self.datas[0].datetime.datetime(0),
                                     action="卖出",
@@ -501,7 +725,7 @@ class DualMovingAverageStrategy(bt.Strategy):
                                     remaining_cash=self.broker.get_cash()
                                 ))
                     except Exception as e:
-                        print(f"再平衡{symbol}时发生错误: {e}")
+                        BacktestPrinter.log(WARNING, "error", f"再平衡{symbol}时发生错误: {e}", symbol=symbol)
                         continue
 
     def _distribute_hedge_etf(self, hedge_amount):
@@ -513,7 +737,7 @@ class DualMovingAverageStrategy(bt.Strategy):
         amount_per_etf = hedge_amount / len(hedge_symbols)
         for symbol in hedge_symbols:
             try:
-                data = self.getdatabyname(symbol)
+                data = self.feeds.get(symbol)
                 if data is None:
                     continue
                     
@@ -528,154 +752,359 @@ class DualMovingAverageStrategy(bt.Strategy):
                         # 扣除成本后执行交易
                         order = self.buy(data=data, size=size)
                         if order:
-                            self.broker.add_cash(-total_cost)
+                            self._add_cash(-total_cost)
                         if order:
-                            print(f"对冲买入: {symbol}, {size}股")
+                            BacktestPrinter.log(INFO, "hedge", f"对冲买入: {symbol}, {size}股", symbol=symbol, size=size)
             except Exception as e:
-                print(f"对冲{symbol}时发生错误: {e}")
+                BacktestPrinter.log(WARNING, "error", f"对冲{symbol}时发生错误: {e}", symbol=symbol)
                 continue
 
-def load_data(start="2021-01-08", end="2025-05-10"):
+def load_data(start="2021-01-08", end="2025-05-10", cache: MarketDataCache = None, refresh=False, workers=4,
+              indicators=True):
     """加载和处理所有资产的数据
     
     Args:
         start: 开始日期，格式为'YYYY-MM-DD'
         end: 结束日期，格式为'YYYY-MM-DD'
+        cache: 本地行情缓存，为 None 时使用默认缓存目录
+        refresh: 是否忽略缓存重新下载
+        workers: 并发下载线程数
+        indicators: 是否附带预计算指标线，指标缓存在行情缓存目录下
         
     Returns:
         dict: 包含所有加载成功的数据，key为资产代码，value为backtrader的Data Feed对象
     """
-    # 获取所有需要的资产代码
-    symbols = []
-    for category, assets in DualMovingAverageStrategy.asset_categories_config.items():
-        symbols.extend(assets)
-    symbols.extend(['VXX.US'])  # 添加额外需要的指数
-    
+    # 并发读取前复权日线，缓存未命中时下载
+    cache = cache if cache is not None else MarketDataCache()
+    frames, timings = load_frames(strategy_symbols(), start, end, cache=cache, workers=workers, refresh=refresh)
+    indicator_cache = IndicatorCache(cache.root) if indicators else None
     data_feeds = {}
     
-    # 下载并处理每个资产的数据
-    for symbol in symbols:
-        try:
-            if '.HK' in symbol:
-                # 处理港股数据
-                try:
-                    # 获取港股历史数据，使用stock_hk_daily替代stock_hk_hist_min_em
-                    stock_code = symbol.replace('.HK', '')
-                    
-                    stock_data = ak.stock_hk_daily(symbol=stock_code, adjust="qfq")
-                    if stock_data is None or stock_data.empty:
-                        print(f"未能获取到 {symbol} 的历史数据")
-                        continue
-                        
-                    stock_data.rename(columns={
-                        'date': 'datetime',
-                        'open': 'Open',
-                        'high': 'High',
-                        'low': 'Low',
-                        'close': 'Close',
-                        'volume': 'Volume'
-                    }, inplace=True)
-                except Exception as e:
-                    print(f"获取港股 {symbol} 数据时出错: {str(e)}")
-                    continue
-            elif '.US' in symbol:
-                # 处理美股数据
-                stock_data = ak.stock_us_daily(symbol=symbol.replace('.US', ''), adjust='qfq')
-                stock_data.rename(columns={
-                    'date': 'datetime',
-                    'open': 'Open',
-                    'high': 'High',
-                    'low': 'Low',
-                    'close': 'Close',
-                    'volume': 'Volume'
-                }, inplace=True)
+    for symbol, stock_data in frames.items():
+        if not stock_data.empty:
+            # 计算数据统计信息
+            data_count = len(stock_data)
+            earliest_date = stock_data.index.min().strftime('%Y-%m-%d')
+            latest_date = stock_data.index.max().strftime('%Y-%m-%d')
             
-            # 统一处理时间格式
-            stock_data['datetime'] = pd.to_datetime(stock_data['datetime'])
-            stock_data.set_index('datetime', inplace=True)
-            
-            # 过滤日期范围
-            stock_data = stock_data.loc[start:end]
-            
-            if not stock_data.empty:
-                # 计算数据统计信息
-                data_count = len(stock_data)
-                earliest_date = stock_data.index.min().strftime('%Y-%m-%d')
-                latest_date = stock_data.index.max().strftime('%Y-%m-%d')
-                
-                data = bt.feeds.PandasData(dataname=stock_data)
-                data_feeds[symbol] = data
-                print(f'数据加载成功 {symbol}: 数据条数: {data_count}, 最早日期: {earliest_date}, 最后日期: {latest_date}')
+            if indicator_cache is not None:
+                data = IndicatorPandasData(dataname=stock_data.join(indicator_cache.load_frame(symbol, stock_data)))
             else:
-                print(f'{symbol} 未能加载到数据 ')
-                
-        except Exception as e:
-            print(f'Error downloading data for {symbol}: {e}')
-            continue
+                data = bt.feeds.PandasData(dataname=stock_data)
+            data_feeds[symbol] = data
+            print(f'数据加载成功 {symbol}: 数据条数: {data_count}, 最早日期: {earliest_date}, 最后日期: {latest_date}, 耗时: {timings[symbol]:.2f}秒')
+        else:
+            print(f'{symbol} 未能加载到数据 ')
     
     return data_feeds
 
-def run_backtest(start="2019-05-10", end="2025-05-10", initial_cash=15000000):
+def strategy_symbols():
+    """策略需要的全部资产代码"""
+    symbols = []
+    for category, assets in DualMovingAverageStrategy.asset_categories_config.items():
+        symbols.extend(assets)
+    symbols.extend(['VXX.US'])  # 添加额外需要的指数
+    return symbols
+
+def build_panel(path, start="2019-05-10", end="2025-05-10", cache: MarketDataCache = None, workers=4):
+    """将全部资产的日线写入内存映射价格面板
+    
+    Args:
+        path: 面板文件路径（不含扩展名）
+        start: 开始日期，格式为'YYYY-MM-DD'
+        end: 结束日期，格式为'YYYY-MM-DD'
+        cache: 本地行情缓存，为 None 时使用默认缓存目录
+        workers: 并发下载线程数
+        
+    Returns:
+        PricePanel: 以只读内存映射方式打开的面板
+    """
+    frames, _ = load_frames(strategy_symbols(), start, end, cache=cache, workers=workers)
+    return PricePanel.build(frames, path)
+
+class EquityCurve(bt.Analyzer):
+    """逐K线记录组合市值，以及每笔已平仓交易扣除佣金后的盈亏，供 collect_analytics 计算绩效指标"""
+
+    def start(self):
+        self.dates = []
+        self.values = []
+        self.trade_pnl = []
+
+    def notify_trade(self, trade):
+        if trade.isclosed:
+            self.trade_pnl.append(trade.pnlcomm)
+
+    def next(self):
+        self.dates.append(self.strategy.datetime.datetime(0))
+        self.values.append(self.strategy.broker.getvalue())
+
+    def get_analysis(self):
+        return {"dates": np.array(self.dates, dtype="datetime64[D]"), "values": np.array(self.values, dtype=np.float64),
+                "trade_pnl": np.array(self.trade_pnl, dtype=np.float64)}
+
+def build_cerebro(data_feeds, initial_cash=15000000, strategy=None, **strategy_params):
+    """创建添加了数据、策略和分析器的 Cerebro
+    
+    Args:
+        data_feeds: {资产代码: Data Feed}
+        initial_cash: 初始资金
+        strategy: 策略类，为 None 时使用 DualMovingAverageStrategy（基准测试传入其子类）
+        strategy_params: 覆盖 DualMovingAverageStrategy.params 的参数
+    """
     cerebro = bt.Cerebro()
     # 添加分析器
     cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe_ratio')
     cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
     cerebro.addanalyzer(bt.analyzers.Returns, _name='returns')
     cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trade_analyzer')
-    
-    # 加载数据
-    data_feeds = load_data(start, end)
+    cerebro.addanalyzer(EquityCurve, _name='equity')
     
     # 将数据添加到cerebro
     for symbol, data in data_feeds.items():
         cerebro.adddata(data, name=symbol)
     
-    cerebro.addstrategy(DualMovingAverageStrategy)
+    cerebro.addstrategy(strategy or DualMovingAverageStrategy, **strategy_params)
     cerebro.broker.setcash(initial_cash)
+    return cerebro
+
+def collect_metrics(strat, initial_cash, final_portfolio_value):
+    """从分析器中提取回测指标
+    
+    Returns:
+        dict: 最终市值、总收益率、夏普比率、最大回撤、年化收益率和交易统计
+    """
+    # 获取夏普比率
+    sharpe_ratio = strat.analyzers.sharpe_ratio.get_analysis()['sharperatio']
+    
+    # 获取最大回撤
+    drawdown = strat.analyzers.drawdown.get_analysis()
+    max_drawdown = drawdown.max.drawdown
+    
+    # 获取年化收益率
+    returns = strat.analyzers.returns.get_analysis()
+    rnorm100 = returns.get('rnorm100', 0.0)
+    
+    # 获取交易分析
+    trade_analysis = strat.analyzers.trade_analyzer.get_analysis()
+    total_trades = trade_analysis['total']['total'] if 'total' in trade_analysis and 'total' in trade_analysis['total'] else 0
+    won_trades = trade_analysis['won']['total'] if 'won' in trade_analysis and 'total' in trade_analysis['won'] else 0
+    lost_trades = trade_analysis['lost']['total'] if 'lost' in trade_analysis and 'total' in trade_analysis['lost'] else 0
+    
+    return {
+        'final_value': final_portfolio_value,
+        'total_return': (final_portfolio_value - initial_cash) / initial_cash * 100,
+        'sharpe_ratio': sharpe_ratio,
+        'max_drawdown': max_drawdown,
+        'rnorm100': rnorm100,
+        'total_trades': total_trades,
+        'won_trades': won_trades,
+        'lost_trades': lost_trades
+    }
+
+def collect_analytics(strat, initial_cash, window=TRADING_DAYS):
+    """由回测结束后的策略计算 analytics 绩效指标
+    
+    市值曲线来自 EquityCurve 分析器，成交来自 broker 的全部已成交订单，
+    交易统计使用已平仓交易的盈亏，期末持仓按各资产最后一根K线的收盘价估值。
+    
+    Args:
+        strat: cerebro.run() 返回的策略
+        initial_cash: 初始资金
+        window: 滚动回撤的窗口长度（K线数）
+        
+    Returns:
+        dict: analytics.analyze 返回的指标
+    """
+    curve = strat.analyzers.equity.get_analysis()
+    filled = [order for order in strat.broker.orders if order.status == order.Completed]
+    trades = TradeArrays(
+        dates=[bt.num2date(order.executed.dt) for order in filled],
+        symbols=[order.data._name for order in filled],
+        size=[order.executed.size for order in filled],
+        price=[order.executed.price for order in filled]
+    )
+    last_prices = {symbol: data.close[0] for symbol, data in strat.feeds.items() if len(data)}
+    report = analyze(curve["values"], curve["dates"], trades, initial_cash, strat.symbol_category, last_prices, window)
+    report["trade_stats"] = trade_stats(curve["trade_pnl"])
+    return report
+
+def run_backtest(start="2019-05-10", end="2025-05-10", initial_cash=15000000, panel_path=None,
+                 log_level=None, log_path=None, checkpoint_path=None, checkpoint_every=60, resume=False,
+                 state_path=None, **strategy_params):
+    """运行一次回测
+    
+    Args:
+        start: 开始日期，格式为'YYYY-MM-DD'
+        end: 结束日期，格式为'YYYY-MM-DD'
+        initial_cash: 初始资金
+        panel_path: 价格面板路径，为 None 时通过 load_data 加载
+        log_level: 回测过程日志级别 DEBUG/INFO/WARNING/QUIET，为 None 时保持当前设置
+        log_path: JSON Lines 日志文件路径
+        checkpoint_path: 检查点文件路径，为 None 时不保存检查点
+        checkpoint_every: 每隔多少根K线保存一次检查点
+        resume: 是否从 checkpoint_path 的检查点继续，检查点不存在时从头运行
+        state_path: 期末状态文件路径，回测结束时保存，供 run_daily_update 增量更新
+        strategy_params: 覆盖 DualMovingAverageStrategy.params 的参数
+        
+    Returns:
+        dict: collect_metrics 返回的回测指标，保存结果时包含回测批次 run_id
+    """
+    if log_level is not None or log_path is not None:
+        BacktestPrinter.configure(level=log_level if log_level is not None else BacktestPrinter.level, jsonl_path=log_path)
+    
+    # 加载数据：指定面板文件时直接从内存映射面板读取，多个回测进程共享同一份数据
+    if panel_path is not None:
+        data_feeds = PricePanel.open(panel_path).feeds(start, end, indicators=True)
+    else:
+        data_feeds = load_data(start, end)
+    
+    params = {**dict(DualMovingAverageStrategy.params._getpairs()), **strategy_params}
+    for name in RUNTIME_PARAMS:
+        params.pop(name, None)
+    config = {"start": start, "end": end, "initial_cash": initial_cash, "params": params}
+
+    # 检查点：恢复时沿用检查点的回测批次，并删除检查点日期及之后已写入的订单和回测日志
+    run_id = 0
+    checkpoint = None
+    if checkpoint_path is not None:
+        checkpoint = CheckpointFile(checkpoint_path, checkpoint_every, config=config)
+        resume_from = checkpoint.load() if resume else None
+        if resume_from is not None:
+            print(f'从检查点恢复: 第{resume_from.bar}根K线 {resume_from.date:%Y-%m-%d}')
+            run_id = strategy_params["run_id"] = resume_from.run_id
+            if run_id and strategy_params.get("persist", True):
+                BacktestRunManager.delete_results_since(resume_from.run_id, resume_from.date)
+        strategy_params["checkpoint"] = checkpoint
+    if state_path is not None:
+        strategy_params["state"] = CheckpointFile(state_path, config=config)
+
+    # 保存结果时先创建回测批次，订单和回测日志都关联该批次
+    if strategy_params.get("persist", True) and not strategy_params.get("run_id"):
+        run_id = BacktestRunManager.create(BacktestRun(params, start, end, initial_cash))
+        strategy_params["run_id"] = run_id
+    
+    cerebro = build_cerebro(data_feeds, initial_cash, **strategy_params)
     
     print('初始投资组合价值: %.2f' % cerebro.broker.getvalue())
-    results = cerebro.run()
+    try:
+        results = cerebro.run()
+    except Exception:
+        if run_id:
+            BacktestRunManager.finish(run_id, status="failed")
+        raise
     strat = results[0]
+    if checkpoint is not None:
+        checkpoint.remove()
     
     # 获取最终投资组合价值
     final_portfolio_value = cerebro.broker.getvalue()
     print('最终投资组合价值: %.2f' % final_portfolio_value)
+    metrics = collect_metrics(strat, initial_cash, final_portfolio_value)
+    report = collect_analytics(strat, initial_cash)
+    metrics['sortino_ratio'] = report['sortino_ratio']
+    if run_id:
+        BacktestRunManager.finish(run_id, metrics)
+        metrics["run_id"] = run_id
     
     # 计算总收益率
-    total_return = (final_portfolio_value - initial_cash) / initial_cash * 100
     print('\n策略收益分析：')
-    print('总收益率: %.2f%%' % total_return)
+    print('总收益率: %.2f%%' % metrics['total_return'])
     
     # 获取夏普比率
-    sharpe_ratio = strat.analyzers.sharpe_ratio.get_analysis()['sharperatio']
+    sharpe_ratio = metrics['sharpe_ratio']
     print('夏普比率: %.2f' % sharpe_ratio if sharpe_ratio else '夏普比率: N/A')
     
     # 获取最大回撤
-    drawdown = strat.analyzers.drawdown.get_analysis()
-    max_drawdown = drawdown.max.drawdown
+    max_drawdown = metrics['max_drawdown']
     print('最大回撤: %.2f%%' % max_drawdown if max_drawdown else '最大回撤: N/A')
     
     # 获取年化收益率
-    returns = strat.analyzers.returns.get_analysis()
-    rnorm100 = returns.get('rnorm100', 0.0)
+    rnorm100 = metrics['rnorm100']
     print('年化收益率: %.2f%%' % (rnorm100 * 100) if rnorm100 else '年化收益率: N/A')
     
-    # 获取交易分析
-    trade_analysis = strat.analyzers.trade_analyzer.get_analysis()
+    # 按日收益率计算的索提诺比率和年度收益率
+    print('索提诺比率: %.2f' % report['sortino_ratio'] if report['sortino_ratio'] is not None else '索提诺比率: N/A')
+    for year, ret in report['annual_returns'].items():
+        print(f'{year}年收益率: {ret:.2%}')
     
     # 打印交易统计
     print('\n交易统计：')
-    total_trades = trade_analysis['total']['total'] if 'total' in trade_analysis and 'total' in trade_analysis['total'] else 0
-    won_trades = trade_analysis['won']['total'] if 'won' in trade_analysis and 'total' in trade_analysis['won'] else 0
-    lost_trades = trade_analysis['lost']['total'] if 'lost' in trade_analysis and 'total' in trade_analysis['lost'] else 0
-    print(f'总交易次数: {total_trades}')
-    print(f'盈利交易: {won_trades}')
-    print(f'亏损交易: {lost_trades}')
+    print(f"总交易次数: {metrics['total_trades']}")
+    print(f"盈利交易: {metrics['won_trades']}")
+    print(f"亏损交易: {metrics['lost_trades']}")
     
     # 打印交易明细
     # print('\n交易明细：')
     # for trade in strat.trades:
     #    print(f"{trade['datetime']} | {trade['action'].upper()} | 价格: {trade['price']:.2f} | 数量: {trade['size']:.2f} | 总金额: {trade['value']:.2f}")
+    
+    return metrics
+
+
+def run_daily_update(state_path, end=None, warmup=60, cache: MarketDataCache = None, persist=True,
+                     log_level=None, log_path=None):
+    """增量更新：从上次回测或增量更新保存的期末状态继续，只运行新的交易日
+    
+    1. 行情缓存只下载缓存末尾之后的新K线
+    2. 指标在完整历史上计算后截取，与全量回测一致
+    3. 期末之前的 warmup 根K线只用于指标预热，不下单、不写库；期末K线重新提交当时未成交的订单
+    4. 只有新交易日运行 next()，只追加新的订单和回测日志，结束时更新期末状态
+    
+    Args:
+        state_path: 期末状态文件路径（run_backtest 的 state_path）
+        end: 结束日期，格式为'YYYY-MM-DD'，默认今天
+        warmup: 预热K线数量，不少于指标的最长周期
+        cache: 本地行情缓存，为 None 时使用默认缓存目录
+        persist: 是否保存订单和回测日志
+        log_level: 回测过程日志级别 DEBUG/INFO/WARNING/QUIET，为 None 时保持当前设置
+        log_path: JSON Lines 日志文件路径
+        
+    Returns:
+        dict: 新交易日数量、最后交易日、现金和组合市值
+    """
+    if log_level is not None or log_path is not None:
+        BacktestPrinter.configure(level=log_level if log_level is not None else BacktestPrinter.level, jsonl_path=log_path)
+    
+    state = CheckpointFile(state_path)
+    last = state.load()
+    if last is None:
+        raise FileNotFoundError(f"期末状态文件不存在: {state_path}")
+    end = end or pd.Timestamp.today().strftime('%Y-%m-%d')
+    
+    # 读取行情：缓存已覆盖的部分直接读取本地文件
+    cache = cache if cache is not None else MarketDataCache()
+    frames, _ = load_frames(strategy_symbols(), last.config["start"], end, cache=cache)
+    frames = {symbol: stock_data for symbol, stock_data in frames.items() if not stock_data.empty}
+    dates = pd.DatetimeIndex(sorted(set().union(*(stock_data.index for stock_data in frames.values()))))
+    new_dates = dates[dates > pd.Timestamp(last.time)]
+    summary = {"new_bars": len(new_dates), "date": last.time, "cash": last.cash, "value": last.value, "run_id": last.run_id}
+    if len(new_dates) == 0:
+        print(f'没有新的交易日，期末日期: {last.time:%Y-%m-%d}')
+        return summary
+    
+    # 截取预热K线之后的数据，指标按完整历史计算
+    past = dates[dates <= pd.Timestamp(last.time)]
+    window_start = past[max(len(past) - warmup, 0)]
+    data_feeds = {}
+    for symbol, stock_data in frames.items():
+        indicators = pd.DataFrame(precompute(stock_data["Close"]), index=stock_data.index)
+        data_feeds[symbol] = IndicatorPandasData(dataname=stock_data.join(indicators).loc[window_start:])
+    
+    # 清理上次中断的增量更新已写入的数据
+    run_id = last.run_id if persist else 0
+    if run_id and last.last_ids:
+        BacktestRunManager.delete_results_after(run_id, last.last_ids)
+    
+    state.config = {**last.config, "end": end}
+    cerebro = build_cerebro(data_feeds, last.cash, **last.config["params"], persist=bool(run_id), run_id=run_id, state=state)
+    print(f'增量更新: {new_dates[0]:%Y-%m-%d} ~ {new_dates[-1]:%Y-%m-%d}, 共{len(new_dates)}个交易日')
+    cerebro.run()
+    if run_id:
+        BacktestRunManager.extend(run_id, end)
+    
+    summary.update({"date": new_dates[-1].to_pydatetime(), "cash": cerebro.broker.get_cash(), "value": cerebro.broker.getvalue()})
+    print('最终投资组合价值: %.2f' % summary["value"])
+    return summary
 
 
 if __name__ == '__main__':
@@ -1,8 +1,64 @@
 # -*- coding: utf-8 -*-
+import atexit
+import json
+import threading
+import time
 from datetime import datetime
 from typing import Dict, List, Any
 import numpy as np
 
+from analytics import trade_stats
+
+# 日志级别
+DEBUG = 10     # 每根K线的明细：回测日期、回测日志、未触发对冲等
+INFO = 20      # 建仓、订单、再平衡、对冲
+WARNING = 30   # 交易异常
+QUIET = 100    # 关闭全部输出
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", QUIET: "QUIET"}
+
+
+class JsonLinesSink:
+    """
+    缓冲写入的 JSON Lines 日志文件
+
+    每条日志为一行 json，缓冲达到 buffer_size 条或调用 flush() 时写入文件。
+    """
+
+    def __init__(self, path: str, buffer_size: int = 1000):
+        # 日志文件路径
+        self.path = path
+        
+        # 缓冲条数
+        self.buffer_size = buffer_size
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.buffer_size:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._buffer and not self._file.closed:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._file.flush()
+        self._buffer = []
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._file.close()
+
+
 class BacktestPrinter:
     """
     回测打印工具类
@@ -12,8 +68,111 @@ class BacktestPrinter:
     2. 每日回测日志打印
     3. 资产配置信息打印
     4. 回测结果统计打印
+
+    输出按级别过滤，低于当前级别的日志在格式化之前直接返回；
+    热点路径上的调用方可先用 enabled() 判断，连参数也不必计算。
+    可选地将日志以 JSON Lines 格式缓冲写入文件。
     """
 
+    # 当前日志级别，默认输出全部日志
+    level = DEBUG
+
+    # 是否输出到控制台
+    echo = True
+
+    # JSON Lines 日志文件，为 None 时不写文件
+    sink = None
+
+    @staticmethod
+    def configure(level: int = DEBUG, jsonl_path: str = None, buffer_size: int = 1000, echo: bool = True) -> None:
+        """
+        设置日志输出
+        
+        Args:
+            level: 日志级别 DEBUG/INFO/WARNING/QUIET
+            jsonl_path: JSON Lines 日志文件路径，为 None 时不写文件
+            buffer_size: JSON Lines 缓冲条数
+            echo: 是否输出到控制台
+        """
+        if BacktestPrinter.sink is not None:
+            BacktestPrinter.sink.close()
+            BacktestPrinter.sink = None
+        BacktestPrinter.level = level
+        BacktestPrinter.echo = echo
+        if jsonl_path is not None:
+            BacktestPrinter.sink = JsonLinesSink(jsonl_path, buffer_size)
+
+    @staticmethod
+    def enabled(level: int) -> bool:
+        """指定级别的日志是否会输出"""
+        return level >= BacktestPrinter.level and (BacktestPrinter.echo or BacktestPrinter.sink is not None)
+
+    @staticmethod
+    def flush() -> None:
+        """写入 JSON Lines 缓冲"""
+        if BacktestPrinter.sink is not None:
+            BacktestPrinter.sink.flush()
+
+    @staticmethod
+    def _emit(level: int, event: str, text: str, fields: dict = None) -> None:
+        if BacktestPrinter.echo:
+            print(text)
+        if BacktestPrinter.sink is not None:
+            record = {"ts": time.time(), "level": LEVEL_NAMES.get(level, level), "event": event}
+            record.update(fields if fields is not None else {"message": text.strip()})
+            BacktestPrinter.sink.write(record)
+
+    @staticmethod
+    def log(level: int, event: str, message: str, **fields) -> None:
+        """
+        输出一条日志
+        
+        Args:
+            level: 日志级别
+            event: 事件类型，写入 JSON Lines 的 event 字段
+            message: 控制台输出的文本
+            fields: 写入 JSON Lines 的附加字段
+        """
+        if not BacktestPrinter.enabled(level):
+            return
+        BacktestPrinter._emit(level, event, message, {"message": message.strip(), **fields})
+
+    @staticmethod
+    def print_bar_date(date: datetime) -> None:
+        """
+        打印当前回测日期
+        
+        Args:
+            date: 当前回测日期
+        """
+        if not BacktestPrinter.enabled(DEBUG):
+            return
+        BacktestPrinter._emit(DEBUG, "bar", f"当前回测日期: {date.strftime('%Y-%m-%d')}", {"date": date})
+
+    @staticmethod
+    def print_test_result(result) -> None:
+        """
+        打印每根K线的回测日志
+        
+        Args:
+            result: TestResult 回测日志
+        """
+        if not BacktestPrinter.enabled(DEBUG):
+            return
+        BacktestPrinter._emit(DEBUG, "test_result", f"回测日期:{result.date.strftime('%Y-%m-%d')}; \
+HSI.RSI:{result.hsi_rsi}; \
+SPX.RSI:{result.spx_rsi}; \
+VIX:{result.vix}; \
+AI情绪得分:{result.sentiment_scores}; \
+资金余额:{result.remaining_cash}; \
+对冲比例:{result.max_hedge_ratio}; \
+对冲窗口:{result.rebalance_window}; \
+AI情绪权重:{result.news_weight}; \
+波动率限制:{result.volatility_limiter}; \
+最大持仓天数:{result.day_stop_loss}; \
+交易佣金率:{result.commission}; \
+滑点成本:{result.slippage}", dict(vars(result)))
+
     @staticmethod
     def print_order_info(symbol: str, date: datetime, action: str, price: float, 
                         size: int, total_cost: float, remaining_cash: float) -> None:
@@ -29,7 +188,9 @@ class BacktestPrinter:
             total_cost: 总成本
             remaining_cash: 剩余资金
         """
-        print("{:<8} {:<12} {:<6} {:<10.2f} {:<8d} {:<12.2f} {:<14.2f}".format(
+        if not BacktestPrinter.enabled(INFO):
+            return
+        BacktestPrinter._emit(INFO, "order", "{:<8} {:<12} {:<6} {:<10.2f} {:<8d} {:<12.2f} {:<14.2f}".format(
             symbol,
             date.strftime("%Y-%m-%d"),
             action,
@@ -37,13 +198,23 @@ class BacktestPrinter:
             size,
             total_cost,
             remaining_cash
-        ))
+        ), {
+            "symbol": symbol,
+            "date": date,
+            "action": action,
+            "price": price,
+            "size": size,
+            "total_cost": total_cost,
+            "remaining_cash": remaining_cash
+        })
     
     @staticmethod
     def print_order_header() -> None:
         """
         打印订单信息表头
         """
+        if not BacktestPrinter.enabled(INFO) or not BacktestPrinter.echo:
+            return
         print("{:<8} {:<12} {:<6} {:<10} {:<8} {:<12} {:<14}".format(
             "股票代码", "日期", "操作", "单价", "数量", "总金额", "剩余资金"
         ))
@@ -60,6 +231,8 @@ class BacktestPrinter:
             sentiment_scores: AI情绪得分
             portfolio_value: 当前组合市值
         """
+        if not BacktestPrinter.enabled(DEBUG) or not BacktestPrinter.echo:
+            return
         print(f"\n当前回测日期: {date.strftime('%Y-%m-%d')}")
         print(f"当前HSI.RSI: {indicators.get('hsi_rsi', 'N/A')}")
         print(f"当前SPX.RSI: {indicators.get('spx_rsi', 'N/A')}")
@@ -77,8 +250,14 @@ class BacktestPrinter:
             total_value: 该类别总投资金额
             per_asset_value: 每个资产的投资金额
         """
-        print(f"\n{category}类别的总投资金额: {total_value:.2f}")
-        print(f"每个{category}类别的投资金额: {per_asset_value:.2f}")
+        if not BacktestPrinter.enabled(INFO):
+            return
+        BacktestPrinter._emit(INFO, "allocation", f"\n{category}类别的总投资金额: {total_value:.2f}\n"
+                              f"每个{category}类别的投资金额: {per_asset_value:.2f}", {
+            "category": category,
+            "total_value": total_value,
+            "per_asset_value": per_asset_value
+        })
     
     @staticmethod
     def print_rebalance_info(category: str, current_allocation: float, 
@@ -92,8 +271,15 @@ class BacktestPrinter:
             target_allocation: 目标配置比例
             deviation: 偏离度
         """
-        print(f"Rebalancing {category}: 当前配置={current_allocation:.2%}, "
-              f"目标={target_allocation:.2%}, 偏离={deviation:.2%}")
+        if not BacktestPrinter.enabled(INFO):
+            return
+        BacktestPrinter._emit(INFO, "rebalance", f"Rebalancing {category}: 当前配置={current_allocation:.2%}, "
+                              f"目标={target_allocation:.2%}, 偏离={deviation:.2%}", {
+            "category": category,
+            "current_allocation": current_allocation,
+            "target_allocation": target_allocation,
+            "deviation": deviation
+        })
     
     @staticmethod
     def print_backtest_results(initial_value: float, final_value: float, 
@@ -127,11 +313,9 @@ class BacktestPrinter:
         
         # 优先使用完整的交易记录统计
         if all_trades is not None:
-            total_trades = len(all_trades)
-            won_trades = len([t for t in all_trades if t.get('pnl', 0) > 0])
-            lost_trades = len([t for t in all_trades if t.get('pnl', 0) < 0])
-            avg_win = np.mean([t['pnl'] for t in all_trades if t.get('pnl', 0) > 0]) if won_trades > 0 else None
-            avg_loss = np.mean([t['pnl'] for t in all_trades if t.get('pnl', 0) < 0]) if lost_trades > 0 else None
+            stats = trade_stats(np.fromiter((t.get('pnl', 0) for t in all_trades), np.float64, len(all_trades)))
+            total_trades, won_trades, lost_trades = stats['total'], stats['won'], stats['lost']
+            avg_win, avg_loss = stats['avg_win'], stats['avg_loss']
         else:
             # 回退到trade_analysis的统计
             total_trades = trade_analysis.get('total', {}).get('total')
@@ -151,4 +335,8 @@ class BacktestPrinter:
             print("\n交易记录示例:")
             for i, trade in enumerate(all_trades[:5]):
                 print(f"  交易{i+1}: {trade.get('symbol', '未知')} {trade.get('action', '未知')} "
-                      f"{trade.get('size', 0)}股 @{trade.get('price', 0):.2f}")
\ No newline at end of file
+                      f"{trade.get('size', 0)}股 @{trade.get('price', 0):.2f}")
+
+
+# 进程退出时写入 JSON Lines 缓冲
+atexit.register(BacktestPrinter.flush)
@@ -0,0 +1,650 @@
+# -*- coding: utf-8 -*-
+import math
+import time
+
+import numpy as np
+
+from indicator_store import INDICATOR_FIELDS
+from price_panel import PricePanel
+from testyf import DualMovingAverageStrategy
+
+# 再平衡的资产类别和对应的目标配置参数，顺序与 _dynamic_rebalance 一致
+REBALANCE_TARGETS = (("core", "core_allocation"), ("safe_haven", "gold_allocation"), ("dividend", "dividend_allocation"))
+
+# 影响交易的策略参数，其余参数只记录到回测日志
+TRADE_PARAMS = ("core_allocation", "gold_allocation", "dividend_allocation", "max_hedge_ratio", "commission", "slippage")
+
+# SharpeRatio 分析器默认的年化无风险利率
+RISK_FREE_RATE = 0.01
+
+# Returns 分析器按日计算年化收益时使用的交易日数
+TRADING_DAYS = 252
+
+
+class MarketArrays:
+    """
+    向量化回测使用的行情矩阵
+
+    时间轴为全部资产交易日的并集，与 backtrader 多数据源按日期对齐的方式相同：
+    某资产在某日没有K线时沿用上一根K线的收盘价和指标值。
+    """
+
+    def __init__(self, panel: PricePanel, start=None, end=None):
+        window = panel.date_range(start, end)
+        close = np.asarray(panel.values[window, :, panel.field_index("close")], dtype=np.float64)
+        opens = np.asarray(panel.values[window, :, panel.field_index("open")], dtype=np.float64)
+        indicators = np.asarray(panel.indicators(start, end), dtype=np.float64)
+
+        # 只保留至少有一个资产有K线的日期
+        has_bar = ~np.isnan(close)
+        rows = np.flatnonzero(has_bar.any(axis=1))
+        close, opens, indicators, has_bar = close[rows], opens[rows], indicators[rows], has_bar[rows]
+
+        # 交易日期
+        self.dates = panel.dates[window][rows]
+
+        # 资产代码，顺序与 backtrader 中 datas 的顺序一致
+        self.symbols = list(panel.symbols)
+
+        # 当日是否有K线 (T, S)
+        self.has_bar = has_bar
+
+        # 当日开盘价，没有K线时为 NaN，用于成交
+        self.open = opens
+
+        # 向前填充的收盘价，即 data.close[0]
+        self.close = _ffill(close)
+
+        # 截至当日各资产已有的K线数量，即 len(data)
+        self.bars = np.cumsum(has_bar, axis=0)
+
+        # 前一根K线的 Z-score，即 close_zscore[symbol][-1]
+        zscore = indicators[:, :, INDICATOR_FIELDS.index("zscore20")]
+        self.zscore_prev = _ffill(_shift_bars(zscore, has_bar))
+
+        # 恒生指数、标普500的 RSI(14) 和 VXX 收盘价，向前填充
+        rsi = _ffill(indicators[:, :, INDICATOR_FIELDS.index("rsi14")])
+        self.hsi_rsi = rsi[:, self.symbols.index("HSI.HK")]
+        self.spx_rsi = rsi[:, self.symbols.index("SPY.US")]
+        self.vix = self.close[:, self.symbols.index("VXX.US")]
+
+        # 下单后成交的时间步：下单日之后该资产的第一根K线，没有时为 -1
+        self.next_bar = _next_bar(has_bar)
+
+        # 策略开始调用 next 的时间步：所有资产都有20根K线（RollingZScore 的最短周期）
+        ready = np.flatnonzero((self.bars >= 20).all(axis=1))
+        self.first_step = int(ready[0]) if len(ready) else len(self.dates)
+
+        # 资产类别 -> 数据中存在的资产下标，顺序与 asset_categories_config 一致
+        index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.categories = {category: np.array([index[s] for s in symbols if s in index], dtype=np.int64)
+                           for category, symbols in DualMovingAverageStrategy.asset_categories_config.items()}
+
+        # 资产类别配置的资产数量（含未加载的资产），建仓和对冲按该数量平均分配
+        self.category_sizes = {category: len(symbols)
+                               for category, symbols in DualMovingAverageStrategy.asset_categories_config.items()}
+
+        # 以下为逐日循环中不随参数变化的部分，预先对全部时间步计算
+        # 收盘价，尚未上市的资产为 0
+        self.close_filled = np.nan_to_num(self.close)
+
+        # Z-score 止损信号：已有20根K线且前一根K线 Z-score < -1.5
+        with np.errstate(invalid="ignore"):
+            self.stop_signal = (self.bars >= 20) & (self.zscore_prev < -1.5)
+
+        # 对冲信号（不含情绪条件）：恒生或标普 RSI < 30 且 VIX > 25
+        with np.errstate(invalid="ignore"):
+            self.hedge_signal = ((self.hsi_rsi < 30) | (self.spx_rsi < 30)) & (self.vix > 25)
+
+        # 再平衡类别的资产下标和成员矩阵 (类别, 资产)
+        self.rebalance_symbols = [self.categories[category] for category, _ in REBALANCE_TARGETS]
+        self.category_matrix = np.zeros((len(REBALANCE_TARGETS), len(self.symbols)))
+        for c, sym in enumerate(self.rebalance_symbols):
+            self.category_matrix[c, sym] = 1.0
+        self.rebalance_order = np.concatenate(self.rebalance_symbols).astype(np.intp)
+        self.rebalance_category = np.repeat(np.arange(len(REBALANCE_TARGETS)), [len(sym) for sym in self.rebalance_symbols])
+
+        # 每个时间步各再平衡类别中已上市（已有收盘价）的资产数量，至少为 1
+        self.listed_count = np.maximum((self.close_filled > 0) @ self.category_matrix.T, 1.0)
+
+        # 风控订单的资产下标，每个资产依次为止损、限仓两个订单
+        self.risk_symbols = np.repeat(np.arange(len(self.symbols)), 2)
+
+    @property
+    def shape(self) -> tuple:
+        return self.close.shape
+
+
+def _ffill(values: np.ndarray) -> np.ndarray:
+    """沿时间轴向前填充 NaN"""
+    valid = ~np.isnan(values)
+    index = np.where(valid, np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    filled = np.take_along_axis(values, index, axis=0)
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    return filled
+
+
+def _shift_bars(values: np.ndarray, has_bar: np.ndarray) -> np.ndarray:
+    """每个资产的值后移一根K线（按资产自己的K线计数，而不是时间步）"""
+    shifted = np.full(values.shape, np.nan)
+    for j in range(values.shape[1]):
+        rows = np.flatnonzero(has_bar[:, j])
+        shifted[rows[1:], j] = values[rows[:-1], j]
+    return shifted
+
+
+def _next_bar(has_bar: np.ndarray) -> np.ndarray:
+    """next_bar[t, s] = t 之后资产 s 第一根K线的时间步，没有时为 -1"""
+    steps = len(has_bar)
+    index = np.where(has_bar, np.arange(steps)[:, None], steps)
+    following = np.minimum.accumulate(index[::-1], axis=0)[::-1]
+    next_bar = np.full(has_bar.shape, steps, dtype=np.int64)
+    next_bar[:-1] = following[1:]
+    next_bar[next_bar >= steps] = -1
+    return next_bar
+
+
+class _Book:
+    """
+    持仓、现金和交易统计，成交规则与 backtrader BackBroker 相同
+
+    1. 下单后的下一个时间步先按下单时收盘价依次预扣现金，现金不足的订单被拒绝（check_submitted）
+    2. 订单在该资产下一根K线以开盘价成交，开仓部分现金不足时不成交
+    3. add_cash 扣除的交易成本在成交之后入账
+    """
+
+    def __init__(self, symbols: int, cash: float):
+        self.cash = cash
+        self.size = np.zeros(symbols)
+        self.price = [0.0] * symbols
+        self.trade_pnl = [0.0] * symbols
+        self.trades = 0
+        self.won = 0
+        self.lost = 0
+
+    def check(self, size: np.ndarray, created: np.ndarray) -> np.ndarray:
+        """按下单顺序预扣现金，返回被接受的订单"""
+        return self.cash - np.cumsum(size * created) >= 0.0
+
+    def fill_many(self, symbol: np.ndarray, size: np.ndarray, price: np.ndarray) -> None:
+        """按先进先出顺序成交一组订单，每个时间步只有少量订单，逐笔处理"""
+        sizes = self.size.tolist()
+        for j, q, px in zip(symbol.tolist(), size.tolist(), price.tolist()):
+            self.fill(sizes, j, q, px)
+        self.size = np.array(sizes)
+
+    def fill(self, sizes: list, symbol: int, size: float, price: float) -> None:
+        """
+        成交一笔订单，与 backtrader 的 Position.update 和 BackBroker._execute 相同
+
+        Args:
+            sizes: 持仓数量列表
+            symbol: 资产下标
+            size: 带符号数量
+            price: 成交价格
+        """
+        prices, pnls = self.price, self.trade_pnl
+        old = sizes[symbol]
+        if old == 0 or (old > 0) == (size > 0):
+            closed, opened = 0.0, size
+        elif abs(size) <= abs(old):
+            closed, opened = size, 0.0
+        else:
+            closed, opened = -old, size + old
+
+        cash = self.cash
+        if closed:
+            cash -= closed * price
+            pnls[symbol] += -closed * (price - prices[symbol])
+        if opened:
+            cash -= opened * price
+            if cash < 0.0:
+                # 现金不足，开仓部分不成交
+                cash += opened * price
+                opened = 0.0
+        self.cash = cash
+
+        new = old + closed + opened
+        if closed and (new == 0 or opened):
+            # 平仓或反手，上一笔交易结束
+            if pnls[symbol] >= 0.0:
+                self.won += 1
+            else:
+                self.lost += 1
+        if opened and (old == 0 or closed):
+            # 开仓或反手，新的一笔交易开始
+            self.trades += 1
+            pnls[symbol] = 0.0
+
+        if new == 0:
+            prices[symbol] = 0.0
+        elif opened and closed:
+            prices[symbol] = price
+        elif opened:
+            prices[symbol] = (prices[symbol] * old + opened * price) / new
+        sizes[symbol] = new
+
+
+def run_vectorized(market: MarketArrays, initial_cash: float = 15000000, sentiment: float = None, **params) -> dict:
+    """
+    用 NumPy 运行 DualMovingAverageStrategy
+
+    时间轴逐日循环，每日的配置偏离、对冲触发和风控检查对全部资产一次计算；
+    成交、现金和交易统计与 backtrader 相同，结果与 cerebro.run() 在浮点误差范围内一致。
+    rebalance_window、volatility_limiter、time_stop_loss、ai_news_weight 在策略中只记录到回测日志，不影响交易。
+
+    Args:
+        market: 行情矩阵
+        initial_cash: 初始资金
+        sentiment: AI 情绪平均得分，为 None 时与策略相同用 np.random.beta 生成
+        params: 覆盖 DualMovingAverageStrategy.params 的参数
+
+    Returns:
+        dict: 与 collect_metrics 相同的回测指标，另含 equity（每日组合市值）和 elapsed
+    """
+    started = time.perf_counter()
+    p = {**dict(DualMovingAverageStrategy.params._getpairs()), **params}
+    if sentiment is None:
+        sentiment = float(np.mean([np.random.beta(2, 1), np.random.beta(1.5, 1.2)]))
+    targets = np.array([p[name] for _, name in REBALANCE_TARGETS])
+    hedge_signal = market.hedge_signal & (sentiment < 0.4)
+    per_etf = p["max_hedge_ratio"] / market.category_sizes["hedge"]
+    hedge_symbols = market.categories["hedge"]
+
+    steps, symbols = market.shape
+    book = _Book(symbols, initial_cash)
+    equity = np.empty(steps)
+    pending = {}                                  # 成交时间步 -> [(资产, 数量)]，先进先出
+    submitted = None                              # 上一时间步下的订单 (资产, 数量, 下单价格, 下单时间步)
+    costs = None                                  # 上一时间步 add_cash 的交易成本
+    risk = np.zeros((symbols, 2))                 # 每个资产的止损、限仓减仓数量
+    charged_all = np.ones(symbols * 2, dtype=bool)  # 风控订单全部扣除交易成本
+
+    for t in range(steps):
+        close = market.close_filled[t]
+
+        # 1. 检查上一时间步提交的订单，现金不足的拒绝；接受的订单按成交时间步排队
+        if submitted is not None:
+            sym, size, created, step = submitted
+            accepted = book.check(size, created)
+            sym, size = sym[accepted], size[accepted]
+            at = market.next_bar[step, sym]
+            if len(at) and (at == at[0]).all():
+                # 各资产下一根K线在同一时间步（绝大多数情况）
+                if at[0] >= 0:
+                    pending.setdefault(int(at[0]), []).append((sym, size))
+            else:
+                for when in np.unique(at):
+                    if when >= 0:
+                        chunk = at == when
+                        pending.setdefault(int(when), []).append((sym[chunk], size[chunk]))
+            submitted = None
+
+        # 2. 以开盘价成交
+        chunks = pending.pop(t, None)
+        if chunks is not None:
+            sym = np.concatenate([c[0] for c in chunks]) if len(chunks) > 1 else chunks[0][0]
+            size = np.concatenate([c[1] for c in chunks]) if len(chunks) > 1 else chunks[0][1]
+            book.fill_many(sym, size, market.open[t, sym])
+
+        # 3. 交易成本入账，计算组合市值
+        if costs is not None:
+            for cost in costs.tolist():
+                book.cash -= cost
+            costs = None
+        position = book.size
+        position_value = position * close
+        value = book.cash + float(position_value.sum())
+        equity[t] = value
+
+        if t < market.first_step:
+            continue
+
+        if t == market.first_step:
+            orders = _initial_orders(market, close, book.cash, p)
+        else:
+            orders = []
+
+            # 再平衡：类别配置偏离超过8%且调整金额超过2%，按类别内已上市资产平均调整，卖出扣除交易成本
+            category_value = market.category_matrix @ np.maximum(position_value, 0.0)
+            allocation = category_value / value if value > 0 else np.zeros(len(targets))
+            difference = value * targets - category_value
+            trigger = (np.abs(allocation - targets) > 0.08) & (np.abs(difference) > value * 0.02)
+            if trigger.any():
+                sym = market.rebalance_order
+                price = close[sym]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    size = np.trunc((difference / market.listed_count[t])[market.rebalance_category] / price)
+                trade = trigger[market.rebalance_category] & (price > 0) & (size != 0)
+                orders.append((sym[trade], size[trade], size[trade] < 0))
+
+            # 对冲：RSI 超卖、VIX 高位且情绪低迷时按最大对冲比例买入对冲资产
+            if hedge_signal[t]:
+                sym = hedge_symbols[close[hedge_symbols] > 0]
+                size = np.trunc(value * per_etf / close[sym])
+                buy = size > 0
+                orders.append((sym[buy], size[buy], buy[buy]))
+
+            # 风控：Z-score 止损减仓30%，单一持仓超过8%减仓20%；每个资产先止损后限仓
+            risk[:, 0] = np.trunc(position * 0.3) * market.stop_signal[t]
+            risk[:, 1] = np.trunc(position * 0.2) * (position_value / value > 0.08)
+            reduce = risk.ravel()
+            sell = np.flatnonzero(reduce > 0.0)
+            if len(sell):
+                orders.append((market.risk_symbols[sell], -reduce[sell], charged_all[:len(sell)]))
+
+        if orders:
+            sym = np.concatenate([o[0] for o in orders]) if len(orders) > 1 else orders[0][0]
+            if len(sym):
+                size = np.concatenate([o[1] for o in orders]) if len(orders) > 1 else orders[0][1]
+                charged = np.concatenate([o[2] for o in orders]) if len(orders) > 1 else orders[0][2]
+                created = close[sym]
+                notional = np.abs(size[charged]) * created[charged]
+                costs = notional * p["commission"] + notional * p["slippage"] if charged.any() else None
+                submitted = (sym, size, created, t)
+
+    metrics = summarize(equity, market.dates, initial_cash)
+    metrics.update({
+        "total_trades": book.trades,
+        "won_trades": book.won,
+        "lost_trades": book.lost,
+        "equity": equity,
+        "elapsed": time.perf_counter() - started
+    })
+    return metrics
+
+
+def _initial_orders(market: MarketArrays, close: np.ndarray, cash: float, p: dict) -> list:
+    """
+    初始建仓：各类别按配置比例平均分配到类别中的每个资产，扣除交易成本
+
+    Returns:
+        list: [(资产下标, 带符号数量, 是否扣除交易成本)]
+    """
+    orders = []
+    for c, (category, name) in enumerate(REBALANCE_TARGETS):
+        per_asset = cash * p[name] / market.category_sizes[category]
+        sym = market.rebalance_symbols[c]
+        price = close[sym]
+        with np.errstate(divide="ignore"):
+            size = np.trunc(np.where(price > 0, per_asset / price, 0.0))
+        buy = size > 0
+        orders.append((sym[buy], size[buy], buy[buy]))
+    return orders
+
+
+class _BatchBook:
+    """
+    N 组参数的持仓、现金和交易统计，成交规则与 _Book 相同
+
+    订单按列（资产）逐笔成交，每一列对全部参数组一次计算。
+    """
+
+    def __init__(self, count: int, symbols: int, cash: float):
+        self.cash = np.full(count, float(cash))
+        self.size = np.zeros((count, symbols))
+        self.price = np.zeros((count, symbols))
+        self.trade_pnl = np.zeros((count, symbols))
+        self.trades = np.zeros(count, dtype=np.int64)
+        self.won = np.zeros(count, dtype=np.int64)
+        self.lost = np.zeros(count, dtype=np.int64)
+
+    def check(self, size: np.ndarray, created: np.ndarray) -> np.ndarray:
+        """按下单顺序预扣现金，返回被接受的订单 (参数组, 订单)"""
+        return self.cash[:, None] - np.cumsum(size * created, axis=1) >= 0.0
+
+    def fill(self, symbol: int, size: np.ndarray, price: float) -> None:
+        """
+        成交一个资产的订单，数量为 0 的参数组不变
+
+        Args:
+            symbol: 资产下标
+            size: 各参数组的带符号数量 (参数组,)
+            price: 成交价格
+        """
+        old = self.size[:, symbol]
+        reverse = (old != 0) & ((old > 0) != (size > 0))
+        closed = np.where(reverse, np.where(np.abs(size) <= np.abs(old), size, -old), 0.0)
+        opened = size - closed
+
+        cash = self.cash - closed * price
+        pnl = self.trade_pnl[:, symbol] - closed * (price - self.price[:, symbol])
+        cash = cash - opened * price
+        # 现金不足，开仓部分不成交
+        short = (opened != 0) & (cash < 0.0)
+        cash = np.where(short, cash + opened * price, cash)
+        opened = np.where(short, 0.0, opened)
+        self.cash = cash
+
+        new = old + closed + opened
+        # 平仓或反手，上一笔交易结束
+        ended = (closed != 0) & ((new == 0) | (opened != 0))
+        self.won += ended & (pnl >= 0.0)
+        self.lost += ended & (pnl < 0.0)
+        # 开仓或反手，新的一笔交易开始
+        started = (opened != 0) & ((old == 0) | (closed != 0))
+        self.trades += started
+        self.trade_pnl[:, symbol] = np.where(started, 0.0, pnl)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            averaged = (self.price[:, symbol] * old + opened * price) / new
+        self.price[:, symbol] = np.where(new == 0, 0.0, np.where(
+            opened != 0, np.where(closed != 0, price, averaged), self.price[:, symbol]))
+        self.size[:, symbol] = new
+
+
+def run_batch(market: MarketArrays, configs: list, initial_cash: float = 15000000, sentiment: float = None) -> dict:
+    """
+    一次运行多组参数，每个时间步对全部参数组同时计算
+
+    只有 TRADE_PARAMS 影响交易，这些参数相同的参数组只计算一次（例如 rebalance_window、
+    volatility_limiter 只记录到回测日志），结果按原顺序展开。全部参数组使用同一个情绪得分。
+
+    Args:
+        market: 行情矩阵
+        configs: 参数组合列表，每项为覆盖 DualMovingAverageStrategy.params 的字典
+        initial_cash: 初始资金
+        sentiment: AI 情绪平均得分，为 None 时与策略相同用 np.random.beta 生成
+
+    Returns:
+        dict: {指标名: ndarray (参数组,)}，equity 为每日组合市值 (参数组, 时间步)，另含 elapsed
+    """
+    started = time.perf_counter()
+    defaults = dict(DualMovingAverageStrategy.params._getpairs())
+    table = np.array([[config.get(name, defaults[name]) for name in TRADE_PARAMS] for config in configs],
+                     dtype=np.float64).reshape(len(configs), len(TRADE_PARAMS))
+    unique, inverse = np.unique(table, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    if sentiment is None:
+        sentiment = float(np.mean([np.random.beta(2, 1), np.random.beta(1.5, 1.2)]))
+
+    equity, book = _run_batch(market, dict(zip(TRADE_PARAMS, unique.T)), initial_cash, sentiment)
+    equity = equity[inverse]
+
+    metrics = summarize_batch(equity, market.dates, initial_cash)
+    metrics.update({
+        "total_trades": book.trades[inverse],
+        "won_trades": book.won[inverse],
+        "lost_trades": book.lost[inverse],
+        "equity": equity,
+        "elapsed": time.perf_counter() - started
+    })
+    return metrics
+
+
+def _run_batch(market: MarketArrays, p: dict, initial_cash: float, sentiment: float) -> tuple:
+    """
+    run_vectorized 的批量版本，订单排列在固定的列上：建仓/再平衡、对冲、风控（止损、限仓交替），
+    某组参数没有该订单时数量为 0
+
+    Args:
+        p: {参数名: ndarray (参数组,)}
+
+    Returns:
+        tuple: (每日组合市值 (参数组, 时间步), _BatchBook)
+    """
+    count = len(p["max_hedge_ratio"])
+    targets = np.stack([p[name] for _, name in REBALANCE_TARGETS], axis=1)
+    commission, slippage = p["commission"][:, None], p["slippage"][:, None]
+    hedge_signal = market.hedge_signal & (sentiment < 0.4)
+    per_etf = (p["max_hedge_ratio"] / market.category_sizes["hedge"])[:, None]
+    hedge_symbols = market.categories["hedge"]
+    rebalance_sizes = np.array([market.category_sizes[category] for category, _ in REBALANCE_TARGETS], dtype=np.float64)
+
+    steps, symbols = market.shape
+    book = _BatchBook(count, symbols, initial_cash)
+    equity = np.empty((count, steps))
+    pending = {}                                  # 成交时间步 -> [(资产, 数量 (参数组, 订单))]，先进先出
+    submitted = None                              # 上一时间步下的订单 (资产, 数量, 下单价格, 下单时间步)
+    costs = None                                  # 上一时间步 add_cash 的交易成本 (参数组, 订单)
+    risk = np.zeros((count, symbols, 2))          # 每个资产的止损、限仓减仓数量
+
+    for t in range(steps):
+        close = market.close_filled[t]
+
+        # 1. 检查上一时间步提交的订单，现金不足的拒绝；接受的订单按成交时间步排队
+        if submitted is not None:
+            sym, size, created, step = submitted
+            size = np.where(book.check(size, created), size, 0.0)
+            at = market.next_bar[step, sym]
+            for when in ((at[0],) if (at == at[0]).all() else np.unique(at)):
+                if when >= 0:
+                    chunk = at == when
+                    pending.setdefault(int(when), []).append((sym[chunk], size[:, chunk]))
+            submitted = None
+
+        # 2. 以开盘价成交
+        for sym, size in pending.pop(t, ()):
+            for k, j in enumerate(sym.tolist()):
+                book.fill(j, size[:, k], market.open[t, j])
+
+        # 3. 交易成本入账，计算组合市值
+        if costs is not None:
+            for k in range(costs.shape[1]):
+                book.cash = book.cash - costs[:, k]
+            costs = None
+        position = book.size
+        position_value = position * close
+        value = book.cash + position_value.sum(axis=1)
+        equity[:, t] = value
+
+        if t < market.first_step:
+            continue
+
+        orders = []
+        if t == market.first_step:
+            # 初始建仓：各类别按配置比例平均分配到类别中的每个资产
+            sym = market.rebalance_order
+            price = close[sym]
+            per_asset = (book.cash[:, None] * targets / rebalance_sizes)[:, market.rebalance_category]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                size = np.where(price > 0, np.trunc(per_asset / price), 0.0)
+            size = np.where(size > 0, size, 0.0)
+            orders.append((sym, size, size > 0))
+        else:
+            # 再平衡：类别配置偏离超过8%且调整金额超过2%，按类别内已上市资产平均调整，卖出扣除交易成本
+            category_value = np.maximum(position_value, 0.0) @ market.category_matrix.T
+            with np.errstate(divide="ignore", invalid="ignore"):
+                allocation = np.where(value[:, None] > 0, category_value / value[:, None], 0.0)
+            difference = value[:, None] * targets - category_value
+            trigger = (np.abs(allocation - targets) > 0.08) & (np.abs(difference) > value[:, None] * 0.02)
+            if trigger.any():
+                sym = market.rebalance_order
+                price = close[sym]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    size = np.trunc((difference / market.listed_count[t])[:, market.rebalance_category] / price)
+                size = np.where(trigger[:, market.rebalance_category] & (price > 0), size, 0.0)
+                orders.append((sym, size, size < 0))
+
+            # 对冲：RSI 超卖、VIX 高位且情绪低迷时按最大对冲比例买入对冲资产
+            if hedge_signal[t]:
+                sym = hedge_symbols
+                price = close[sym]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    size = np.where(price > 0, np.trunc(value[:, None] * per_etf / price), 0.0)
+                size = np.where(size > 0, size, 0.0)
+                orders.append((sym, size, size > 0))
+
+            # 风控：Z-score 止损减仓30%，单一持仓超过8%减仓20%；每个资产先止损后限仓
+            risk[:, :, 0] = np.trunc(position * 0.3) * market.stop_signal[t]
+            risk[:, :, 1] = np.trunc(position * 0.2) * (position_value / value[:, None] > 0.08)
+            reduce = risk.reshape(count, -1)
+            active = np.flatnonzero((reduce > 0.0).any(axis=0))
+            if len(active):
+                size = np.where(reduce[:, active] > 0.0, -reduce[:, active], 0.0)
+                orders.append((market.risk_symbols[active], size, size < 0))
+
+        # 只保留至少一组参数下单的资产列
+        orders = [(sym[keep], size[:, keep], charged[:, keep])
+                  for sym, size, charged in orders for keep in [(size != 0).any(axis=0)] if keep.any()]
+        if orders:
+            sym = np.concatenate([o[0] for o in orders])
+            size = np.concatenate([o[1] for o in orders], axis=1)
+            charged = np.concatenate([o[2] for o in orders], axis=1)
+            created = close[sym]
+            notional = np.abs(size) * created * charged
+            costs = notional * commission + notional * slippage
+            submitted = (sym, size, created, t)
+
+    return equity, book
+
+
+def summarize(equity: np.ndarray, dates: np.ndarray, initial_cash: float) -> dict:
+    """
+    由每日组合市值计算与 backtrader 分析器相同的指标
+
+    1. sharpe_ratio：SharpeRatio 默认按自然年收益率、年化无风险利率 1% 计算
+    2. max_drawdown：DrawDown 最大回撤（%）
+    3. rnorm100：Returns 按交易日数年化的对数收益率（%）
+    """
+    metrics = summarize_batch(np.asarray(equity)[None, :], dates, initial_cash)
+    metrics = {name: float(values[0]) for name, values in metrics.items()}
+    if math.isnan(metrics["sharpe_ratio"]):
+        metrics["sharpe_ratio"] = None
+    return metrics
+
+
+def summarize_batch(equity: np.ndarray, dates: np.ndarray, initial_cash: float) -> dict:
+    """
+    summarize 的批量版本
+
+    Args:
+        equity: 每日组合市值 (参数组, 时间步)
+        dates: 交易日期
+        initial_cash: 初始资金
+
+    Returns:
+        dict: {指标名: ndarray (参数组,)}，无法计算的夏普比率为 NaN
+    """
+    count, steps = equity.shape
+    if steps == 0:
+        equity = np.full((count, 1), float(initial_cash))
+        dates = np.array(["1970-01-01"], dtype="datetime64[D]")
+    final_value = equity[:, -1]
+
+    # 各自然年最后一个交易日的组合市值
+    years = dates.astype("datetime64[Y]")
+    year_end = np.flatnonzero(np.append(years[1:] != years[:-1], True))
+    year_values = np.concatenate((np.full((count, 1), float(initial_cash)), equity[:, year_end]), axis=1)
+    excess = year_values[:, 1:] / year_values[:, :-1] - 1.0 - RISK_FREE_RATE
+    mean = excess.mean(axis=1)
+    deviation = np.sqrt(np.mean((excess - mean[:, None]) ** 2, axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe_ratio = np.where(deviation > 0, mean / deviation, np.nan)
+
+    peak = np.maximum.accumulate(equity, axis=1)
+    max_drawdown = np.max(100.0 * (peak - equity) / peak, axis=1)
+
+    ratio = final_value / initial_cash
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ravg = np.where(ratio > 0, np.log(ratio), -np.inf) / steps if steps else np.zeros(count)
+        rnorm100 = np.where(np.isfinite(ravg), np.expm1(ravg * TRADING_DAYS) * 100.0, ravg)
+
+    return {
+        "final_value": final_value,
+        "total_return": (final_value - initial_cash) / initial_cash * 100,
+        "sharpe_ratio": sharpe_ratio,
+        "max_drawdown": max_drawdown if steps else np.zeros(count),
+        "rnorm100": rnorm100
+    }